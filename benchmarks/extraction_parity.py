@@ -0,0 +1,150 @@
+"""
+Check that the lxml constructors produce the same articles as the BeautifulSoup ones.
+
+Every html file of the reference set whose publisher has an lxml constructor (see `cap.registry`) is
+parsed into an lxml soup and into an `lxml.html` tree. The article is then constructed from both, and the
+doi is extracted from both. Articles are compared by their serialized bytes; for differing articles, the
+first differing components are reported. Parsing and construction are timed separately per publisher.
+
+Example:
+    python -m benchmarks.extraction_parity --reference_dir </path/to/html/files>
+    python -m benchmarks.extraction_parity --n_synthetic 10 --n_boilerplate 40
+"""
+import os
+import sys
+import time
+import difflib
+import logging
+from transformers import HfArgumentParser
+from typing import Optional, Dict, List
+from dataclasses import dataclass, field
+
+from bs4 import BeautifulSoup
+from seqlbtoolkit.IO import set_logging, logging_args
+
+from cap.article_constr import check_html_publisher, decode_html_contents
+from cap.registry import iter_publishers, get_publisher
+from cap.section_extr_lxml import parse_lxml_html
+from cap.serialization import dumps
+
+from .html_parity import describe_article
+from .generators import SyntheticArticleConfig, generate_article, GENERATORS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExtractionParityArgs:
+    reference_dir: Optional[str] = field(
+        default=None,
+        metadata={'help': 'Html articles to compare the outputs on (any input accepted by `process_articles.py`). '
+                          'Synthetic articles of the publishers with an lxml constructor are used if not set.'}
+    )
+    n_synthetic: Optional[int] = field(
+        default=3, metadata={'help': 'Number of synthetic articles per publisher, if `reference_dir` is not set.'}
+    )
+    n_boilerplate: Optional[int] = field(
+        default=0, metadata={'help': 'Navigation menus and scripts added around the synthetic articles.'}
+    )
+    max_reported_lines: Optional[int] = field(
+        default=10, metadata={'help': 'Maximum number of differing lines reported per article.'}
+    )
+    log_file: Optional[str] = field(
+        default='', metadata={"help": "the directory of the log file. Set to '' to disable logging"}
+    )
+
+
+def iter_reference_files(args: ExtractionParityArgs):
+    if args.reference_dir:
+        from cap.io import iter_article_files
+        for article_file in iter_article_files(args.reference_dir):
+            if article_file.file_type == 'html':
+                yield article_file.path, article_file.read()
+        return
+    lxml_publishers = set(spec.name for spec in iter_publishers('html') if spec.lxml_constructor is not None)
+    for file_type, publisher in GENERATORS:
+        if file_type != 'html' or publisher not in lxml_publishers:
+            continue
+        for seed in range(args.n_synthetic):
+            config = SyntheticArticleConfig(n_boilerplate=args.n_boilerplate, seed=seed)
+            article_file = generate_article(file_type, publisher, config)
+            yield article_file.file_name, article_file.contents
+
+
+def run_timed(func, *func_args):
+    start = time.perf_counter()
+    try:
+        output = func(*func_args)
+    except Exception as e:
+        output = e
+    return output, time.perf_counter() - start
+
+
+def check_extraction_parity(args: ExtractionParityArgs) -> int:
+    set_logging(args.log_file)
+    logger.setLevel(logging.INFO)
+
+    logging_args(args)
+
+    # publisher -> [soup parse, soup construct, lxml parse, lxml construct] times
+    times: Dict[str, List[float]] = dict()
+    n_files: Dict[str, int] = dict()
+    n_different = 0
+    for file_path, contents in iter_reference_files(args):
+        contents = decode_html_contents(contents)
+
+        soup, soup_parse_time = run_timed(BeautifulSoup, contents, 'lxml')
+        try:
+            spec = get_publisher('html', check_html_publisher(soup))
+        except Exception as e:
+            logger.warning(f"{file_path}: publisher not detected: {e!r}")
+            continue
+        if spec.lxml_constructor is None:
+            continue
+        root, lxml_parse_time = run_timed(parse_lxml_html, contents)
+
+        soup_doi, _ = run_timed(spec.doi_extractor, soup)
+        lxml_doi, _ = run_timed(spec.lxml_doi_extractor, root)
+        reference, soup_construct_time = run_timed(spec.constructor, soup, 'doi')
+        output, lxml_construct_time = run_timed(spec.lxml_constructor, root, 'doi')
+
+        publisher_times = times.setdefault(spec.name, [0.0] * 4)
+        for i, t in enumerate((soup_parse_time, soup_construct_time, lxml_parse_time, lxml_construct_time)):
+            publisher_times[i] += t
+        n_files[spec.name] = n_files.get(spec.name, 0) + 1
+
+        if repr(soup_doi) != repr(lxml_doi):
+            n_different += 1
+            logger.warning(f"{file_path}: doi {lxml_doi!r} != {soup_doi!r}")
+            continue
+        if isinstance(reference, Exception) or isinstance(output, Exception):
+            if repr(reference) != repr(output):
+                n_different += 1
+                logger.warning(f"{file_path}: {output!r} != {reference!r}")
+            continue
+        reference, output = reference[0], output[0]
+        if dumps(output) == dumps(reference):
+            continue
+        n_different += 1
+        diff = list(difflib.unified_diff(describe_article(reference), describe_article(output), lineterm='', n=0))
+        logger.warning(f"{file_path} differs:\n" + '\n'.join(line[:200] for line in diff[2:2 + args.max_reported_lines]))
+
+    logger.info(f"{'publisher':<10} {'files':>6} {'soup parse':>11} {'construct':>10} "
+                f"{'lxml parse':>11} {'construct':>10} {'speedup':>8}")
+    for publisher, (soup_parse, soup_construct, lxml_parse, lxml_construct) in sorted(times.items()):
+        speedup = (soup_parse + soup_construct) / (lxml_parse + lxml_construct) if lxml_parse + lxml_construct else 0
+        logger.info(f"{publisher:<10} {n_files[publisher]:>6} {soup_parse:>10.3f}s {soup_construct:>9.3f}s "
+                    f"{lxml_parse:>10.3f}s {lxml_construct:>9.3f}s {speedup:>7.2f}x")
+    logger.info(f"{n_different} of {sum(n_files.values())} articles differ")
+    return 1 if n_different else 0
+
+
+if __name__ == '__main__':
+    # --- set up arguments ---
+    parser = HfArgumentParser(ExtractionParityArgs)
+    if len(sys.argv) == 2 and sys.argv[1].endswith(".json"):
+        parity_args, = parser.parse_json_file(json_file=os.path.abspath(sys.argv[1]))
+    else:
+        parity_args, = parser.parse_args_into_dataclasses()
+
+    sys.exit(check_extraction_parity(args=parity_args))
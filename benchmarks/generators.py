@@ -0,0 +1,635 @@
+"""
+Synthetic article generators.
+
+Every supported publisher gets a generator that renders the same kind of content tree (title,
+abstract, nested sections with paragraphs and tables) into a document laid out like the
+publisher's pages, i.e., with the tags, classes and ids that `cap.article_constr` looks for.
+The documents are deterministic given the configuration and the seed, and need no network access.
+"""
+import os
+import random
+from html import escape
+from dataclasses import dataclass, field
+from typing import Optional, List, Tuple, Callable, Dict, Iterator
+
+from cap.constants import SUPPORTED_HTML_PUBLISHERS, SUPPORTED_XML_PUBLISHERS
+
+WORDS = (
+    'the sample was annealed at under argon and the resulting film showed a high conductivity '
+    'with improved stability compared to pristine material we attribute this to strong interfacial '
+    'coupling between layers diffraction patterns confirm phase purity while spectra reveal a '
+    'shift of peaks toward lower binding energy electrochemical measurements indicate excellent '
+    'capacity retention after cycles catalyst loading temperature pressure solvent ratio yield '
+    'selectivity of nanoparticles perovskite oxide polymer electrolyte anode cathode lithium '
+    'sodium zinc copper graphene carbon nitride oxygen hydrogen evolution reaction density '
+    'functional theory calculations suggest that vacancies lower the energy barrier'
+).split()
+FORMULAE = ('LiFePO4', 'TiO2', 'MoS2', 'CH3NH3PbI3', 'Co3O4', 'ZnO', 'NiFe-LDH', 'Li7La3Zr2O12')
+UNITS = ('K', 'mA g-1', 'nm', 'eV', 'mAh g-1', '%', 'h', 'mg cm-2')
+SECTION_TITLES = (
+    'Introduction', 'Experimental', 'Results', 'Discussion', 'Synthesis', 'Characterization',
+    'Electrochemical performance', 'Computational details', 'Mechanism', 'Conclusions'
+)
+
+DOI_PREFIXES = {
+    'nature': '10.1038', 'wiley': '10.1002', 'rsc': '10.1039', 'springer': '10.1007',
+    'aip': '10.1063', 'acs': '10.1021', 'elsevier': '10.1016', 'aaas': '10.1126'
+}
+
+
+@dataclass
+class SyntheticArticleConfig:
+    n_sections: Optional[int] = 5  # number of top-level sections
+    n_paragraphs: Optional[int] = 3  # paragraphs per section
+    n_sentences: Optional[int] = 4  # sentences per paragraph
+    n_words: Optional[int] = 16  # words per sentence
+    n_tables: Optional[int] = 2  # tables per article
+    n_table_rows: Optional[int] = 6
+    n_table_cols: Optional[int] = 4
+    depth: Optional[int] = 1  # section nesting depth; 0 means no sub-sections
+    n_boilerplate: Optional[int] = 0  # html only: navigation menus and scripts around the article, as on saved pages
+    n_references: Optional[int] = 0  # xml only: bibliography entries after the body, which the parsers do not read
+    seed: Optional[int] = 0
+
+
+@dataclass
+class SyntheticTable:
+    label: str
+    caption: str
+    rows: List[List[Tuple[str, int, int]]]  # (text, colspan, rowspan); the first row is the header
+    footnotes: List[str]
+
+
+@dataclass
+class SyntheticSection:
+    title: str
+    paragraphs: List[str]
+    tables: List[SyntheticTable] = field(default_factory=list)
+    subsections: List["SyntheticSection"] = field(default_factory=list)
+
+
+@dataclass
+class SyntheticDocument:
+    doi: str
+    title: str
+    abstract: str
+    sections: List[SyntheticSection]
+    references: List[str] = field(default_factory=list)
+
+
+@dataclass
+class SyntheticArticle:
+    publisher: str
+    file_type: str
+    doi: str
+    contents: bytes
+
+    @property
+    def file_name(self):
+        return f"{self.doi.replace('/', '_')}.{self.file_type}"
+
+
+# --- content ---
+
+def generate_sentence(rng: random.Random, n_words: int) -> str:
+    words = list()
+    for _ in range(n_words):
+        r = rng.random()
+        if r < 0.06:
+            words.append(rng.choice(FORMULAE))
+        elif r < 0.1:
+            words.append(f"{rng.randint(1, 999)} {rng.choice(UNITS)}")
+        else:
+            words.append(rng.choice(WORDS))
+    sentence = ' '.join(words)
+    return sentence[0].upper() + sentence[1:] + '.'
+
+
+def generate_paragraph(rng: random.Random, config: SyntheticArticleConfig) -> str:
+    return ' '.join(generate_sentence(rng, config.n_words) for _ in range(config.n_sentences))
+
+
+def generate_table(rng: random.Random, config: SyntheticArticleConfig, idx: int) -> SyntheticTable:
+    n_cols = max(config.n_table_cols, 3)
+    # the header has a cell spanning two columns and the first body cell spans two rows,
+    # so that `Table.format_rows` has something to do
+    header = [('Sample', 1, 1), ('Conditions', 2, 1)] + [
+        (rng.choice(WORDS).capitalize(), 1, 1) for _ in range(n_cols - 3)
+    ]
+    rows = [header]
+    for i in range(max(config.n_table_rows, 2)):
+        values = [(f"{rng.uniform(0, 100):.2f}", 1, 1) for _ in range(n_cols - 1)]
+        if i % 2 == 0:
+            rows.append([(rng.choice(FORMULAE), 1, 2)] + values)
+        else:
+            rows.append(values)
+    return SyntheticTable(
+        label=f'Table {idx + 1}',
+        caption=generate_sentence(rng, 10),
+        rows=rows,
+        footnotes=[generate_sentence(rng, 8)]
+    )
+
+
+def generate_section(rng: random.Random, config: SyntheticArticleConfig, level: int) -> SyntheticSection:
+    section = SyntheticSection(
+        title=rng.choice(SECTION_TITLES),
+        paragraphs=[generate_paragraph(rng, config) for _ in range(config.n_paragraphs)]
+    )
+    if level < config.depth:
+        section.subsections.append(generate_section(rng, config, level + 1))
+    return section
+
+
+def generate_document(publisher: str, config: SyntheticArticleConfig, idx: Optional[int] = 0) -> SyntheticDocument:
+    rng = random.Random(f'{publisher}-{config.seed}-{idx}')
+    sections = [generate_section(rng, config, 0) for _ in range(config.n_sections)]
+    for i in range(config.n_tables):
+        if sections:
+            sections[i % len(sections)].tables.append(generate_table(rng, config, i))
+    return SyntheticDocument(
+        doi=f"{DOI_PREFIXES[publisher]}/synth.{config.seed}.{idx:06d}",
+        title=generate_sentence(rng, 10)[:-1],
+        abstract=generate_paragraph(rng, config),
+        sections=sections,
+        references=[generate_sentence(rng, config.n_words) for _ in range(config.n_references)]
+    )
+
+
+def iter_sections(sections: List[SyntheticSection], level: Optional[int] = 0):
+    """
+    Pre-order traversal of the section tree, yields (level, section)
+    """
+    for section in sections:
+        yield level, section
+        yield from iter_sections(section.subsections, level + 1)
+
+
+# --- html helpers ---
+
+def render_html_table_rows(table: SyntheticTable, head_cell: Optional[str] = 'th') -> Tuple[str, str]:
+    def render_row(row, cell_tag):
+        cells = list()
+        for text, colspan, rowspan in row:
+            attrs = (f' colspan="{colspan}"' if colspan > 1 else '') + (f' rowspan="{rowspan}"' if rowspan > 1 else '')
+            cells.append(f'<{cell_tag}{attrs}>{escape(text)}</{cell_tag}>')
+        return f"<tr>{''.join(cells)}</tr>"
+
+    thead = f"<thead>{render_row(table.rows[0], head_cell)}</thead>"
+    tbody = f"<tbody>{''.join(render_row(row, 'td') for row in table.rows[1:])}</tbody>"
+    return thead, tbody
+
+
+def render_html_page(head: str, body: str, html_attrs: Optional[str] = '') -> bytes:
+    return f'<!DOCTYPE html><html{html_attrs}><head><meta charset="utf-8"/>{head}</head>' \
+           f'<body>{body}</body></html>'.encode('utf-8')
+
+
+def heading(level: int, text: str, attrs: Optional[str] = '') -> str:
+    h = min(level + 2, 6)
+    return f'<h{h}{attrs}>{escape(text)}</h{h}>'
+
+
+# --- html generators ---
+
+def generate_html_nature(doc: SyntheticDocument) -> bytes:
+    counter = iter(range(1, 1 << 30))
+
+    def render_section(level, section):
+        n = next(counter)
+        parts = [heading(level, section.title, f' class="c-article-section__title" id="Sec{n}"')]
+        parts += [f'<p>{escape(p)}</p>' for p in section.paragraphs]
+        for table in section.tables:
+            parts.append(
+                f'<div class="c-article-table" data-test="inline-table" id="table-{n}"><figure>'
+                f'<figcaption class="c-article-table__figcaption"><b>{escape(table.label)}</b> '
+                f'{escape(table.caption)}</figcaption></figure></div>'
+            )
+        parts += [f'<div class="c-article-subsection">{render_section(level + 1, sub)}</div>'
+                  for sub in section.subsections]
+        content = ''.join(parts)
+        if level == 0:
+            return f'<section aria-labelledby="Sec{n}" data-title="{escape(section.title)}">' \
+                   f'<div class="c-article-section" id="Sec{n}-section">' \
+                   f'<div class="c-article-section__content" id="Sec{n}-content">{content}</div></div></section>'
+        return content
+
+    head = f'<title>{escape(doc.title)} | Nature Communications</title>' \
+           f'<meta name="dc.publisher" content="Nature Publishing Group"/>' \
+           f'<meta name="citation_doi" content="{doc.doi}"/>'
+    body = f'<main><article><h1 class="c-article-title">{escape(doc.title)}</h1>' \
+           f'<ul class="c-article-identifiers"><li><a data-track="click" data-track-action="view doi" ' \
+           f'href="https://doi.org/{doc.doi}">https://doi.org/{doc.doi}</a></li></ul>' \
+           f'<div class="c-article-body">' \
+           f'<section aria-labelledby="Abs1" data-title="Abstract" lang="en"><div class="c-article-section" ' \
+           f'id="Abs1-section"><h2 class="c-article-section__title" id="Abs1">Abstract</h2>' \
+           f'<div class="c-article-section__content" id="Abs1-content"><p>{escape(doc.abstract)}</p></div>' \
+           f'</div></section><div class="main-content">' \
+           f"{''.join(render_section(0, s) for s in doc.sections)}</div></div></article></main>"
+    return render_html_page(head, body, ' lang="en"')
+
+
+def generate_html_wiley(doc: SyntheticDocument) -> bytes:
+    counter = iter(range(1, 1 << 30))
+
+    def render_table(table, n):
+        thead, tbody = render_html_table_rows(table)
+        footnotes = ''.join(f'<li>{escape(f)}</li>' for f in table.footnotes)
+        return f'<div class="article-table-content" id="tbl{n}"><header class="article-table-caption">' \
+               f'<span class="table-caption__label">{escape(table.label)}. </span>{escape(table.caption)}</header>' \
+               f'<div class="article-table-content-wrapper"><table class="table article-section__table">' \
+               f'{thead}{tbody}</table></div><div class="article-section__table-footnotes"><ul>{footnotes}</ul>' \
+               f'</div></div>'
+
+    def render_section(level, section):
+        n = next(counter)
+        parts = [heading(level, section.title, f' class="article-section__title section__title" id="sec{n}-title"')]
+        parts += [f'<p>{escape(p)}</p>' for p in section.paragraphs]
+        parts += [render_table(t, f'{n}{i}') for i, t in enumerate(section.tables)]
+        parts += [render_section(level + 1, sub) for sub in section.subsections]
+        section_class = 'article-section__content' if level == 0 else 'article-section__sub-content'
+        return f'<section class="{section_class}" id="sec{n}">{"".join(parts)}</section>'
+
+    head = f'<title>{escape(doc.title)} - Author - 2021 - Advanced Materials - Wiley Online Library</title>' \
+           f'<meta name="citation_publisher" content="John Wiley &amp; Sons, Ltd"/>'
+    body = f'<div class="article-citation"><div class="epub-sections"><a class="epub-doi" ' \
+           f'href="https://doi.org/{doc.doi}">https://doi.org/{doc.doi}</a></div></div><article>' \
+           f'<section class="article-section article-section__abstract" lang="en" id="section-1-en">' \
+           f'<h2 class="article-section__header">Abstract</h2><div class="article-section__content en main">' \
+           f'<p>{escape(doc.abstract)}</p></div></section>' \
+           f'<section class="article-section article-section__full">' \
+           f"{''.join(render_section(0, s) for s in doc.sections)}</section></article>"
+    return render_html_page(head, body)
+
+
+def generate_html_rsc(doc: SyntheticDocument) -> bytes:
+    parts = list()
+    n_table = 0
+    for n, (level, section) in enumerate(iter_sections(doc.sections)):
+        parts.append(heading(level, section.title, f' id="sect{n}"'))
+        parts += [f'<p class="otherpara">{escape(p)}</p>' for p in section.paragraphs]
+        for table in section.tables:
+            n_table += 1
+            thead, tbody = render_html_table_rows(table)
+            n_cols = sum(colspan for _, colspan, _ in table.rows[0])
+            footnotes = ''.join(
+                f'<a><span class="sup_ref">{chr(ord("a") + i)}</span></a><span class="sup_inf">{escape(f)}</span>'
+                for i, f in enumerate(table.footnotes)
+            )
+            parts.append(
+                f'<div class="table_caption"><b>{escape(table.label)}</b> '
+                f'<span id="tab{n_table}">{escape(table.caption)}</span></div>'
+                f'<div class="rtable__wrapper"><div class="rtable__inner"><table class="tgroup rtable" border="0">'
+                f'{thead}<tfoot><tr><th colspan="{n_cols}">{footnotes}</th></tr></tfoot>{tbody}</table></div></div>'
+            )
+
+    head = f'<title>{escape(doc.title)} - Journal of Materials Chemistry A (RSC Publishing)</title>' \
+           f'<meta name="DC.publisher" content="The Royal Society of Chemistry"/>'
+    body = f'<div id="wrapper"><div class="article_info"><a href="https://doi.org/{doc.doi}">' \
+           f'https://doi.org/{doc.doi}</a></div><h1 id="sect0"><span class="title_heading">{escape(doc.title)}' \
+           f'</span></h1><p class="abstract">{escape(doc.abstract)}</p>{"".join(parts)}</div>'
+    return render_html_page(head, body, ' xmlns:rsc="urn:rsc.org"')
+
+
+def generate_html_springer(doc: SyntheticDocument) -> bytes:
+    counter = iter(range(1, 1 << 30))
+
+    def render_table(table, n):
+        thead, tbody = render_html_table_rows(table)
+        footnotes = ''.join(f'<p>{escape(f)}</p>' for f in table.footnotes)
+        return f'<div class="Table" id="Tab{n}"><div class="Caption"><p>{escape(table.label)} ' \
+               f'{escape(table.caption)}</p></div><table>{thead}{tbody}</table>' \
+               f'<div class="TableFooter">{footnotes}</div></div>'
+
+    def render_section(level, section):
+        n = next(counter)
+        parts = [heading(level, section.title, f' class="c-article-section__title" id="Sec{n}"')]
+        parts += [f'<p>{escape(p)}</p>' for p in section.paragraphs]
+        for i, table in enumerate(section.tables):
+            # tables are embedded in the paragraphs that reference them
+            parts.append(f'<div class="Para">{escape(section.paragraphs[-1])}{render_table(table, f"{n}{i}")}</div>')
+        parts += [render_section(level + 1, sub) for sub in section.subsections]
+        return f'<section data-title="{escape(section.title)}"><div class="c-article-section" id="Sec{n}-section">' \
+               f'<div class="c-article-section__content" id="Sec{n}-content">{"".join(parts)}</div></div></section>'
+
+    head = f'<title>{escape(doc.title)} | SpringerLink</title><meta name="dc.publisher" content="Springer"/>'
+    body = f'<main><article><h1 class="c-article-title">{escape(doc.title)}</h1>' \
+           f'<section data-title="Abstract" lang="en"><div class="c-article-section" id="Abs1-section">' \
+           f'<h2 class="c-article-section__title" id="Abs1">Abstract</h2><div class="c-article-section__content" ' \
+           f'id="Abs1-content"><p>{escape(doc.abstract)}</p></div></div></section>' \
+           f'<div class="main-content">{"".join(render_section(0, s) for s in doc.sections)}</div>' \
+           f'<section data-title="Article information"><ul class="c-bibliographic-information__list">' \
+           f'<li class="c-bibliographic-information__list-item"><p>DOI<span class="u-hide">: </span>' \
+           f'<span class="c-bibliographic-information__value">https://doi.org/{doc.doi}</span></p></li></ul>' \
+           f'</section></article></main>'
+    return render_html_page(head, body)
+
+
+def generate_html_aip(doc: SyntheticDocument) -> bytes:
+    def render_section(level, section):
+        parts = [heading(level, section.title, ' class="sectionHeading"')]
+        parts += [f'<div class="NLM_paragraph">{escape(p)}</div>' for p in section.paragraphs]
+        for table in section.tables:
+            thead, tbody = render_html_table_rows(table)
+            parts.append(f'<div class="NLM_table-wrap"><div class="NLM_caption">{escape(table.label)}. '
+                         f'{escape(table.caption)}</div><table>{thead}{tbody}</table></div>')
+        parts += [render_section(level + 1, sub) for sub in section.subsections]
+        return f'<div class="NLM_sec NLM_sec_level_{level + 1}">{"".join(parts)}</div>'
+
+    head = f'<title>{escape(doc.title)}: The Journal of Chemical Physics: Vol 150, No 1</title>' \
+           f'<meta name="dc.publisher" content="AIP Publishing"/>'
+    body = f'<div class="publicationContentCitation">J. Chem. Phys. 150, 014701 (2019); ' \
+           f'https://doi.org/{doc.doi}</div><h1 class="citation__title">{escape(doc.title)}</h1>' \
+           f'<div class="NLM_abstract"><p>{escape(doc.abstract)}</p></div>' \
+           f'<div class="hlFld-Fulltext">{"".join(render_section(0, s) for s in doc.sections)}</div>'
+    return render_html_page(head, body)
+
+
+def generate_html_acs(doc: SyntheticDocument) -> bytes:
+    counter = iter(range(1, 1 << 30))
+
+    def render_table(table, n):
+        thead, tbody = render_html_table_rows(table)
+        footnotes = ''.join(f'<p><i>{chr(ord("a") + i)}</i>{escape(f)}</p>' for i, f in enumerate(table.footnotes))
+        return f'<div class="NLM_table-wrap" id="tbl{n}"><div class="NLM_caption"><b>{escape(table.label)}. </b>' \
+               f'{escape(table.caption)}</div><div class="NLM_table"><table>{thead}{tbody}</table></div>' \
+               f'<div class="NLM_table-wrap-foot"><div class="footnote">{footnotes}</div></div></div>'
+
+    def render_section(level, section):
+        n = next(counter)
+        parts = [heading(level, section.title, f' id="_i{n}"')]
+        paragraphs = [escape(p) for p in section.paragraphs]
+        for i, table in enumerate(section.tables):
+            paragraphs[-1] += render_table(table, f'{n}{i}')
+        parts += [f'<div class="NLM_p">{p}</div>' for p in paragraphs]
+        parts += [render_section(level + 1, sub) for sub in section.subsections]
+        return f'<div class="NLM_sec NLM_sec_level_{level + 1}" id="sec{n}">{"".join(parts)}</div>'
+
+    head = f'<title>{escape(doc.title)} | Journal of the American Chemical Society</title>' \
+           f'<meta name="dc.Publisher" content="American Chemical Society"/>'
+    body = f'<div class="article_header"><h1 class="article_header-title"><span class="hlFld-Title">' \
+           f'{escape(doc.title)}</span></h1><div class="article_header-doiurl"><a href="https://doi.org/{doc.doi}">' \
+           f'https://doi.org/{doc.doi}</a></div></div><div class="article_abstract">' \
+           f'<h2 class="article_abstract-title">Abstract</h2><p class="articleBody_abstractText">' \
+           f'{escape(doc.abstract)}</p></div><div class="article_content"><div class="hlFld-Fulltext">' \
+           f'{"".join(render_section(0, s) for s in doc.sections)}</div></div>'
+    return render_html_page(head, body)
+
+
+def generate_html_elsevier(doc: SyntheticDocument) -> bytes:
+    counter = iter(range(1, 1 << 30))
+
+    def render_table(table, n):
+        thead, tbody = render_html_table_rows(table)
+        footnotes = ''.join(f'<dt>{chr(ord("a") + i)}</dt><dd><p>{escape(f)}</p></dd>'
+                            for i, f in enumerate(table.footnotes))
+        return f'<div class="tables frame-topbot rowsep-0 colsep-0" id="tbl{n}"><span class="captions text-s">' \
+               f'<span><p><span class="label">{escape(table.label)}</span>. {escape(table.caption)}</p></span>' \
+               f'</span><div class="groups"><table>{thead}{tbody}</table></div>' \
+               f'<dl class="footnotes">{footnotes}</dl></div>'
+
+    def render_section(level, section):
+        n = next(counter)
+        parts = [heading(level, section.title, ' class="u-h4 u-margin-m-top u-margin-xs-bottom"')]
+        parts += [f'<p id="p{n:04d}{i}">{escape(p)}</p>' for i, p in enumerate(section.paragraphs)]
+        parts += [render_table(t, f'{n}{i}') for i, t in enumerate(section.tables)]
+        parts += [render_section(level + 1, sub) for sub in section.subsections]
+        return f'<section id="sec{n:04d}">{"".join(parts)}</section>'
+
+    head = f'<title>{escape(doc.title)} - ScienceDirect</title><meta name="citation_doi" content="{doc.doi}"/>'
+    body = f'<div id="mathjax-container"><article><h1 class="Head"><span class="title-text">{escape(doc.title)}' \
+           f'</span></h1><div class="DoiLink" id="article-identifier-links"><a class="doi" ' \
+           f'href="https://doi.org/{doc.doi}" target="_blank" rel="noreferrer noopener" ' \
+           f'title="Persistent link using digital object identifier">https://doi.org/{doc.doi}</a></div>' \
+           f'<div class="Abstracts u-font-serif" id="abstracts"><div class="abstract author" id="ab0005" lang="en">' \
+           f'<h2 class="section-title u-h3">Abstract</h2><div id="as0005"><p id="sp0005">{escape(doc.abstract)}</p>' \
+           f'</div></div></div><div class="Body u-font-serif" id="body"><div>' \
+           f'{"".join(render_section(0, s) for s in doc.sections)}</div></div></article></div>'
+    return render_html_page(head, body)
+
+
+def generate_html_aaas(doc: SyntheticDocument) -> bytes:
+    counters = {'sec': iter(range(1, 1 << 30)), 'p': iter(range(1, 1 << 30))}
+
+    def render_section(level, section):
+        n = next(counters['sec'])
+        parts = [heading(level, section.title)]
+        parts += [f'<p id="p-{next(counters["p"])}">{escape(p)}</p>' for p in section.paragraphs]
+        for table in section.tables:
+            thead, tbody = render_html_table_rows(table)
+            parts.append(f'<div class="table-wrap"><div class="caption"><span class="label">{escape(table.label)}'
+                         f'</span> {escape(table.caption)}</div><table>{thead}{tbody}</table></div>')
+        parts += [render_section(level + 1, sub) for sub in section.subsections]
+        return f'<section id="sec-{n}">{"".join(parts)}</section>'
+
+    head = f'<title>{escape(doc.title)} | Science</title>' \
+           f'<meta name="dc.publisher" content="American Association for the Advancement of Science"/>'
+    body = f'<main><article><header><h1 property="name">{escape(doc.title)}</h1><div class="self-citation">' \
+           f'<span class="journal">Science</span> 370, 1 (2020) <a href="https://doi.org/{doc.doi}">DOI: ' \
+           f'{doc.doi}</a></div></header><section id="abstract" role="doc-abstract">' \
+           f'<h2 property="name" class="abstract-title">Abstract</h2><div role="paragraph">{escape(doc.abstract)}' \
+           f'</div></section><section id="bodymatter"><div class="core-container">' \
+           f'{"".join(render_section(0, s) for s in doc.sections)}</div></section></article></main>'
+    return render_html_page(head, body)
+
+
+# --- xml generators ---
+
+def render_cals_rows(table: SyntheticTable, ns: str) -> str:
+    """
+    Render table rows as CALS/OASIS `row` and `entry` elements with `namest`/`nameend`/`morerows` spans
+    """
+    def render_row(row, occupied):
+        entries = list()
+        col = 1
+        for text, colspan, rowspan in row:
+            while col in occupied:
+                col += 1
+            attrs = f' namest="col{col}" nameend="col{col + colspan - 1}"' if colspan > 1 else ''
+            attrs += f' morerows="{rowspan - 1}"' if rowspan > 1 else ''
+            entries.append(f'<{ns}entry{attrs}>{escape(text)}</{ns}entry>')
+            col += colspan
+        return f"<{ns}row>{''.join(entries)}</{ns}row>"
+
+    n_cols = sum(colspan for _, colspan, _ in table.rows[0])
+    head = render_row(table.rows[0], set())
+    body = list()
+    occupied = set()
+    for row in table.rows[1:]:
+        body.append(render_row(row, occupied))
+        occupied = {1} if row[0][2] > 1 else set()
+    colspecs = ''.join(f'<{ns}colspec colname="col{i + 1}"/>' for i in range(n_cols))
+    return f'<{ns}tgroup cols="{n_cols}">{colspecs}<{ns}thead>{head}</{ns}thead>' \
+           f'<{ns}tbody>{"".join(body)}</{ns}tbody></{ns}tgroup>'
+
+
+def generate_xml_elsevier(doc: SyntheticDocument) -> bytes:
+    counter = iter(range(1, 1 << 30))
+    tables = list()
+
+    def render_section(level, section):
+        n = next(counter)
+        parts = [f'<ce:label>{n}</ce:label><ce:section-title>{escape(section.title)}</ce:section-title>']
+        parts += [f'<ce:para id="p{n:04d}{i}">{escape(p)}</ce:para>' for i, p in enumerate(section.paragraphs)]
+        tables.extend(section.tables)
+        parts += [render_section(level + 1, sub) for sub in section.subsections]
+        return f'<ce:section id="s{n:04d}">{"".join(parts)}</ce:section>'
+
+    sections = ''.join(render_section(0, s) for s in doc.sections)
+    floats = ''.join(
+        f'<ce:table id="tbl{i + 1}" frame="topbot"><ce:label>{escape(t.label)}</ce:label><ce:caption>'
+        f'<ce:simple-para>{escape(t.caption)}</ce:simple-para></ce:caption>{render_cals_rows(t, "cals:")}'
+        f'<ce:table-footnote><ce:note-para>{escape(t.footnotes[0])}</ce:note-para></ce:table-footnote></ce:table>'
+        for i, t in enumerate(tables)
+    )
+    references = ''.join(
+        f'<ce:bib-reference id="bib{i + 1}"><ce:label>{i + 1}</ce:label><sb:reference><sb:contribution>'
+        f'<sb:title><sb:maintitle>{escape(r)}</sb:maintitle></sb:title></sb:contribution></sb:reference>'
+        f'</ce:bib-reference>'
+        for i, r in enumerate(doc.references)
+    )
+    if references:
+        references = f'<tail><ce:bibliography xmlns:sb="http://www.elsevier.com/xml/common/struct-bib/dtd">' \
+                     f'<ce:bibliography-sec>{references}</ce:bibliography-sec></ce:bibliography></tail>'
+    xml = f'<?xml version="1.0" encoding="UTF-8"?>' \
+          f'<full-text-retrieval-response xmlns="http://www.elsevier.com/xml/svapi/article/dtd" ' \
+          f'xmlns:xocs="http://www.elsevier.com/xml/xocs/dtd" xmlns:ce="http://www.elsevier.com/xml/common/dtd" ' \
+          f'xmlns:cals="http://www.elsevier.com/xml/common/cals/dtd" xmlns:dc="http://purl.org/dc/elements/1.1/" ' \
+          f'xmlns:prism="http://prismstandard.org/namespaces/basic/2.0/">' \
+          f'<coredata><prism:doi>{doc.doi}</prism:doi><dc:title>{escape(doc.title)}</dc:title></coredata>' \
+          f'<originalText><xocs:doc><xocs:meta><xocs:doi>{doc.doi}</xocs:doi></xocs:meta><xocs:serial-item>' \
+          f'<article><head><ce:title>{escape(doc.title)}</ce:title><ce:abstract class="author">' \
+          f'<ce:section-title>Abstract</ce:section-title><ce:abstract-sec><ce:simple-para>{escape(doc.abstract)}' \
+          f'</ce:simple-para></ce:abstract-sec></ce:abstract></head><ce:floats>{floats}</ce:floats>' \
+          f'<body><ce:sections>{sections}</ce:sections></body>{references}</article></xocs:serial-item></xocs:doc>' \
+          f'</originalText></full-text-retrieval-response>'
+    return xml.encode('utf-8')
+
+
+def generate_xml_acs(doc: SyntheticDocument) -> bytes:
+    counter = iter(range(1, 1 << 30))
+
+    def render_table(table, n):
+        return f'<table-wrap id="tbl{n}"><label>{escape(table.label)}</label><caption><p>{escape(table.caption)}' \
+               f'</p></caption><oasis:table xmlns:oasis="http://www.niso.org/standards/z39-96/ns/oasis-exchange/table">' \
+               f'{render_cals_rows(table, "oasis:")}</oasis:table><table-wrap-foot><fn id="tbl{n}-fn1">' \
+               f'<p>{escape(table.footnotes[0])}</p></fn></table-wrap-foot></table-wrap>'
+
+    def render_section(level, section):
+        n = next(counter)
+        parts = [f'<label>{n}</label><title>{escape(section.title)}</title>']
+        paragraphs = [escape(p) for p in section.paragraphs]
+        for i, table in enumerate(section.tables):
+            paragraphs[-1] += render_table(table, f'{n}{i}')
+        parts += [f'<p>{p}</p>' for p in paragraphs]
+        parts += [render_section(level + 1, sub) for sub in section.subsections]
+        return f'<sec id="sec{n}">{"".join(parts)}</sec>'
+
+    references = ''.join(f'<ref id="ref{i + 1}"><mixed-citation>{escape(r)}</mixed-citation></ref>'
+                         for i, r in enumerate(doc.references))
+    if references:
+        references = f'<back><ref-list>{references}</ref-list></back>'
+    xml = f'<?xml version="1.0" encoding="UTF-8"?><article article-type="research-article">' \
+          f'<front><journal-meta><journal-title-group><journal-title>Journal of the American Chemical Society' \
+          f'</journal-title></journal-title-group><publisher><publisher-name>American Chemical Society' \
+          f'</publisher-name></publisher></journal-meta><article-meta><article-id pub-id-type="doi">{doc.doi}' \
+          f'</article-id><title-group><article-title>{escape(doc.title)}</article-title></title-group>' \
+          f'<abstract><p>{escape(doc.abstract)}</p></abstract></article-meta></front>' \
+          f'<body>{"".join(render_section(0, s) for s in doc.sections)}</body>{references}</article>'
+    return xml.encode('utf-8')
+
+
+GENERATORS: Dict[Tuple[str, str], Callable[[SyntheticDocument], bytes]] = {
+    ('html', 'nature'): generate_html_nature,
+    ('html', 'wiley'): generate_html_wiley,
+    ('html', 'rsc'): generate_html_rsc,
+    ('html', 'springer'): generate_html_springer,
+    ('html', 'aip'): generate_html_aip,
+    ('html', 'acs'): generate_html_acs,
+    ('html', 'elsevier'): generate_html_elsevier,
+    ('html', 'aaas'): generate_html_aaas,
+    ('xml', 'elsevier'): generate_xml_elsevier,
+    ('xml', 'acs'): generate_xml_acs,
+}
+assert set(k for t, k in GENERATORS if t == 'html') == set(SUPPORTED_HTML_PUBLISHERS)
+assert set(k for t, k in GENERATORS if t == 'xml') == set(SUPPORTED_XML_PUBLISHERS)
+
+
+def add_html_boilerplate(contents: bytes, config: SyntheticArticleConfig) -> bytes:
+    """
+    Surround the article with site navigation, scripts and a footer, which the parsers do not read
+    """
+    if not config.n_boilerplate:
+        return contents
+    rng = random.Random(f'boilerplate-{config.seed}')
+    menus = list()
+    for i in range(config.n_boilerplate):
+        links = ''.join(f'<li class="c-menu__item"><a class="c-menu__link" href="/subjects/{rng.choice(WORDS)}-{j}">'
+                        f'{rng.choice(WORDS).capitalize()}</a></li>' for j in range(20))
+        menus.append(f'<nav class="c-menu" aria-label="menu {i}"><ul class="c-menu__list">{links}</ul></nav>'
+                     f'<script type="text/javascript">window.dataLayer = window.dataLayer || [];'
+                     f'dataLayer.push({{"event": "menu-{i}", "content": "<p>{rng.choice(WORDS)}</p>"}});</script>')
+    header = ''.join(menus[:len(menus) // 2])
+    footer = ''.join(menus[len(menus) // 2:])
+    return contents.replace(b'<body>', f'<body><header class="c-site-header">{header}</header>'.encode('utf-8'), 1) \
+        .replace(b'</body>', f'<footer class="c-site-footer">{footer}</footer></body>'.encode('utf-8'), 1)
+
+
+def generate_article(file_type: str,
+                     publisher: str,
+                     config: Optional[SyntheticArticleConfig] = None,
+                     idx: Optional[int] = 0) -> SyntheticArticle:
+    """
+    Generate a synthetic article
+
+    Parameters
+    ----------
+    file_type: 'html' or 'xml'
+    publisher: one of `SUPPORTED_HTML_PUBLISHERS` or `SUPPORTED_XML_PUBLISHERS`
+    config: size and structure of the article
+    idx: index of the article; articles with different indices have different contents and dois
+
+    Returns
+    -------
+    SyntheticArticle
+    """
+    config = config if config is not None else SyntheticArticleConfig()
+    doc = generate_document(publisher, config, idx)
+    contents = GENERATORS[(file_type, publisher)](doc)
+    if file_type == 'html':
+        contents = add_html_boilerplate(contents, config)
+    return SyntheticArticle(publisher=publisher, file_type=file_type, doi=doc.doi, contents=contents)
+
+
+def iter_synthetic_articles(config: Optional[SyntheticArticleConfig] = None,
+                            n_per_publisher: Optional[int] = 1,
+                            publishers: Optional[List[Tuple[str, str]]] = None) -> Iterator[SyntheticArticle]:
+    """
+    Generate articles for each (file type, publisher) pair; all pairs by default
+    """
+    for file_type, publisher in (publishers or GENERATORS):
+        for idx in range(n_per_publisher):
+            yield generate_article(file_type, publisher, config, idx)
+
+
+def write_synthetic_corpus(output_dir: str,
+                           config: Optional[SyntheticArticleConfig] = None,
+                           n_per_publisher: Optional[int] = 1,
+                           publishers: Optional[List[Tuple[str, str]]] = None) -> List[str]:
+    """
+    Save synthetic articles to `output_dir/<file type>-<publisher>/`, e.g., for end-to-end runs of
+    `process_articles.py`
+
+    Returns
+    -------
+    paths to the saved files
+    """
+    file_paths = list()
+    for article in iter_synthetic_articles(config, n_per_publisher, publishers):
+        folder = os.path.join(output_dir, f'{article.file_type}-{article.publisher}')
+        os.makedirs(folder, exist_ok=True)
+        file_path = os.path.join(folder, article.file_name)
+        with open(file_path, 'wb') as f:
+            f.write(article.contents)
+        file_paths.append(file_path)
+    return file_paths
@@ -0,0 +1,162 @@
+"""
+Check that the single-parse html path produces the same articles as the original double parse.
+
+Every html file of the reference set is parsed with `tree_builder='legacy'` (lxml to detect the
+publisher and doi, then html5lib for Elsevier and RSC) and with the compared tree builders.
+Articles are compared by their serialized bytes; differences are reported per file with the
+first differing elements. Parsing times are reported per publisher.
+
+`--html_backends` overrides the backend of publishers for the compared tree builders, to check
+and time another backend before switching to it (see `cap.registry`).
+
+Example:
+    python -m benchmarks.html_parity --reference_dir </path/to/html/files> --tree_builders auto lxml
+    python -m benchmarks.html_parity --reference_dir </path/to/html/files> --html_backends elsevier=lxml
+"""
+import os
+import sys
+import time
+import difflib
+import logging
+from transformers import HfArgumentParser
+from typing import Optional, List, Dict
+from dataclasses import dataclass, field
+
+from seqlbtoolkit.IO import set_logging, logging_args
+
+from cap.article_constr import parse_html
+from cap.io import iter_article_files
+from cap.registry import set_backends
+from cap.serialization import dumps
+
+from .generators import SyntheticArticleConfig, generate_article, GENERATORS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HtmlParityArgs:
+    reference_dir: Optional[str] = field(
+        default=None,
+        metadata={'help': 'Html articles to compare the outputs on (any input accepted by `process_articles.py`). '
+                          'Synthetic articles of every publisher are used if not set.'}
+    )
+    tree_builders: Optional[List[str]] = field(
+        default_factory=lambda: ['auto'],
+        metadata={'help': "Tree builders compared with 'legacy'."}
+    )
+    html_backends: Optional[List[str]] = field(
+        default=None,
+        metadata={'help': "Backend overrides as 'publisher=backend' items, e.g., 'rsc=html.parser'. "
+                          "Applied to the compared tree builders, not to 'legacy'."}
+    )
+    n_synthetic: Optional[int] = field(
+        default=3, metadata={'help': 'Number of synthetic articles per publisher, if `reference_dir` is not set.'}
+    )
+    n_boilerplate: Optional[int] = field(
+        default=0, metadata={'help': 'Navigation menus and scripts added around the synthetic articles.'}
+    )
+    max_reported_lines: Optional[int] = field(
+        default=10, metadata={'help': 'Maximum number of differing lines reported per article.'}
+    )
+    log_file: Optional[str] = field(
+        default='', metadata={"help": "the directory of the log file. Set to '' to disable logging"}
+    )
+
+
+def describe_article(article) -> List[str]:
+    """
+    One line per article component, for reporting differences
+    """
+    lines = [f'doi: {article.doi}', f'publisher: {article.publisher}',
+             f'title: {article.title.text if article.title else None}',
+             f'abstract: {article.abstract.text if article.abstract else None}']
+    for element in article.sections:
+        content = element.content
+        lines.append(f'{element.type.name}: {content.text if hasattr(content, "text") else content}')
+    return lines
+
+
+def iter_reference_files(args: HtmlParityArgs):
+    if args.reference_dir:
+        for article_file in iter_article_files(args.reference_dir):
+            if article_file.file_type == 'html':
+                yield article_file.path, article_file.read()
+        return
+    for file_type, publisher in GENERATORS:
+        if file_type != 'html':
+            continue
+        for seed in range(args.n_synthetic):
+            article_file = generate_article(file_type, publisher, SyntheticArticleConfig(n_boilerplate=args.n_boilerplate, seed=seed))
+            yield article_file.file_name, article_file.contents
+
+
+def check_parity(args: HtmlParityArgs) -> int:
+    set_logging(args.log_file)
+    logger.setLevel(logging.INFO)
+
+    logging_args(args)
+    set_backends(args.html_backends)
+
+    # tree builder -> publisher -> parsing time
+    times: Dict[str, Dict[str, float]] = {tree_builder: dict() for tree_builder in ['legacy'] + args.tree_builders}
+    n_different = {tree_builder: 0 for tree_builder in args.tree_builders}
+    n_files = 0
+    for file_path, contents in iter_reference_files(args):
+        outputs = dict()
+        elapsed = dict()
+        for tree_builder in times:
+            start = time.perf_counter()
+            try:
+                article, _ = parse_html(file_path, contents, tree_builder=tree_builder)
+                outputs[tree_builder] = article
+            except Exception as e:
+                outputs[tree_builder] = e
+            elapsed[tree_builder] = time.perf_counter() - start
+        n_files += 1
+
+        reference = outputs['legacy']
+        publisher = '<failed>' if isinstance(reference, Exception) else reference.publisher
+        for tree_builder, t in elapsed.items():
+            times[tree_builder][publisher] = times[tree_builder].get(publisher, 0.0) + t
+        for tree_builder in args.tree_builders:
+            output = outputs[tree_builder]
+            if isinstance(reference, Exception) or isinstance(output, Exception):
+                if repr(reference) != repr(output):
+                    n_different[tree_builder] += 1
+                    logger.warning(f"[{tree_builder}] {file_path}: {output!r} != legacy {reference!r}")
+                continue
+            if dumps(output) == dumps(reference):
+                continue
+            n_different[tree_builder] += 1
+            diff = list(difflib.unified_diff(describe_article(reference), describe_article(output), lineterm='', n=0))
+            logger.warning(f"[{tree_builder}] {file_path} differs from legacy:\n" +
+                           '\n'.join(line[:200] for line in diff[2:2 + args.max_reported_lines]))
+
+    publishers = sorted(set(publisher for publisher_times in times.values() for publisher in publisher_times))
+    for tree_builder, publisher_times in times.items():
+        elapsed = sum(publisher_times.values())
+        legacy_elapsed = sum(times['legacy'].values())
+        summary = f"{tree_builder:<8} {elapsed:8.2f}s"
+        if tree_builder != 'legacy':
+            summary += f"  speedup {legacy_elapsed / elapsed if elapsed > 0 else 0:5.2f}x  " \
+                       f"{n_different[tree_builder]} of {n_files} articles differ"
+        logger.info(summary)
+        for publisher in publishers:
+            t = publisher_times.get(publisher, 0.0)
+            line = f"  {publisher:<10} {t:8.2f}s"
+            if tree_builder != 'legacy':
+                line += f"  speedup {times['legacy'].get(publisher, 0.0) / t if t > 0 else 0:5.2f}x"
+            logger.info(line)
+    return 1 if any(n_different.values()) else 0
+
+
+if __name__ == '__main__':
+    # --- set up arguments ---
+    parser = HfArgumentParser(HtmlParityArgs)
+    if len(sys.argv) == 2 and sys.argv[1].endswith(".json"):
+        parity_args, = parser.parse_json_file(json_file=os.path.abspath(sys.argv[1]))
+    else:
+        parity_args, = parser.parse_args_into_dataclasses()
+
+    sys.exit(check_parity(args=parity_args))
@@ -0,0 +1,90 @@
+"""
+Time the text accumulation of Elsevier html leaf sections on synthetic sections with long paragraphs.
+
+For every size, a leaf section holding one paragraph of `size` inline-formatted words (i.e., about
+two strings per word, as the italic symbols and subscripts of formulae split the paragraph text) is
+built, and `get_leaf_section_elements` is timed on it. The time per string stays about constant if
+the paragraph text is accumulated in linear time.
+
+The sections are built with lxml rather than html5lib, which `parse_html` uses for Elsevier pages:
+the tree of this markup is the same, and html5lib takes minutes to build the largest paragraphs.
+
+Example:
+    python -m benchmarks.leaf_sections --sizes 1000 10000 100000
+"""
+import os
+import sys
+import time
+import random
+import logging
+from transformers import HfArgumentParser
+from typing import Optional, List
+from dataclasses import dataclass, field
+
+from bs4 import BeautifulSoup
+from seqlbtoolkit.IO import set_logging, logging_args
+
+from cap.section_extr import get_leaf_section_elements
+
+from .generators import WORDS
+
+logger = logging.getLogger(__name__)
+
+INLINE_TAGS = ('i', 'sub', 'sup', 'span')
+
+
+@dataclass
+class LeafSectionsArgs:
+    sizes: Optional[List[int]] = field(
+        default_factory=lambda: [1000, 10000, 100000],
+        metadata={'help': 'Number of inline-formatted words in the paragraph of the synthetic leaf sections.'}
+    )
+    n_repeats: Optional[int] = field(
+        default=3, metadata={'help': 'Number of timed runs per size; the fastest is reported.'}
+    )
+    seed: Optional[int] = field(default=0, metadata={'help': 'Seed of the words of the paragraphs.'})
+    log_file: Optional[str] = field(
+        default='', metadata={"help": "the directory of the log file. Set to '' to disable logging"}
+    )
+
+
+def generate_leaf_section(size: int, seed: Optional[int] = 0) -> str:
+    rng = random.Random(seed)
+    words = list()
+    for _ in range(size):
+        tag = rng.choice(INLINE_TAGS)
+        words.append(f'{rng.choice(WORDS)} <{tag}>{rng.choice(WORDS)}</{tag}>')
+    return f'<html><body><section id="sec1"><h2>Results</h2><p>{" ".join(words)}</p></section></body></html>'
+
+
+def time_leaf_sections(args: LeafSectionsArgs):
+    set_logging(args.log_file)
+    logger.setLevel(logging.INFO)
+
+    logging_args(args)
+
+    logger.info(f"{'size':>8} {'strings':>9} {'chars':>10} {'time':>9} {'per string':>11}")
+    for size in args.sizes:
+        soup = BeautifulSoup(generate_leaf_section(size, args.seed), 'lxml')
+        section = soup.find('section')
+        n_strings = sum(1 for _ in section.strings)
+
+        elapsed = float('inf')
+        elements = list()
+        for _ in range(args.n_repeats):
+            start = time.perf_counter()
+            elements = get_leaf_section_elements(section)
+            elapsed = min(elapsed, time.perf_counter() - start)
+        n_chars = sum(len(ele) for ele in elements if isinstance(ele, str))
+        logger.info(f"{size:>8} {n_strings:>9} {n_chars:>10} {elapsed:>8.3f}s {elapsed / n_strings * 1e6:>9.2f}us")
+
+
+if __name__ == '__main__':
+    # --- set up arguments ---
+    parser = HfArgumentParser(LeafSectionsArgs)
+    if len(sys.argv) == 2 and sys.argv[1].endswith(".json"):
+        leaf_args, = parser.parse_json_file(json_file=os.path.abspath(sys.argv[1]))
+    else:
+        leaf_args, = parser.parse_args_into_dataclasses()
+
+    time_leaf_sections(args=leaf_args)
@@ -0,0 +1,74 @@
+"""
+Time the Elsevier html section walker on synthetic pages with deeply nested sections.
+
+For every depth, a synthetic Elsevier page with a single chain of nested sections is built with
+html5lib, as `parse_html` does, and `html_section_extract_elsevier` is timed on its body. The time
+per tag of the page stays about constant if the walker is linear in the size of the DOM.
+
+Example:
+    python -m benchmarks.nested_sections --depths 16 64 256
+"""
+import os
+import sys
+import time
+import logging
+from transformers import HfArgumentParser
+from typing import Optional, List
+from dataclasses import dataclass, field
+
+from bs4 import BeautifulSoup
+from seqlbtoolkit.IO import set_logging, logging_args
+
+from cap.section_extr import html_section_extract_elsevier
+
+from .generators import SyntheticArticleConfig, generate_article
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class NestedSectionsArgs:
+    depths: Optional[List[int]] = field(
+        default_factory=lambda: [16, 64, 256],
+        metadata={'help': 'Section nesting depths of the synthetic pages.'}
+    )
+    n_paragraphs: Optional[int] = field(default=2, metadata={'help': 'Number of paragraphs per section.'})
+    n_repeats: Optional[int] = field(
+        default=3, metadata={'help': 'Number of timed runs per depth; the fastest is reported.'}
+    )
+    log_file: Optional[str] = field(
+        default='', metadata={"help": "the directory of the log file. Set to '' to disable logging"}
+    )
+
+
+def time_nested_sections(args: NestedSectionsArgs):
+    set_logging(args.log_file)
+    logger.setLevel(logging.INFO)
+
+    logging_args(args)
+
+    logger.info(f"{'depth':>6} {'tags':>8} {'elements':>9} {'time':>9} {'per tag':>9}")
+    for depth in args.depths:
+        config = SyntheticArticleConfig(n_sections=1, n_paragraphs=args.n_paragraphs, n_tables=0, depth=depth)
+        article_file = generate_article('html', 'elsevier', config)
+        soup = BeautifulSoup(article_file.contents.decode('utf-8'), 'html5lib')
+        n_tags = sum(1 for _ in soup.body.find_all(True))
+
+        elapsed = float('inf')
+        element_list = list()
+        for _ in range(args.n_repeats):
+            start = time.perf_counter()
+            element_list = html_section_extract_elsevier(section_root=soup.body)
+            elapsed = min(elapsed, time.perf_counter() - start)
+        logger.info(f"{depth:>6} {n_tags:>8} {len(element_list):>9} {elapsed:>8.3f}s {elapsed / n_tags * 1e6:>7.1f}us")
+
+
+if __name__ == '__main__':
+    # --- set up arguments ---
+    parser = HfArgumentParser(NestedSectionsArgs)
+    if len(sys.argv) == 2 and sys.argv[1].endswith(".json"):
+        nested_args, = parser.parse_json_file(json_file=os.path.abspath(sys.argv[1]))
+    else:
+        nested_args, = parser.parse_args_into_dataclasses()
+
+    time_nested_sections(args=nested_args)
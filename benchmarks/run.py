@@ -0,0 +1,301 @@
+"""
+Run the parser benchmarks on synthetic articles and compare them with a stored baseline.
+
+Example:
+    python -m benchmarks.run --baseline_path benchmarks/baseline.json --save_baseline
+    python -m benchmarks.run --baseline_path benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import logging
+import platform
+import statistics
+from datetime import datetime
+from transformers import HfArgumentParser
+from typing import Optional, List, Callable, Dict
+from dataclasses import dataclass, field, asdict
+
+from seqlbtoolkit.IO import set_logging, logging_args
+
+from cap.article import ArticleElementType
+from cap.article_constr import parse_html, parse_xml
+from cap.constants import PARSER_VERSION
+from cap.paragraph import Paragraph
+from cap.table import Table, TableRow, TableCell
+from cap import serialization
+
+from .generators import (
+    GENERATORS,
+    SyntheticArticleConfig,
+    generate_article,
+    generate_document,
+    iter_sections,
+    write_synthetic_corpus
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BenchmarkArgs:
+    publishers: Optional[List[str]] = field(
+        default_factory=list,
+        metadata={'help': "Benchmarked '<file type>-<publisher>' pairs, e.g., 'html-rsc xml-acs'. All by default."}
+    )
+    n_repeats: Optional[int] = field(
+        default=5, metadata={'help': 'Number of timed runs of each benchmark; the median is reported.'}
+    )
+    n_sections: Optional[int] = field(default=5, metadata={'help': 'Number of top-level sections per article.'})
+    n_paragraphs: Optional[int] = field(default=3, metadata={'help': 'Number of paragraphs per section.'})
+    n_sentences: Optional[int] = field(default=4, metadata={'help': 'Number of sentences per paragraph.'})
+    n_tables: Optional[int] = field(default=2, metadata={'help': 'Number of tables per article.'})
+    depth: Optional[int] = field(default=1, metadata={'help': 'Section nesting depth.'})
+    seed: Optional[int] = field(default=0, metadata={'help': 'Seed of the synthetic article generators.'})
+    baseline_path: Optional[str] = field(
+        default=None, metadata={'help': 'Baseline results to compare with (json).'}
+    )
+    save_baseline: Optional[bool] = field(
+        default=False, metadata={'help': 'Save the results to `baseline_path` instead of comparing with it.'}
+    )
+    tolerance: Optional[float] = field(
+        default=0.25,
+        metadata={'help': 'A benchmark regresses if its median time exceeds the baseline by this fraction.'}
+    )
+    output_path: Optional[str] = field(
+        default=None, metadata={'help': 'Where to save the results of this run (json).'}
+    )
+    corpus_dir: Optional[str] = field(
+        default=None,
+        metadata={'help': 'Only write the synthetic articles to this folder (e.g., to run `process_articles.py` '
+                          'on them) and exit.'}
+    )
+    log_file: Optional[str] = field(
+        default='', metadata={"help": "the directory of the log file. Set to '' to disable logging"}
+    )
+
+    @property
+    def config(self):
+        return SyntheticArticleConfig(
+            n_sections=self.n_sections,
+            n_paragraphs=self.n_paragraphs,
+            n_sentences=self.n_sentences,
+            n_tables=self.n_tables,
+            depth=self.depth,
+            seed=self.seed
+        )
+
+    @property
+    def publisher_pairs(self):
+        if not self.publishers:
+            return list(GENERATORS)
+        pairs = [tuple(p.split('-', 1)) for p in self.publishers]
+        for pair in pairs:
+            if pair not in GENERATORS:
+                raise ValueError(f"Unknown publisher {'-'.join(pair)}; choose from "
+                                 f"{['-'.join(k) for k in GENERATORS]}")
+        return pairs
+
+
+def time_function(func: Callable, n_repeats: int) -> Dict[str, float]:
+    times = list()
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'median': statistics.median(times), 'min': min(times)}
+
+
+def count_elements(article) -> Dict[str, int]:
+    """
+    Structural summary of a parsed article, compared with the baseline to catch changes in the output
+    """
+    counts = {t.name.lower(): 0 for t in ArticleElementType}
+    for element in article.sections:
+        counts[element.type.name.lower()] += 1
+    counts['abstract_chars'] = len(article.abstract.text) if article.abstract else 0
+    counts['title_chars'] = len(article.title.text) if article.title else 0
+    return counts
+
+
+def benchmark_parsing(args: BenchmarkArgs, results: dict):
+    for file_type, publisher in args.publisher_pairs:
+        article_file = generate_article(file_type, publisher, args.config)
+        parse = parse_html if file_type == 'html' else parse_xml
+        name = f'parse/{file_type}-{publisher}'
+        try:
+            article, component_check = parse(article_file.file_name, article_file.contents)
+            results[name] = time_function(lambda: parse(article_file.file_name, article_file.contents), args.n_repeats)
+        except Exception as e:
+            logger.error(f"Failed to benchmark {name}. Error: {e}")
+            results[name] = {'error': repr(e)}
+            continue
+        results[name]['checks'] = count_elements(article)
+        results[name]['checks']['doi_matches'] = article.doi == article_file.doi
+        results[name]['size_kb'] = len(article_file.contents) / 1024
+
+
+def benchmark_paragraph(args: BenchmarkArgs, results: dict):
+    doc = generate_document('nature', args.config)
+    texts = [p for _, section in iter_sections(doc.sections) for p in section.paragraphs]
+    name = 'paragraph/construct'
+    try:
+        results[name] = time_function(lambda: [Paragraph(text) for text in texts], args.n_repeats)
+    except Exception as e:
+        logger.error(f"Failed to benchmark {name}. Error: {e}")
+        results[name] = {'error': repr(e)}
+        return
+    results[name]['checks'] = {'n_paragraphs': len(texts)}
+
+
+def benchmark_table(args: BenchmarkArgs, results: dict):
+    doc = generate_document('wiley', args.config)
+    tables = [t for _, section in iter_sections(doc.sections) for t in section.tables]
+    if not tables:
+        return
+
+    def format_tables():
+        for table in tables:
+            rows = [TableRow([TableCell(text, colspan, rowspan) for text, colspan, rowspan in row]) for row in table.rows]
+            Table(caption=table.caption, rows=rows, footnotes=table.footnotes).format_rows()
+
+    name = 'table/format_rows'
+    results[name] = time_function(format_tables, args.n_repeats)
+    results[name]['checks'] = {'n_tables': len(tables)}
+
+
+def benchmark_serializers(args: BenchmarkArgs, results: dict):
+    article_file = generate_article('html', 'wiley', args.config)
+    try:
+        article, _ = parse_html(article_file.file_name, article_file.contents)
+    except Exception as e:
+        logger.error(f"Failed to parse the article to serialize. Error: {e}")
+        return
+
+    serializers = {
+        'pickle': (lambda x: pickle.dumps(x, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+        'cap': (serialization.dumps, serialization.loads),
+    }
+    try:
+        import io
+        import torch
+
+        def torch_dumps(x):
+            buffer = io.BytesIO()
+            torch.save(x, buffer)
+            return buffer.getvalue()
+
+        serializers['torch'] = (torch_dumps, lambda b: torch.load(io.BytesIO(b)))
+    except ImportError:
+        logger.info("torch is not installed; skipping the torch serializer")
+
+    for serializer_name, (dumps, loads) in serializers.items():
+        data = dumps(article)
+        results[f'serialize/{serializer_name}/dump'] = time_function(lambda: dumps(article), args.n_repeats)
+        results[f'serialize/{serializer_name}/load'] = time_function(lambda: loads(data), args.n_repeats)
+        results[f'serialize/{serializer_name}/dump']['size_kb'] = len(data) / 1024
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Returns
+    -------
+    descriptions of the regressions
+    """
+    regressions = list()
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None or 'median' not in base:
+            continue
+        if 'median' not in result:
+            regressions.append(f"{name}: failed ({result.get('error')}) but succeeded in the baseline")
+            continue
+        ratio = result['median'] / base['median'] if base['median'] > 0 else 1.0
+        result['baseline_ratio'] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: {ratio:.2f}x slower than the baseline")
+        if base.get('checks') is not None and result.get('checks') != base['checks']:
+            regressions.append(f"{name}: output changed, {result.get('checks')} != {base['checks']}")
+    return regressions
+
+
+def format_results(results: dict) -> str:
+    header = f"{'benchmark':<36} {'median(ms)':>11} {'min(ms)':>9} {'vs base':>8}"
+    lines = [header, '-' * len(header)]
+    for name, result in results.items():
+        if 'median' not in result:
+            lines.append(f"{name:<36} {'ERROR':>11}")
+            continue
+        ratio = f"{result['baseline_ratio']:.2f}x" if 'baseline_ratio' in result else '-'
+        lines.append(f"{name:<36} {result['median'] * 1e3:>11.3f} {result['min'] * 1e3:>9.3f} {ratio:>8}")
+    return '\n'.join(lines)
+
+
+def run(args: BenchmarkArgs) -> int:
+    set_logging(args.log_file)
+    logger.setLevel(logging.INFO)
+
+    logging_args(args)
+
+    if args.corpus_dir:
+        file_paths = write_synthetic_corpus(args.corpus_dir, args.config, publishers=args.publisher_pairs)
+        logger.info(f"Saved {len(file_paths)} synthetic articles to {args.corpus_dir}")
+        return 0
+
+    results = dict()
+    benchmark_parsing(args, results)
+    benchmark_paragraph(args, results)
+    benchmark_table(args, results)
+    benchmark_serializers(args, results)
+
+    report = {
+        'meta': {
+            'parser_version': PARSER_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'config': asdict(args.config),
+            'n_repeats': args.n_repeats
+        },
+        'results': results
+    }
+
+    regressions = list()
+    if args.baseline_path and not args.save_baseline:
+        if os.path.isfile(args.baseline_path):
+            with open(args.baseline_path, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            if baseline['meta']['config'] != report['meta']['config']:
+                logger.warning("The baseline was recorded with a different article configuration; "
+                               "skipping the comparison.")
+            else:
+                regressions = compare_with_baseline(results, baseline['results'], args.tolerance)
+        else:
+            logger.warning(f"Baseline {args.baseline_path} does not exist.")
+
+    logger.info(f"Results:\n{format_results(results)}")
+
+    for path in (args.baseline_path if args.save_baseline else None, args.output_path):
+        if not path:
+            continue
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Results saved to {path}")
+
+    for regression in regressions:
+        logger.error(regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    # --- set up arguments ---
+    parser = HfArgumentParser(BenchmarkArgs)
+    if len(sys.argv) == 2 and sys.argv[1].endswith(".json"):
+        benchmark_args, = parser.parse_json_file(json_file=os.path.abspath(sys.argv[1]))
+    else:
+        benchmark_args, = parser.parse_args_into_dataclasses()
+
+    sys.exit(run(args=benchmark_args))
@@ -0,0 +1,170 @@
+"""
+Check that the streaming XML constructors produce the same articles as the ones on the whole tree.
+
+Every xml file of the reference set whose publisher has a streaming constructor (see `cap.registry`)
+is parsed into an element tree and its article constructed as with the 'etree' backend, and it is
+constructed again with the streaming constructor of the 'iterparse' backend. Articles are compared by
+their serialized bytes. The time and the peak memory allocated by both (traced by `tracemalloc`,
+in a separate run) are reported per publisher.
+
+Example:
+    python -m benchmarks.xml_streaming --reference_dir </path/to/xml/files>
+    python -m benchmarks.xml_streaming --n_sections 40 --n_references 2000
+"""
+import os
+import sys
+import time
+import difflib
+import logging
+import tracemalloc
+from transformers import HfArgumentParser
+from typing import Optional, Dict, List
+from dataclasses import dataclass, field
+
+from seqlbtoolkit.IO import set_logging, logging_args
+
+from cap.article_constr import build_xml_dom, check_xml_publisher
+from cap.registry import iter_publishers, get_publisher
+from cap.serialization import dumps
+
+from .html_parity import describe_article
+from .generators import SyntheticArticleConfig, generate_article, GENERATORS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class XmlStreamingArgs:
+    reference_dir: Optional[str] = field(
+        default=None,
+        metadata={'help': 'Xml articles to compare the outputs on (any input accepted by `process_articles.py`). '
+                          'Synthetic articles of the publishers with a streaming constructor are used if not set.'}
+    )
+    n_synthetic: Optional[int] = field(
+        default=3, metadata={'help': 'Number of synthetic articles per publisher, if `reference_dir` is not set.'}
+    )
+    n_sections: Optional[int] = field(default=5, metadata={'help': 'Number of top-level sections per synthetic article.'})
+    n_references: Optional[int] = field(
+        default=0, metadata={'help': 'Bibliography entries added after the body of the synthetic articles.'}
+    )
+    max_reported_lines: Optional[int] = field(
+        default=10, metadata={'help': 'Maximum number of differing lines reported per article.'}
+    )
+    log_file: Optional[str] = field(
+        default='', metadata={"help": "the directory of the log file. Set to '' to disable logging"}
+    )
+
+
+def iter_reference_files(args: XmlStreamingArgs):
+    if args.reference_dir:
+        from cap.io import iter_article_files
+        for article_file in iter_article_files(args.reference_dir):
+            if article_file.file_type == 'xml':
+                yield article_file.path, article_file.read()
+        return
+    streaming_publishers = set(spec.name for spec in iter_publishers('xml') if spec.streaming_constructor is not None)
+    for file_type, publisher in GENERATORS:
+        if file_type != 'xml' or publisher not in streaming_publishers:
+            continue
+        for seed in range(args.n_synthetic):
+            config = SyntheticArticleConfig(n_sections=args.n_sections, n_references=args.n_references, seed=seed)
+            article_file = generate_article(file_type, publisher, config)
+            yield article_file.file_name, article_file.contents
+
+
+def construct_from_tree(spec, contents: bytes):
+    root = build_xml_dom(contents, 'etree')
+    return spec.constructor(root, spec.doi_extractor(root))
+
+
+def construct_streaming(spec, contents: bytes):
+    return spec.streaming_constructor(contents, None)
+
+
+def run_timed(func, *func_args):
+    start = time.perf_counter()
+    try:
+        output = func(*func_args)
+    except Exception as e:
+        output = e
+    return output, time.perf_counter() - start
+
+
+def get_peak_memory(func, *func_args) -> int:
+    tracemalloc.start()
+    try:
+        func(*func_args)
+    except Exception:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def check_streaming_parity(args: XmlStreamingArgs) -> int:
+    set_logging(args.log_file)
+    logger.setLevel(logging.INFO)
+
+    logging_args(args)
+
+    # publisher -> [tree time, streaming time]
+    times: Dict[str, List[float]] = dict()
+    # publisher -> [max tree peak, max streaming peak, max file size]
+    peaks: Dict[str, List[int]] = dict()
+    n_files: Dict[str, int] = dict()
+    n_different = 0
+    for file_path, contents in iter_reference_files(args):
+        try:
+            spec = get_publisher('xml', check_xml_publisher(build_xml_dom(contents, 'etree')))
+        except Exception as e:
+            logger.warning(f"{file_path}: publisher not detected: {e!r}")
+            continue
+        if spec.streaming_constructor is None:
+            continue
+
+        reference, tree_time = run_timed(construct_from_tree, spec, contents)
+        output, streaming_time = run_timed(construct_streaming, spec, contents)
+
+        publisher_times = times.setdefault(spec.name, [0.0, 0.0])
+        publisher_times[0] += tree_time
+        publisher_times[1] += streaming_time
+        publisher_peaks = peaks.setdefault(spec.name, [0, 0, 0])
+        for i, peak in enumerate((get_peak_memory(construct_from_tree, spec, contents),
+                                  get_peak_memory(construct_streaming, spec, contents),
+                                  len(contents))):
+            publisher_peaks[i] = max(publisher_peaks[i], peak)
+        n_files[spec.name] = n_files.get(spec.name, 0) + 1
+
+        if isinstance(reference, Exception) or isinstance(output, Exception):
+            if repr(reference) != repr(output):
+                n_different += 1
+                logger.warning(f"{file_path}: {output!r} != {reference!r}")
+            continue
+        reference, output = reference[0], output[0]
+        if dumps(output) == dumps(reference):
+            continue
+        n_different += 1
+        diff = list(difflib.unified_diff(describe_article(reference), describe_article(output), lineterm='', n=0))
+        logger.warning(f"{file_path} differs:\n" + '\n'.join(line[:200] for line in diff[2:2 + args.max_reported_lines]))
+
+    mb = 1024 * 1024
+    logger.info(f"{'publisher':<10} {'files':>6} {'max size':>9} {'tree':>9} {'peak':>9} "
+                f"{'streaming':>10} {'peak':>9} {'speedup':>8}")
+    for publisher, (tree_time, streaming_time) in sorted(times.items()):
+        tree_peak, streaming_peak, max_size = peaks[publisher]
+        speedup = tree_time / streaming_time if streaming_time else 0
+        logger.info(f"{publisher:<10} {n_files[publisher]:>6} {max_size / mb:>7.2f}MB {tree_time:>8.3f}s "
+                    f"{tree_peak / mb:>7.2f}MB {streaming_time:>9.3f}s {streaming_peak / mb:>7.2f}MB {speedup:>7.2f}x")
+    logger.info(f"{n_different} of {sum(n_files.values())} articles differ")
+    return 1 if n_different else 0
+
+
+if __name__ == '__main__':
+    # --- set up arguments ---
+    parser = HfArgumentParser(XmlStreamingArgs)
+    if len(sys.argv) == 2 and sys.argv[1].endswith(".json"):
+        streaming_args, = parser.parse_json_file(json_file=os.path.abspath(sys.argv[1]))
+    else:
+        streaming_args, = parser.parse_args_into_dataclasses()
+
+    sys.exit(check_streaming_parity(args=streaming_args))
@@ -1,7 +1,12 @@
+import io
 import os
-from typing import Tuple
+import re
+import functools
+import itertools
+from typing import Tuple, Optional
 
-from bs4 import BeautifulSoup
+import lxml.html as lxml_html
+from bs4 import BeautifulSoup, SoupStrainer
 try:
     import xml.etree.cElementTree as ET
 except ImportError:
@@ -11,7 +16,39 @@ from .article import (
     Article,
     ArticleComponentCheck
 )
+from .profiling import profiler
+from .registry import (
+    PublisherSpec,
+    register_publisher,
+    get_publisher,
+    get_backend,
+    get_backend_name,
+    get_dom_functions,
+    PARSE_FILTERING_BACKENDS,
+    LXML_TREE_BACKEND,
+    STREAMING_XML_BACKEND,
+    has_detectors,
+    detect_publisher
+)
 from .section_extr import *
+from . import section_extr_lxml as lx
+from . import section_extr_stream as st
+from .sniff import sniff_html_doi, sniff_html_publisher, sniff_xml_publisher
+
+# built-in publishers whose pages are parsed with html5lib, which tolerates their illegally nested <p> and <span>
+HTML5LIB_PUBLISHERS = ('elsevier', 'rsc')
+
+# elements read by the constructors and doi extractors of the built-in publishers whose pages are built with lxml.
+# The ACS and AAAS constructors read the siblings of headings and walk the whole page, so they get the whole DOM
+HTML_PUBLISHER_REGIONS = {
+    'nature': (('title', {}), ('section', {}), ('a', {'data-track-action': 'view doi'})),
+    'wiley': (('title', {}), ('section', {}), ('a', {'class': 'epub-doi'})),
+    'springer': (('title', {}), ('section', {}), ('span', {'class': 'bibliographic-information__value'})),
+    'aip': (('title', {}), ('div', {'class': 'NLM_paragraph'}), ('div', {'class': 'publicationContentCitation'})),
+}
+
+HTML_BODY_PATTERN = re.compile(r"<body\b", re.I)
+HTML_META_TITLE_PATTERN = re.compile(r"<(?:meta|title)\b", re.I)
 
 
 class ArticleFunctions:
@@ -41,9 +78,7 @@ class ArticleFunctions:
             try:
                 if 'abs' in section['aria-labelledby'].lower() or section['data-title'] == 'Abstract':
                     abs_paras = section.find_all('p')
-                    abstract = ''
-                    for abs_para in abs_paras:
-                        abstract += abs_para.text
+                    abstract = ''.join(abs_para.text for abs_para in abs_paras)
                     abstract = format_text(abstract.strip())
                     abstract_idx = i
             except KeyError:
@@ -97,9 +132,7 @@ class ArticleFunctions:
             try:
                 if 'article-section__abstract' in section['class']:
                     abs_paras = section.find_all('p')
-                    abstract = ''
-                    for abs_para in abs_paras:
-                        abstract += abs_para.text
+                    abstract = ''.join(abs_para.text for abs_para in abs_paras)
                     abstract = format_text(abstract.strip())
             except KeyError:
                 pass
@@ -213,9 +246,7 @@ class ArticleFunctions:
                     is_abs = True
             if is_abs:
                 abs_paras = section.find_all('p')
-                abstract = ''
-                for abs_para in abs_paras:
-                    abstract += abs_para.text
+                abstract = ''.join(abs_para.text for abs_para in abs_paras)
                 abstract = format_text(abstract.strip())
                 abstract_idx = i
         if not abstract:
@@ -411,11 +442,15 @@ class ArticleFunctions:
         article.doi = doi
         article.publisher = 'elsevier'
 
-        ori_txt = root.findall(r'{http://www.elsevier.com/xml/svapi/article/dtd}originalText')[0]
-        doc = ori_txt.findall(r'{http://www.elsevier.com/xml/xocs/dtd}doc')[0]
+        ori_txt = root.findall(ELSEVIER_ORIGINAL_TEXT_TAG)[0]
+        doc = ori_txt.findall(ELSEVIER_DOC_TAG)[0]
+
+        # the title, abstract, tables and sections are found in a single traversal of the document
+        title_element, abs_element, table_elements, sections_element = find_xml_components_elsevier(doc)
 
         # get title
-        title_element = list(doc.iter(tag=r'{http://www.elsevier.com/xml/common/dtd}title'))[-1]
+        if title_element is None:
+            raise IndexError('list index out of range')
         iter_txt = list()
         for txt in title_element.itertext():
             txt_s = txt.strip()
@@ -425,19 +460,9 @@ class ArticleFunctions:
         article.title = title
 
         # get abstract
-        abs_elements = list(doc.iter(tag=r'{http://www.elsevier.com/xml/common/dtd}abstract'))
-        abs_element = None
-        for abs_ele in abs_elements:
-            try:
-                if abs_ele.attrib['class'] == 'author':
-                    abs_element = abs_ele
-            except KeyError:
-                # print('[ERROR] keyword "class" does not exist!')
-                pass
-
         abs_paras = list()
         try:
-            for abs_ele in (abs_element.iter(tag=r'{http://www.elsevier.com/xml/common/dtd}simple-para')):
+            for abs_ele in (abs_element.iter(tag=ELSEVIER_SIMPLE_PARA_TAG)):
                 abs_text = list()
                 for txt in abs_ele.itertext():
                     txt_s = txt.strip()
@@ -451,7 +476,6 @@ class ArticleFunctions:
 
         # get tables
         try:
-            table_elements = list(doc.iter(tag=r'{http://www.elsevier.com/xml/common/dtd}table'))
             section_list = []
             for table_element in table_elements:
                 tbl = xml_table_extract_elsevier(table_element)
@@ -461,12 +485,14 @@ class ArticleFunctions:
             section_list = []
 
         # get article content
-        try:
-            sections_element = list(doc.iter(tag=r'{http://www.elsevier.com/xml/common/dtd}sections'))[-1]
-            section_list += xml_section_extract_elsevier(section_root=sections_element)
-        except Exception:
+        if sections_element is None:
             # print('[Warning] No section is detected!')
             article_component_check.sections = False
+        else:
+            try:
+                section_list += xml_section_extract_elsevier(section_root=sections_element)
+            except Exception:
+                article_component_check.sections = False
 
         new_section_list = list()
         for i in range(len(section_list)):
@@ -541,6 +567,319 @@ class ArticleFunctions:
         return article, article_component_check
 
 
+class ArticleFunctionsStream:
+    """
+    Constructors of the xml publishers on the raw file contents, used with the 'iterparse' backend.
+    The document is parsed incrementally and the subtrees are freed once they are read; the articles
+    are the same as the ones of their `ArticleFunctions` counterparts on the whole tree.
+    The doi is read from the document if it is not given.
+    """
+
+    @staticmethod
+    def article_construct_xml_elsevier(contents: bytes, doi: Optional[str] = None):
+        streamed = st.stream_xml_elsevier(contents)
+        if doi is None:
+            doi = st.get_streamed_doi(streamed)
+
+        article = Article()
+        article_component_check = ArticleComponentCheck()
+        article.doi = doi
+        article.publisher = 'elsevier'
+
+        if not streamed.has_doc or streamed.title is None:
+            raise IndexError('list index out of range')
+        article.title = streamed.title
+
+        if streamed.abstract is None:
+            article_component_check.abstract = False
+        article.abstract = streamed.abstract if streamed.abstract is not None else list()
+
+        section_list = list(streamed.tables)
+        if streamed.sections is None or streamed.section_error is not None:
+            article_component_check.sections = False
+        else:
+            section_list += streamed.sections
+
+        new_section_list = list()
+        for i in range(len(section_list)):
+            if section_list[i].type == ArticleElementType.SECTION_ID:
+                continue
+            elif section_list[i].type == ArticleElementType.SECTION_TITLE:
+                if i > 0 and section_list[i - 1].type == ArticleElementType.SECTION_ID:
+                    combined_section_title = section_list[i - 1].content + ' ' + section_list[i].content
+                    new_section_list.append(
+                        ArticleElement(type=ArticleElementType.SECTION_TITLE, content=combined_section_title)
+                    )
+                else:
+                    new_section_list.append(section_list[i])
+            else:
+                new_section_list.append(section_list[i])
+
+        article.sections = new_section_list
+
+        return article, article_component_check
+
+    @staticmethod
+    def article_construct_xml_acs(contents: bytes, doi: Optional[str] = None):
+        streamed = st.stream_xml_acs(contents)
+        if doi is None:
+            doi = st.get_streamed_doi(streamed)
+
+        article = Article()
+        article_component_check = ArticleComponentCheck()
+        article.doi = doi
+        article.publisher = 'acs'
+
+        if not streamed.has_doc:
+            raise IndexError('list index out of range')
+
+        title = format_text(''.join(streamed.title))
+        article.title = title
+
+        abstract = format_text(''.join(streamed.abstract))
+        if not abstract:
+            article_component_check.abstract = False
+        article.abstract = abstract
+
+        # get article content
+        if not streamed.has_body:
+            raise IndexError('list index out of range')
+        if streamed.section_error is not None:
+            raise streamed.section_error
+        section_list = streamed.sections
+        if not section_list:
+            article_component_check.sections = False
+
+        new_section_list = list()
+        for i in range(len(section_list)):
+            if section_list[i].type == ArticleElementType.SECTION_ID:
+                continue
+            elif section_list[i].type == ArticleElementType.SECTION_TITLE:
+                if i > 0 and section_list[i - 1].type == ArticleElementType.SECTION_ID:
+                    combined_section_title = section_list[i - 1].content + ' ' + section_list[i].content
+                    new_section_list.append(
+                        ArticleElement(type=ArticleElementType.SECTION_TITLE,
+                                       content=combined_section_title)
+                    )
+                else:
+                    new_section_list.append(section_list[i])
+            else:
+                new_section_list.append(section_list[i])
+
+        article.sections = new_section_list
+
+        return article, article_component_check
+
+
+class ArticleFunctionsLxml:
+    """
+    Constructors of the html publishers on `lxml.html` trees, used with the 'lxml.html' backend.
+    They give the same articles as their `ArticleFunctions` counterparts on the lxml soup.
+    """
+
+    @staticmethod
+    def article_construct_html_nature(root: lxml_html.HtmlElement, doi: str):
+        article = Article()
+        article_component_check = ArticleComponentCheck()
+        article.doi = doi
+        article.publisher = 'nature'
+
+        # --- get title ---
+        head = lx.find_first(root, 'head')
+        article.title = lx.get_text(lx.FIND_TITLES(head)[0]).split('|')[0].strip()
+
+        sections = lx.FIND_SECTIONS(lx.find_first(root, 'body'))
+
+        # --- get abstract ---
+        abstract = None
+        abstract_idx = None
+        for i, section in enumerate(sections):
+            labelled_by = section.get('aria-labelledby')
+            if labelled_by is None:
+                continue
+            if 'abs' in labelled_by.lower() or section.get('data-title') == 'Abstract':
+                abstract = ''.join(lx.get_text(p) for p in lx.FIND_PARAGRAPHS(section))
+                abstract = format_text(abstract.strip())
+                abstract_idx = i
+        if not abstract:
+            article_component_check.abstract = False
+        article.abstract = abstract
+
+        # --- get sections ---
+        element_list = list()
+        for i, section in enumerate(sections):
+            if i != abstract_idx:
+                lx.html_section_extract_nature(section_root=section, element_list=element_list)
+        if not element_list:
+            article_component_check.sections = False
+
+        article.sections = element_list
+        return article, article_component_check
+
+    @staticmethod
+    def article_construct_html_wiley(root: lxml_html.HtmlElement, doi: str):
+        article = Article()
+        article_component_check = ArticleComponentCheck()
+        article.doi = doi
+        article.publisher = 'wiley'
+
+        # --- get title ---
+        article.title = lx.get_text(lx.FIND_TITLES(root)[0]).split(' - ')[0].strip()
+
+        sections = lx.FIND_SECTIONS(lx.find_first(root, 'body'))
+
+        # --- get abstract ---
+        abstract = None
+        content_sections = None
+        for section in sections:
+            classes = lx.get_classes(section)
+            if 'article-section__abstract' in classes:
+                abstract = ''.join(lx.get_text(p) for p in lx.FIND_PARAGRAPHS(section))
+                abstract = format_text(abstract.strip())
+            if 'article-section__full' in classes:
+                content_sections = section
+        if not abstract:
+            article_component_check.abstract = False
+        article.abstract = abstract
+
+        # --- get sections ---
+        if content_sections is not None:
+            element_list = lx.html_section_extract_wiley(section_root=content_sections)
+        else:
+            element_list = []
+            article_component_check.sections = False
+
+        article.sections = element_list
+        return article, article_component_check
+
+    @staticmethod
+    def article_construct_html_springer(root: lxml_html.HtmlElement, doi: str):
+        article = Article()
+        article_component_check = ArticleComponentCheck()
+        article.doi = doi
+        article.publisher = 'springer'
+
+        # --- get title ---
+        head = lx.find_first(root, 'head')
+        article.title = lx.get_text(lx.FIND_TITLES(head)[0]).split('|')[0].strip()
+
+        sections = lx.FIND_SECTIONS(lx.find_first(root, 'body'))
+
+        # --- get abstract ---
+        abstract = ''
+        abstract_idx = None
+        for i, section in enumerate(sections):
+            keys = [section.get('data-title', '').lower()] + [c.lower() for c in lx.get_classes(section)]
+            if any('abstract' in key or 'summary' in key for key in keys):
+                abstract = ''.join(lx.get_text(p) for p in lx.FIND_PARAGRAPHS(section))
+                abstract = format_text(abstract.strip())
+                abstract_idx = i
+        if not abstract:
+            article_component_check.abstract = False
+        article.abstract = abstract
+
+        # --- get sections ---
+        element_list = list()
+        for i, section in enumerate(sections):
+            if i != abstract_idx and not lx.has_section_ancestor(section):
+                lx.html_section_extract_springer(section_root=section, element_list=element_list)
+        if not element_list:
+            article_component_check.sections = False
+
+        article.sections = element_list
+        return article, article_component_check
+
+    @staticmethod
+    def article_construct_html_aip(root: lxml_html.HtmlElement, doi: str):
+        article = Article()
+        article_component_check = ArticleComponentCheck()
+        article.doi = doi
+        article.publisher = 'aip'
+
+        # --- get title ---
+        head = lx.find_first(root, 'head')
+        article.title = lx.get_text(lx.FIND_TITLES(head)[0]).split(':')[0].strip()
+
+        element_list = lx.html_section_extract_aip(section_root=root)
+        if not element_list:
+            article_component_check.sections = False
+
+        article.sections = element_list
+        return article, article_component_check
+
+    @staticmethod
+    def article_construct_html_acs(root: lxml_html.HtmlElement, doi: str):
+        article = Article()
+        article_component_check = ArticleComponentCheck()
+        article.doi = doi
+        article.publisher = 'acs'
+
+        # --- get title ---
+        head = lx.find_first(root, 'head')
+        article.title = lx.get_text(lx.FIND_TITLES(head)[0]).split(' | ')[0].strip()
+
+        # --- get abstract ---
+        body = lx.find_first(root, 'body')
+        abs_h2 = None
+        for h2 in lx.FIND_H2S(body):
+            if (lx.get_classes(h2) or [''])[0] == 'article_abstract-title':
+                abs_h2 = h2
+        if abs_h2 is not None:
+            abstract = lx.get_next_sibling_text(abs_h2).strip()
+        else:
+            abs_p = None
+            for p in lx.FIND_PARAGRAPHS(body):
+                classes = lx.get_classes(p) if p.get('class') is not None else ['']
+                if classes[0] == 'articleBody_abstractText':
+                    abs_p = p
+            if abs_p is None:
+                abstract = ''
+                article_component_check.abstract = False
+            else:
+                abstract = lx.get_text(abs_p).strip()
+
+        article.abstract = format_text(abstract)
+
+        # --- get body sections ---
+        element_list = lx.html_section_extract_acs(section_root=root)
+        if not element_list:
+            article_component_check.sections = False
+
+        article.sections = element_list
+        return article, article_component_check
+
+    @staticmethod
+    def article_construct_html_aaas(root: lxml_html.HtmlElement, doi: str):
+        article = Article()
+        article_component_check = ArticleComponentCheck()
+        article.doi = doi
+        article.publisher = 'aaas'
+
+        # --- get title ---
+        head = lx.find_first(root, 'head')
+        article.title = lx.get_text(lx.FIND_TITLES(head)[0]).split(' | ')[0].strip()
+
+        # --- get abstract ---
+        body = lx.find_first(root, 'body')
+        abs_h2 = None
+        for h2 in lx.FIND_H2S(body):
+            if lx.get_text(h2).lower() == 'abstract':
+                abs_h2 = h2
+                break
+        abstract = format_text(lx.get_next_sibling_text(abs_h2)) if abs_h2 is not None else None
+        if not abstract:
+            article_component_check.abstract = False
+        article.abstract = abstract
+
+        # --- get body sections ---
+        element_list = lx.html_section_extract_aaas(section_root=body)
+        if not element_list:
+            article_component_check.sections = False
+        article.sections = element_list
+
+        return article, article_component_check
+
+
 def check_html_publisher(soup: bs4.BeautifulSoup):
     publisher = None
     try:
@@ -621,7 +960,8 @@ def check_xml_publisher(root: ET.Element):
 
 def search_html_doi_publisher(soup, publisher=None):
     if not publisher:
-        publisher = check_html_publisher(soup)
+        with profiler.stage('check_publisher'):
+            publisher = check_html_publisher(soup)
 
     if publisher == 'acs':
         doi_sec = soup.find_all('div', {'class': 'article_header-doiurl'})
@@ -667,13 +1007,15 @@ def search_html_doi_publisher(soup, publisher=None):
 
 def search_xml_doi_publisher(root, publisher=None):
     if not publisher:
-        publisher = check_xml_publisher(root)
+        with profiler.stage('check_publisher'):
+            publisher = check_xml_publisher(root)
 
+    # only the first doi element is read, so the traversal stops there
     if publisher == 'elsevier':
-        doi_sec = list(root.iter('{http://www.elsevier.com/xml/xocs/dtd}doi'))
+        doi_sec = list(itertools.islice(root.iter(ELSEVIER_DOI_TAG), 1))
         doi = doi_sec[0].text.strip().lower()
     elif publisher == 'acs':
-        doi_sec = list(root.iter('article-id'))
+        doi_sec = list(itertools.islice(root.iter('article-id'), 1))
         doi = doi_sec[0].text.strip().lower()
     else:
         raise ValueError('Unknown publisher')
@@ -681,13 +1023,173 @@ def search_xml_doi_publisher(root, publisher=None):
     return doi, publisher
 
 
-def parse_html(file_path: str) -> Tuple[Article, ArticleComponentCheck]:
+def decode_html_contents(contents: bytes) -> str:
+    """
+    Decode raw html bytes the same way as reading the file in text mode (utf-8, universal newlines)
+    """
+    return contents.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def get_html_head(contents: str) -> Optional[str]:
+    """
+    The part of an html document before <body>, if it holds all <meta> and <title> elements,
+    i.e., if `check_html_publisher` gives the same result for it as for the whole document
+    """
+    m = HTML_BODY_PATTERN.search(contents)
+    if not m or HTML_META_TITLE_PATTERN.search(contents, m.start()):
+        return None
+    return contents[:m.start()]
+
+
+def detect_html_publisher(contents: str) -> Optional[str]:
+    """
+    Detect the publisher of an html document from its head, without building the DOM of the body.
+    Used when `sniff_html_publisher` cannot decide from the leading bytes.
+
+    Returns
+    -------
+    the publisher, or None if it can only be detected from the whole document
+    """
+    head = get_html_head(contents)
+    if head is None:
+        return None
+    return check_html_publisher(BeautifulSoup(head, 'lxml'))
+
+
+def extract_html_doi(soup: bs4.BeautifulSoup, publisher: str) -> str:
+    doi, _ = search_html_doi_publisher(soup, publisher)
+    return doi
+
+
+def extract_xml_doi(root: ET.Element, publisher: str) -> str:
+    doi, _ = search_xml_doi_publisher(root, publisher)
+    return doi
+
+
+def register_builtin_publishers():
+    for publisher in ('nature', 'wiley', 'rsc', 'springer', 'aip', 'acs', 'elsevier', 'aaas'):
+        register_publisher(PublisherSpec(
+            name=publisher,
+            file_type='html',
+            constructor=getattr(ArticleFunctions, f'article_construct_html_{publisher}'),
+            doi_extractor=functools.partial(extract_html_doi, publisher=publisher),
+            doi_sniffer=functools.partial(sniff_html_doi, publisher=publisher),
+            backend='html5lib' if publisher in HTML5LIB_PUBLISHERS else 'lxml',
+            regions=HTML_PUBLISHER_REGIONS.get(publisher),
+            lxml_constructor=getattr(ArticleFunctionsLxml, f'article_construct_html_{publisher}', None),
+            lxml_doi_extractor=functools.partial(lx.search_html_doi_lxml, publisher=publisher)
+            if hasattr(ArticleFunctionsLxml, f'article_construct_html_{publisher}') else None
+        ))
+    for publisher in ('elsevier', 'acs'):
+        register_publisher(PublisherSpec(
+            name=publisher,
+            file_type='xml',
+            constructor=getattr(ArticleFunctions, f'article_construct_xml_{publisher}'),
+            doi_extractor=functools.partial(extract_xml_doi, publisher=publisher),
+            backend='etree',
+            streaming_constructor=getattr(ArticleFunctionsStream, f'article_construct_xml_{publisher}')
+        ))
+
+
+register_builtin_publishers()
+
+
+def get_html_backend(spec: PublisherSpec, tree_builder: str):
+    if tree_builder == 'lxml':
+        return 'lxml'
+    if tree_builder == 'legacy':
+        # the backend overrides are not applied to the reference behaviour
+        return spec.backend
+    return get_backend(spec)
+
+
+class RegionStrainer(SoupStrainer):
+    """
+    Keeps the elements matching any of the regions of a publisher (see `PublisherSpec.regions`).
+    Beautiful Soup only filters the top level, so the whole subtree of a matching element is kept.
+    """
+
+    def __init__(self, regions):
+        # the name rule makes Beautiful Soup drop the strings outside of the regions
+        super().__init__(name=list(set(tag for tag, _ in regions)))
+        self.regions = regions
+
+    def matches_region(self, name, attrs) -> bool:
+        attrs = attrs or dict()
+        for tag, region_attrs in self.regions:
+            if name != tag:
+                continue
+            for key, value in region_attrs.items():
+                attr_value = attrs.get(key)
+                if isinstance(attr_value, list):
+                    attr_value = ' '.join(attr_value)
+                if attr_value is None or (value not in attr_value if key == 'class' else value != attr_value):
+                    break
+            else:
+                return True
+        return False
+
+    # beautifulsoup4 >= 4.13
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        return self.matches_region(name, attrs)
+
+    # beautifulsoup4 < 4.13
+    def search_tag(self, markup_name=None, markup_attrs=None):
+        if isinstance(markup_name, bs4.element.Tag):
+            return markup_name if self.matches_region(markup_name.name, markup_name.attrs) else None
+        return markup_name if self.matches_region(markup_name, markup_attrs) else None
+
+
+def wrap_regions(soup: bs4.BeautifulSoup) -> bs4.BeautifulSoup:
+    """
+    Place the elements kept by a `RegionStrainer` in <head> and <body>, where the constructors look for them
+    """
+    html, head, body = soup.new_tag('html'), soup.new_tag('head'), soup.new_tag('body')
+    for element in list(soup.contents):
+        (head if element.name in ('title', 'meta') else body).append(element)
+    html.append(head)
+    html.append(body)
+    soup.append(html)
+    return soup
+
+
+def build_html_dom(contents: str, backend, regions=None):
+    with profiler.stage(f"{get_backend_name(backend).replace('.', '_')}_parse"):
+        if callable(backend):
+            return backend(contents)
+        if backend == LXML_TREE_BACKEND:
+            return lx.parse_lxml_html(contents)
+        if regions and backend in PARSE_FILTERING_BACKENDS:
+            return wrap_regions(BeautifulSoup(contents, backend, parse_only=RegionStrainer(regions)))
+        return BeautifulSoup(contents, backend)
+
+
+def build_xml_dom(contents: bytes, backend):
+    with profiler.stage('xml_parse'):
+        if callable(backend):
+            return backend(contents)
+        return ET.parse(io.BytesIO(contents)).getroot()
+
+
+def parse_html(file_path: str,
+               contents: Optional[bytes] = None,
+               tree_builder: Optional[str] = 'auto') -> Tuple[Article, ArticleComponentCheck]:
     """
     Parse html files
 
     Parameters
     ----------
     file_path: File name
+    contents: raw file contents, if they are already loaded
+    tree_builder: how the DOM is built.
+        'auto': the publisher and doi are detected from the head and raw contents, then the document
+        is parsed once, with the backend of the publisher in `cap.registry`
+        (html5lib for the publishers in `HTML5LIB_PUBLISHERS`, lxml for the other built-in publishers);
+        'legacy': the document is parsed with lxml to detect the publisher and doi, and parsed again
+        if the publisher registered another backend. Backend overrides (`cap.registry.set_backend`)
+        are ignored;
+        'lxml': like 'auto', but always with lxml. Faster, but the output may differ for
+        the publishers in `HTML5LIB_PUBLISHERS`; see `benchmarks.html_parity`
 
     Returns
     -------
@@ -695,32 +1197,71 @@ def parse_html(file_path: str) -> Tuple[Article, ArticleComponentCheck]:
     """
     file_path = os.path.normpath(file_path)
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        contents = f.read()
-    soup = BeautifulSoup(contents, 'lxml')
-
-    # get publisher and doi
-    doi, publisher = search_html_doi_publisher(soup)
+    if contents is None:
+        with profiler.stage('read'):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                contents = f.read()
+        raw_contents = None
+    else:
+        raw_contents = contents
+        contents = decode_html_contents(contents)
 
-    if publisher in ['elsevier', 'rsc']:
-        # allow illegal nested <p>
-        # soup = BeautifulSoup(contents, 'html.parser')
-        # allow nested <span>
-        soup = BeautifulSoup(contents, 'html5lib')
+    publisher = None
+    if tree_builder != 'legacy' or has_detectors('html'):
+        if raw_contents is None:
+            raw_contents = contents.encode('utf-8')
+        with profiler.stage('detect_publisher'):
+            # registered detectors come first, so that publishers added through entry points are recognized
+            publisher = detect_publisher('html', raw_contents)
+            if publisher is None and tree_builder != 'legacy':
+                publisher = sniff_html_publisher(raw_contents) or detect_html_publisher(contents)
+
+    if publisher is None:
+        with profiler.stage('lxml_parse'):
+            soup = BeautifulSoup(contents, 'lxml')
+
+        # get publisher and doi
+        with profiler.stage('search_doi_publisher'):
+            with profiler.stage('check_publisher'):
+                publisher = check_html_publisher(soup)
+            spec = get_publisher('html', publisher)
+            doi = spec.doi_extractor(soup)
+        profiler.set_publisher(publisher)
+
+        backend = get_html_backend(spec, tree_builder)
+        constructor, _ = get_dom_functions(spec, backend)
+        if backend != 'lxml':
+            # e.g., html5lib allows illegal nested <p> and <span>
+            soup = build_html_dom(contents, backend)
 
-    article_construct_func = getattr(ArticleFunctions, f'article_construct_html_{publisher}')
-    article, component_check = article_construct_func(soup=soup, doi=doi)
+    else:
+        spec = get_publisher('html', publisher)
+        profiler.set_publisher(publisher)
+        backend = get_html_backend(spec, tree_builder)
+        constructor, doi_extractor = get_dom_functions(spec, backend)
+        # the reference behaviour builds the whole page
+        regions = spec.regions if tree_builder != 'legacy' else None
+        soup = build_html_dom(contents, backend, regions)
+
+        with profiler.stage('search_doi_publisher'):
+            doi = spec.doi_sniffer(raw_contents) if spec.doi_sniffer is not None else None
+            if doi is None:
+                doi = doi_extractor(soup)
+
+    with profiler.stage('construct'):
+        article, component_check = constructor(soup, doi)
 
     return article, component_check
 
 
-def parse_xml(file_path: str) -> Tuple[Article, ArticleComponentCheck]:
+def parse_xml(file_path: str, contents: Optional[bytes] = None) -> Tuple[Article, ArticleComponentCheck]:
     """
     Parse xml files
 
     Parameters
     ----------
     file_path: File name
+    contents: raw file contents, if they are already loaded
 
     Returns
     -------
@@ -728,13 +1269,40 @@ def parse_xml(file_path: str) -> Tuple[Article, ArticleComponentCheck]:
     """
     file_path = os.path.normpath(file_path)
 
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-
-    # get the publisher
-    doi, publisher = search_xml_doi_publisher(root)
-
-    article_construct_func = getattr(ArticleFunctions, f'article_construct_xml_{publisher}')
-    article, component_check = article_construct_func(root=root, doi=doi)
+    if contents is None:
+        with profiler.stage('read'):
+            with open(file_path, 'rb') as f:
+                contents = f.read()
+
+    with profiler.stage('detect_publisher'):
+        publisher = detect_publisher('xml', contents) or sniff_xml_publisher(contents)
+    spec = get_publisher('xml', publisher) if publisher else None
+
+    if spec is not None and get_backend(spec) == STREAMING_XML_BACKEND:
+        profiler.set_publisher(publisher)
+        with profiler.stage('search_doi_publisher'):
+            doi = spec.doi_sniffer(contents) if spec.doi_sniffer is not None else None
+        with profiler.stage('xml_stream'):
+            return spec.streaming_constructor(contents, doi)
+
+    root = build_xml_dom(contents, get_backend(spec) if spec is not None else 'etree')
+
+    if spec is None:
+        with profiler.stage('search_doi_publisher'):
+            with profiler.stage('check_publisher'):
+                publisher = check_xml_publisher(root)
+            spec = get_publisher('xml', publisher)
+        # the tree is already built, so it is also used with the 'iterparse' backend
+        if get_backend(spec) not in ('etree', STREAMING_XML_BACKEND):
+            root = build_xml_dom(contents, get_backend(spec))
+    profiler.set_publisher(publisher)
+
+    with profiler.stage('search_doi_publisher'):
+        doi = spec.doi_sniffer(contents) if spec.doi_sniffer is not None else None
+        if doi is None:
+            doi = spec.doi_extractor(root)
+
+    with profiler.stage('construct'):
+        article, component_check = spec.constructor(root, doi)
 
     return article, component_check
@@ -0,0 +1,171 @@
+"""
+Content-addressed cache of parsed articles.
+
+Re-running the processing on an unchanged corpus, e.g., after a change of the downstream code,
+parses every article again. The cache maps the content hash of an input file, the parser version
+(`cap.constants.PARSER_VERSION`) and the parse options to the parsed `Article` and its
+`ArticleComponentCheck`, so that unchanged inputs are deserialized instead of parsed. Entries of
+other parser versions or options are never returned and age out.
+
+Entries hold the plain-object tree of `cap.serialization.encode_article`, pickled rather than
+packed with `dumps_object`: the cache is never read by other tools, and unpickling is several
+times faster.
+
+The entries are stored in a SQLite database that the worker processes share. Its total size is
+bounded: when an entry is added beyond the bound, the least recently used entries are evicted.
+"""
+import os
+import time
+import zlib
+import pickle
+import sqlite3
+import logging
+import threading
+from dataclasses import astuple
+from typing import Optional, Tuple
+
+from .article import Article, ArticleComponentCheck
+from .serialization import encode_article, decode_article
+
+logger = logging.getLogger(__name__)
+
+# seconds a process waits for another one to release the database lock before giving up on the cache
+PARSE_CACHE_TIMEOUT = 30.0
+
+
+def serialize_parse_result(article: Article, component_check: ArticleComponentCheck) -> bytes:
+    encoded = [encode_article(article), list(astuple(component_check))]
+    return zlib.compress(pickle.dumps(encoded, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def deserialize_parse_result(data: bytes) -> Tuple[Article, ArticleComponentCheck]:
+    encoded_article, check_values = pickle.loads(zlib.decompress(data))
+    return decode_article(encoded_article), ArticleComponentCheck(*check_values)
+
+
+class ParseCache:
+    """
+    Size-bounded LRU cache of parse results, stored in a SQLite database.
+
+    Entries are keyed by (content hash, parser version, parse options) and record the time they
+    were last used. The total size of the stored results is kept in the database, so that the
+    processes sharing the cache evict entries against the same bound.
+
+    Failures to read or write the cache are logged and treated as misses: the article is parsed.
+    """
+
+    def __init__(self, db_path: str, parser_version: str, max_size_bytes: Optional[int] = 4 * 2 ** 30):
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        if not os.path.isdir(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._db_path = db_path
+        self._parser_version = parser_version
+        self._max_size_bytes = max_size_bytes
+        self._lock = threading.RLock()
+
+        # transactions are started explicitly, so that the size accounting is atomic
+        self._conn = sqlite3.connect(db_path, timeout=PARSE_CACHE_TIMEOUT, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('BEGIN IMMEDIATE')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'content_hash TEXT, parser_version TEXT, options TEXT, data BLOB, size INTEGER, last_used REAL, '
+            'PRIMARY KEY (content_hash, parser_version, options))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY, total_size INTEGER)')
+        self._conn.execute('INSERT OR IGNORE INTO stats (id, total_size) VALUES (0, 0)')
+        self._conn.execute('COMMIT')
+
+    @property
+    def parser_version(self):
+        return self._parser_version
+
+    @property
+    def total_size(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT total_size FROM stats WHERE id = 0').fetchone()[0]
+
+    def get(self, content_hash: str, options: Optional[str] = '') \
+            -> Optional[Tuple[Article, ArticleComponentCheck]]:
+        """
+        The cached parse result of a file, or None if it is not cached
+        """
+        key = (content_hash, self._parser_version, options)
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT data FROM entries WHERE content_hash = ? AND parser_version = ? AND options = ?', key
+                ).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute(
+                    'UPDATE entries SET last_used = ? WHERE content_hash = ? AND parser_version = ? AND options = ?',
+                    (time.time(),) + key
+                )
+            return deserialize_parse_result(row[0])
+        except Exception as e:
+            logger.warning(f"Failed to read the parse cache entry of {content_hash}. Error: {e}")
+            return None
+
+    def put(self, content_hash: str, article: Article, component_check: ArticleComponentCheck,
+            options: Optional[str] = '') -> bool:
+        """
+        Add the parse result of a file, evicting the least recently used entries if the cache is full
+
+        Returns
+        -------
+        whether the result is added
+        """
+        key = (content_hash, self._parser_version, options)
+        try:
+            data = serialize_parse_result(article, component_check)
+            if len(data) > self._max_size_bytes:
+                return False
+            with self._lock:
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    self._insert(key, data)
+                    self._conn.execute('COMMIT')
+                except BaseException:
+                    self._conn.execute('ROLLBACK')
+                    raise
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to add the parse result of {content_hash} to the parse cache. Error: {e}")
+            return False
+
+    def _insert(self, key: tuple, data: bytes):
+        row = self._conn.execute(
+            'SELECT size FROM entries WHERE content_hash = ? AND parser_version = ? AND options = ?', key
+        ).fetchone()
+        size_change = len(data) - (row[0] if row else 0)
+        self._conn.execute(
+            'INSERT OR REPLACE INTO entries (content_hash, parser_version, options, data, size, last_used) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            key + (data, len(data), time.time())
+        )
+        total_size = self._conn.execute('SELECT total_size FROM stats WHERE id = 0').fetchone()[0] + size_change
+
+        if total_size > self._max_size_bytes:
+            evicted = list()
+            for rowid, size in self._conn.execute('SELECT rowid, size FROM entries ORDER BY last_used'):
+                if total_size <= self._max_size_bytes:
+                    break
+                evicted.append((rowid,))
+                total_size -= size
+            self._conn.executemany('DELETE FROM entries WHERE rowid = ?', evicted)
+
+        self._conn.execute('UPDATE stats SET total_size = ? WHERE id = 0', (total_size,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,3 +1,6 @@
+# bump when a change alters the parsed articles, so that processing manifests and caches are invalidated
+PARSER_VERSION = '0.1.0'
+
 SUPPORTED_HTML_PUBLISHERS = ['rsc', 'springer', 'nature', 'wiley', 'aip', 'acs', 'elsevier', 'aaas']
 SUPPORTED_XML_PUBLISHERS = ['acs', 'elsevier']
 
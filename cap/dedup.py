@@ -0,0 +1,155 @@
+"""
+Deduplication of the input articles before parsing.
+
+Download folders often hold the same article more than once, e.g., as publisher XML and as saved
+HTML. The inputs are grouped by the doi sniffed from their raw contents, or by their content hash
+when no doi is found, and only one representative of each group is parsed. The doi is only read
+at the location of the publisher sniffed from the file: the locations of other publishers may hold
+the dois of cited articles, which would group distinct articles. The representative
+is chosen by a preference over the file types, so that the cheaper parser is used.
+"""
+import os
+import json
+import logging
+from dataclasses import dataclass, asdict
+from typing import Optional, List, Dict, Iterable
+
+from .io import ArticleFile
+from .manifest import get_content_hash
+from .sniff import sniff_doi, sniff_publisher
+
+logger = logging.getLogger(__name__)
+
+# XML articles are parsed directly; HTML articles may need an additional html5lib pass
+DEFAULT_DEDUP_PREFERENCE = 'xml,html'
+
+
+@dataclass
+class DedupRecord:
+    path: str
+    file_type: Optional[str] = None
+    publisher: Optional[str] = None
+    doi: Optional[str] = None
+    content_hash: Optional[str] = None
+
+    @property
+    def group_key(self) -> Optional[str]:
+        if self.doi:
+            return f'doi:{self.doi}'
+        if self.content_hash:
+            return f'sha256:{self.content_hash}'
+        return None
+
+
+def parse_preference(preference: str) -> List[str]:
+    """
+    Parse a comma-separated list of file types in decreasing order of preference, e.g., 'xml,html'
+    """
+    file_types = [file_type.strip().lower() for file_type in preference.split(',') if file_type.strip()]
+    for file_type in file_types:
+        if file_type not in ('xml', 'html'):
+            raise ValueError(f"Unknown file type '{file_type}' in the deduplication preference '{preference}'")
+    return file_types
+
+
+def get_dedup_record(article_file: ArticleFile) -> DedupRecord:
+    """
+    Read an article file and get the keys it is grouped by.
+    Files that cannot be read have no keys and are never considered duplicates.
+    """
+    record = DedupRecord(path=os.path.normpath(article_file.path), file_type=article_file.file_type)
+    if record.file_type is None:
+        return record
+    try:
+        contents = article_file.read()
+    except Exception:
+        return record
+    record.publisher = sniff_publisher(record.file_type, contents)
+    if record.publisher is not None:
+        record.doi = sniff_doi(record.file_type, contents, publisher=record.publisher)
+    record.content_hash = get_content_hash(contents)
+    return record
+
+
+def get_preference_rank(record: DedupRecord, file_types: List[str]):
+    file_type_rank = file_types.index(record.file_type) if record.file_type in file_types else len(file_types)
+    return file_type_rank, record.path
+
+
+def find_duplicates(article_files: Iterable[ArticleFile],
+                    preference: Optional[str] = DEFAULT_DEDUP_PREFERENCE) -> Dict[str, List[DedupRecord]]:
+    """
+    Group the article files by sniffed doi or content hash and choose one representative per group.
+
+    Parameters
+    ----------
+    article_files: the input article files
+    preference: comma-separated file types in decreasing order of preference.
+        Ties, including file types not listed, are broken by the path
+
+    Returns
+    -------
+    the normalized paths of the representatives mapped to their duplicates, in decreasing order of preference.
+        Files without duplicates are not included
+    """
+    file_types = parse_preference(preference)
+
+    groups: Dict[str, List[DedupRecord]] = dict()
+    n_files = 0
+    for article_file in article_files:
+        n_files += 1
+        record = get_dedup_record(article_file)
+        if record.group_key is None:
+            continue
+        group = groups.setdefault(record.group_key, list())
+        # a file may be listed twice
+        if all(record.path != other.path for other in group):
+            group.append(record)
+
+    duplicates = dict()
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        group.sort(key=lambda x: get_preference_rank(x, file_types))
+        duplicates[group[0].path] = group[1:]
+
+    logger.info(f"Found {sum(len(group) for group in duplicates.values())} duplicates among {n_files} input files")
+    return duplicates
+
+
+def get_duplicate_paths(duplicates: Dict[str, List[DedupRecord]]) -> set:
+    return set(record.path for group in duplicates.values() for record in group)
+
+
+def replace_failed_representatives(duplicates: Dict[str, List[DedupRecord]], failed_paths: set) -> set:
+    """
+    Promote the next preferred duplicate of each representative that failed to be processed.
+    `duplicates` is updated in place.
+
+    Returns
+    -------
+    the paths of the new representatives
+    """
+    new_paths = set()
+    for path in failed_paths:
+        group = duplicates.pop(path, None)
+        if not group:
+            continue
+        new_representative, group = group[0], group[1:]
+        if group:
+            duplicates[new_representative.path] = group
+        new_paths.add(new_representative.path)
+    return new_paths
+
+
+def save_duplicates(duplicates: Dict[str, List[DedupRecord]], file_path: str):
+    """
+    Save the duplicates and their representatives as json lines
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for representative_path, group in duplicates.items():
+            for record in group:
+                entry = asdict(record)
+                entry['representative'] = representative_path
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
@@ -1,9 +1,17 @@
 import os
 import json
 import glob
+import gzip
 import time
+import hashlib
+import tarfile
+import zipfile
+import logging
 import itertools
-from typing import Optional, List, Tuple
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Optional, List, Tuple, Iterator, Iterable, Dict, Any
 from bs4 import BeautifulSoup, Tag
 
 from seqlbtoolkit.text import substring_mapping
@@ -17,9 +25,11 @@ try:
     from selenium import webdriver
     from selenium.webdriver.support.ui import WebDriverWait
     from selenium.common.exceptions import NoSuchElementException
-except KeyError:
+except ImportError:
     pass
 
+logger = logging.getLogger(__name__)
+
 
 DEFAULT_HTML_STYLE = """
 head {
@@ -351,3 +361,361 @@ def get_file_paths(input_dir: str):
     else:
         raise FileNotFoundError("Input file does not exist!")
     return file_list
+
+
+ARTICLE_FILE_TYPES = ('html', 'xml')
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+ZIP_SUFFIXES = ('.zip',)
+
+
+@dataclass
+class ArticleFile:
+    """
+    An input article, either a file on disk (optionally gzip-compressed) or a member of an archive.
+    Archive members carry their contents since they cannot be re-opened by path;
+    files read ahead by `iter_prefetched` carry them as well.
+    Members listed in an input list, e.g., a quarantine file, are read from the archive on first use.
+    """
+    path: str
+    contents: Optional[bytes] = None
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+    # the archive and the name in it of an archive member
+    archive_path: Optional[str] = None
+    member_name: Optional[str] = None
+    # partition key of the path recorded by an input list, e.g., a quarantine file, since the path
+    # relative to the list's folder differs from the one relative to the original input directory
+    partition_path_key: Optional[str] = None
+
+    @property
+    def file_type(self) -> Optional[str]:
+        return get_article_file_type(self.path)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.contents is not None
+
+    def stat(self) -> Tuple[int, float]:
+        """
+        Returns
+        -------
+        size and modification time of the input
+        """
+        if not self.is_loaded and self.archive_path is not None:
+            self._read_member()
+        if self.is_loaded:
+            return self.size, self.mtime
+        file_stat = os.stat(self.path)
+        return file_stat.st_size, file_stat.st_mtime
+
+    def read(self) -> bytes:
+        if not self.is_loaded and self.archive_path is not None:
+            self._read_member()
+        if self.is_loaded:
+            return self.contents
+        if self.path.lower().endswith('.gz'):
+            with gzip.open(self.path, 'rb') as f:
+                return f.read()
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def _read_member(self):
+        self.contents, self.size, self.mtime = read_archive_member(self.archive_path, self.member_name)
+
+
+def get_article_file_type(file_path: str) -> Optional[str]:
+    """
+    Get the article type (html or xml) from the file name; `.gz` suffixes are ignored
+    """
+    name = file_path.lower()
+    if name.endswith('.gz') and not name.endswith(TAR_SUFFIXES):
+        name = name[:-3]
+    for file_type in ARTICLE_FILE_TYPES:
+        if name.endswith(file_type):
+            return file_type
+    return None
+
+
+def is_archive(file_path: str) -> bool:
+    return file_path.lower().endswith(TAR_SUFFIXES + ZIP_SUFFIXES)
+
+
+def iter_archive_members(archive_path: str) -> Iterator[ArticleFile]:
+    """
+    Read the articles in a zip or tar(.gz/.bz2/.xz) archive member by member without extracting it.
+    Tar archives are read in streaming mode, so compressed tarballs are decompressed only once.
+    """
+    if archive_path.lower().endswith(ZIP_SUFFIXES):
+        with zipfile.ZipFile(archive_path) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or get_article_file_type(info.filename) is None:
+                    continue
+                contents = zf.read(info)
+                if info.filename.lower().endswith('.gz'):
+                    contents = gzip.decompress(contents)
+                yield ArticleFile(
+                    path=os.path.normpath(os.path.join(archive_path, info.filename)),
+                    contents=contents,
+                    size=info.file_size,
+                    mtime=time.mktime(info.date_time + (0, 0, -1)),
+                    archive_path=archive_path,
+                    member_name=info.filename
+                )
+    else:
+        with tarfile.open(archive_path, mode='r|*') as tf:
+            for member in tf:
+                if not member.isfile() or get_article_file_type(member.name) is None:
+                    continue
+                contents = tf.extractfile(member).read()
+                if member.name.lower().endswith('.gz'):
+                    contents = gzip.decompress(contents)
+                yield ArticleFile(
+                    path=os.path.normpath(os.path.join(archive_path, member.name)),
+                    contents=contents,
+                    size=member.size,
+                    mtime=float(member.mtime),
+                    archive_path=archive_path,
+                    member_name=member.name
+                )
+
+
+def read_archive_member(archive_path: str, member_name: str) -> Tuple[bytes, int, float]:
+    """
+    Read a single member of a zip or tar archive. Compressed tarballs are decompressed up to the member.
+
+    Returns
+    -------
+    contents, size and modification time of the member
+    """
+    try:
+        if archive_path.lower().endswith(ZIP_SUFFIXES):
+            with zipfile.ZipFile(archive_path) as zf:
+                info = zf.getinfo(member_name)
+                contents = zf.read(info)
+                size, mtime = info.file_size, time.mktime(info.date_time + (0, 0, -1))
+        else:
+            with tarfile.open(archive_path, mode='r:*') as tf:
+                member = tf.getmember(member_name)
+                contents = tf.extractfile(member).read()
+                size, mtime = member.size, float(member.mtime)
+    except KeyError:
+        raise FileNotFoundError(f"{member_name} is not in the archive {archive_path}")
+    if member_name.lower().endswith('.gz'):
+        contents = gzip.decompress(contents)
+    return contents, size, mtime
+
+
+def iter_dir_article_files(input_dir: str, recursive: Optional[bool] = True) -> Iterator[ArticleFile]:
+    """
+    Walk a directory with `os.scandir` and yield the articles in it.
+    Entries are visited in sorted order so that the output order is reproducible.
+    Like `os.walk`, symbolic links to directories are not followed, since they may point back up the tree.
+    """
+    dir_stack = [input_dir]
+    while dir_stack:
+        folder = dir_stack.pop()
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda x: x.name)
+        except OSError as e:
+            logger.warning(f"Cannot read directory {folder}. Error: {e}")
+            continue
+
+        sub_dirs = list()
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    sub_dirs.append(entry.path)
+            elif entry.is_symlink() and entry.is_dir():
+                continue
+            elif is_archive(entry.name):
+                yield from iter_archive_members(entry.path)
+            elif get_article_file_type(entry.name) is not None:
+                yield ArticleFile(path=entry.path)
+        # push in reverse order so that sub-directories are visited in sorted order
+        dir_stack += sub_dirs[::-1]
+
+
+def load_article_file(article_file: ArticleFile) -> ArticleFile:
+    """
+    Read the contents, size and modification time of an article file into memory.
+    The file is returned as is if it is already loaded or cannot be read, so that
+    read errors are raised where the contents are used.
+    """
+    if article_file.is_loaded:
+        return article_file
+    try:
+        size, mtime = article_file.stat()
+        contents = article_file.read()
+    except Exception:
+        return article_file
+    return replace(article_file, contents=contents, size=size, mtime=mtime)
+
+
+def iter_prefetched(items: Iterable,
+                    depth: Optional[int] = 8,
+                    max_buffer_bytes: Optional[int] = 256 * 2 ** 20) -> Iterator:
+    """
+    Read the next `depth` article files in background threads while the current one is processed,
+    so that the latency of the storage overlaps with parsing.
+
+    Parameters
+    ----------
+    items: ArticleFile instances, or tuples whose first element is an ArticleFile
+    depth: number of files read ahead
+    max_buffer_bytes: no more files are read ahead while the contents that are read but not yet
+        consumed exceed this. Files that are being read when the limit is reached are still buffered
+
+    Returns
+    -------
+    iterator of the items in the same order, with their article files loaded
+    """
+    depth = max(depth, 1)
+    items = iter(items)
+    queue = collections.deque()
+
+    def get_buffered_bytes() -> int:
+        n_bytes = 0
+        for _, future in queue:
+            if future.done() and future.result().is_loaded:
+                n_bytes += len(future.result().contents)
+        return n_bytes
+
+    with ThreadPoolExecutor(max_workers=depth) as executor:
+        exhausted = False
+        while True:
+            while not exhausted and len(queue) < depth and (not queue or get_buffered_bytes() < max_buffer_bytes):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                article_file = item[0] if isinstance(item, tuple) else item
+                queue.append((item, executor.submit(load_article_file, article_file)))
+            if not queue:
+                return
+
+            item, future = queue.popleft()
+            article_file = future.result()
+            yield (article_file,) + item[1:] if isinstance(item, tuple) else article_file
+
+
+def iter_listed_inputs(list_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read the inputs listed in a file as objects with a "path" field.
+    Supports json lists, json lines (either path strings or objects with a "path" field)
+    and plain text files with one path per line. Only json lists are loaded at once.
+    """
+    is_jsonl = list_path.lower().endswith('.jsonl')
+    with open(list_path, 'r', encoding='utf-8') as f:
+        head = f.read(1024).lstrip()
+        f.seek(0)
+        if not is_jsonl and head.startswith('['):
+            items = json.load(f)
+        elif is_jsonl:
+            items = (json.loads(line) for line in f if line.strip())
+        else:
+            items = (line.strip() for line in f if line.strip())
+        for item in items:
+            yield item if isinstance(item, dict) else {'path': item}
+
+
+def get_listed_input_fields(article_file: ArticleFile, input_path: str) -> Dict[str, Any]:
+    """
+    The fields besides "path" that an entry of an input list needs so that `iter_article_files`
+    yields `article_file` again: archive members cannot be opened by their path, and the file
+    keeps the partition it has as part of `input_path`
+    """
+    fields = {'partition_path_key': get_article_file_path_key(article_file, input_path)}
+    if article_file.archive_path is not None:
+        fields.update(archive=article_file.archive_path, member=article_file.member_name)
+    return fields
+
+
+def load_dois_to_skip(file_path: str) -> set:
+    """
+    Load the dois to skip into a hashed set so that membership checks are constant-time.
+    Both a json list and a plain text file with one doi per line are accepted.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        contents = f.read()
+    try:
+        dois = json.loads(contents)
+    except json.JSONDecodeError:
+        dois = contents.split()
+    return set(doi.strip().lower() for doi in dois)
+
+
+def get_partition(key: str, num_partitions: int) -> int:
+    """
+    Assign a key to one of `num_partitions` partitions.
+    Unlike the built-in `hash`, the result does not change across processes or machines.
+    """
+    digest = hashlib.md5(key.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % num_partitions
+
+
+def get_partition_path_key(file_path: str, input_path: str) -> str:
+    """
+    Partition key of an input file: its path relative to the input directory (or to the folder of
+    the input archive/list), so that it does not depend on where the corpus is mounted
+    """
+    base_dir = input_path if os.path.isdir(input_path) else os.path.dirname(input_path)
+    rel_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(base_dir))
+    return rel_path.replace(os.sep, '/')
+
+
+def get_article_file_path_key(article_file: ArticleFile, input_path: str) -> str:
+    """
+    Partition key of an input file; the key recorded by the input list takes precedence
+    """
+    return article_file.partition_path_key or get_partition_path_key(article_file.path, input_path)
+
+
+def get_partition_file_path(file_path: str, partition_idx: int, num_partitions: int) -> str:
+    """
+    Make a per-partition file name, e.g., `manifest.db` -> `manifest.part-00003-of-00008.db`
+    """
+    root, ext = os.path.splitext(file_path)
+    return f"{root}.part-{partition_idx:05d}-of-{num_partitions:05d}{ext}"
+
+
+def iter_article_files(input_path: str, recursive: Optional[bool] = True) -> Iterator[ArticleFile]:
+    """
+    Lazily discover the input articles.
+
+    Parameters
+    ----------
+    input_path: one of
+        - an html/xml article file, optionally gzip-compressed;
+        - a zip or tar(.gz) archive, read member by member;
+        - a directory, walked recursively;
+        - a json/jsonl/text file listing any of the above. Archive members are listed as json objects with
+          "archive" and "member" fields besides "path", and files may carry their "partition_path_key",
+          see `get_listed_input_fields`.
+    recursive: whether to walk the sub-directories
+
+    Returns
+    -------
+    iterator of ArticleFile
+    """
+    if os.path.isdir(input_path):
+        yield from iter_dir_article_files(input_path, recursive=recursive)
+    elif os.path.isfile(input_path):
+        if is_archive(input_path):
+            yield from iter_archive_members(input_path)
+        elif get_article_file_type(input_path) is not None:
+            yield ArticleFile(path=input_path)
+        else:
+            for listed_input in iter_listed_inputs(input_path):
+                listed_path = listed_input['path']
+                if listed_input.get('archive') is not None:
+                    yield ArticleFile(path=listed_path, archive_path=listed_input['archive'],
+                                      member_name=listed_input['member'],
+                                      partition_path_key=listed_input.get('partition_path_key'))
+                elif os.path.isdir(listed_path) or is_archive(listed_path):
+                    yield from iter_article_files(listed_path, recursive=recursive)
+                else:
+                    yield ArticleFile(path=listed_path, partition_path_key=listed_input.get('partition_path_key'))
+    else:
+        raise FileNotFoundError("Input file does not exist!")
@@ -0,0 +1,204 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, astuple, fields
+from typing import Optional, List
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_STATUS_SAVED = 'saved'
+MANIFEST_STATUS_SKIPPED = 'skipped'
+MANIFEST_STATUS_FAILED = 'failed'
+# exceeded the time or memory budget; not retried unless requested, see `cap.watchdog`
+MANIFEST_STATUS_QUARANTINED = 'quarantined'
+MANIFEST_DONE_STATUSES = (MANIFEST_STATUS_SAVED, MANIFEST_STATUS_SKIPPED)
+
+
+def get_content_hash(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    input_path: str
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+    content_hash: Optional[str] = None
+    output_path: Optional[str] = None
+    publisher: Optional[str] = None
+    doi: Optional[str] = None
+    parser_version: Optional[str] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+    updated_at: Optional[float] = None
+
+    @property
+    def done(self):
+        return self.status in MANIFEST_DONE_STATUSES
+
+
+MANIFEST_COLUMNS = [f.name for f in fields(ManifestEntry)]
+
+
+class ProcessingManifest:
+    """
+    Persistent record of the processed input files, stored in a SQLite database.
+
+    Entries are keyed by the absolute input path and record the size, modification time and
+    content hash of the input together with the processing outcome, so that a re-run only needs
+    to process new, changed or previously failed files.
+
+    The manifest may be shared between threads (e.g., the task feeder of a process pool and the
+    thread collecting the results); all database accesses are serialized by a lock.
+    """
+
+    def __init__(self, db_path: str, parser_version: str, commit_interval: Optional[int] = 100):
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        if not os.path.isdir(db_dir):
+            os.makedirs(db_dir)
+
+        self._db_path = db_path
+        self._parser_version = parser_version
+        self._commit_interval = commit_interval
+        self._n_uncommitted = 0
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS articles ('
+            'input_path TEXT PRIMARY KEY, size INTEGER, mtime REAL, content_hash TEXT, output_path TEXT, '
+            'publisher TEXT, doi TEXT, parser_version TEXT, status TEXT, error TEXT, updated_at REAL)'
+        )
+        self._conn.commit()
+
+    @property
+    def parser_version(self):
+        return self._parser_version
+
+    @staticmethod
+    def get_key(input_path: str):
+        return os.path.abspath(os.path.normpath(input_path))
+
+    def get(self, input_path: str) -> Optional[ManifestEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {", ".join(MANIFEST_COLUMNS)} FROM articles WHERE input_path = ?',
+                (self.get_key(input_path),)
+            ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def is_up_to_date(self, entry: Optional[ManifestEntry]) -> bool:
+        """
+        Whether an entry was successfully processed by the current parser version
+        """
+        return entry is not None and entry.done and entry.parser_version == self._parser_version
+
+    def is_unchanged(self, entry: Optional[ManifestEntry], size: int, mtime: float) -> bool:
+        """
+        Cheap check based on file metadata only. Files whose size or mtime changed still have a
+        chance to be identified as unchanged by comparing their content hash with `entry.content_hash`.
+        """
+        return self.is_up_to_date(entry) and entry.size == size and entry.mtime == mtime
+
+    def is_quarantined(self, entry: Optional[ManifestEntry], size: int, mtime: float) -> bool:
+        """
+        Whether an unchanged file exceeded its budget with the current parser version
+        """
+        return entry is not None and entry.status == MANIFEST_STATUS_QUARANTINED and \
+            entry.parser_version == self._parser_version and entry.size == size and entry.mtime == mtime
+
+    def record(self, entry: ManifestEntry):
+        entry.input_path = self.get_key(entry.input_path)
+        entry.parser_version = self._parser_version
+        entry.updated_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO articles ({", ".join(MANIFEST_COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(MANIFEST_COLUMNS))})',
+                astuple(entry)
+            )
+            self._n_uncommitted += 1
+            if self._n_uncommitted >= self._commit_interval:
+                self.commit()
+        return self
+
+    def update(self, entry: ManifestEntry) -> bool:
+        """
+        Insert an entry of another manifest as is, unless the existing entry of the same input is newer
+
+        Returns
+        -------
+        whether the entry is inserted
+        """
+        with self._lock:
+            existing = self.get(entry.input_path)
+            if existing is not None and (existing.updated_at or 0) > (entry.updated_at or 0):
+                return False
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO articles ({", ".join(MANIFEST_COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(MANIFEST_COLUMNS))})',
+                astuple(entry)
+            )
+            self._n_uncommitted += 1
+            if self._n_uncommitted >= self._commit_interval:
+                self.commit()
+        return True
+
+    def iter_entries(self, status: Optional[str] = None):
+        query = f'SELECT {", ".join(MANIFEST_COLUMNS)} FROM articles'
+        params = ()
+        if status is not None:
+            query += ' WHERE status = ?'
+            params = (status,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for row in rows:
+            yield ManifestEntry(*row)
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+            self._n_uncommitted = 0
+        return self
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def merge_manifests(manifest_paths: List[str], output_path: str, parser_version: str) -> ProcessingManifest:
+    """
+    Combine the manifests written by the nodes processing different partitions of a corpus.
+    If an input appears in several manifests, its most recently updated entry is kept.
+
+    Parameters
+    ----------
+    manifest_paths: paths to the per-partition manifests
+    output_path: path to the merged manifest; entries are added if it already exists
+    parser_version: parser version of the merged manifest
+
+    Returns
+    -------
+    the merged manifest, still open
+    """
+    merged = ProcessingManifest(output_path, parser_version=parser_version, commit_interval=10000)
+    for manifest_path in manifest_paths:
+        if os.path.abspath(manifest_path) == os.path.abspath(output_path):
+            continue
+        n_entries = 0
+        with ProcessingManifest(manifest_path, parser_version=parser_version) as manifest:
+            for entry in manifest.iter_entries():
+                n_entries += merged.update(entry)
+        logger.info(f"Merged {n_entries} entries from {manifest_path}")
+    return merged.commit()
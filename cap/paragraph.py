@@ -5,6 +5,8 @@ from typing import Optional, List, Union, Dict, Callable, Tuple
 from seqlbtoolkit.eval import Metric
 from collections import OrderedDict
 
+from .profiling import profiler
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,7 +43,8 @@ class Sentence:
             self._anno = {DEFAULT_ANNO_SOURCE: self._anno}
         if self.grouped_anno is None:
             self.grouped_anno = list()
-        self._tokens = self.word_tokenizer() if not self._word_tokenizer else self._word_tokenizer(self._text)
+        with profiler.stage('word_tokenize'):
+            self._tokens = self.word_tokenizer() if not self._word_tokenizer else self._word_tokenizer(self._text)
 
     def word_tokenizer(self, text=None) -> List[str]:
         if text is None:
@@ -172,7 +175,8 @@ class Paragraph:
 
     def _post_init(self):
         if self.sentences is None:
-            sents = self.sentence_tokenizer() if self._sent_tokenizer is None else self._sent_tokenizer(self._text)
+            with profiler.stage('sentence_tokenize'):
+                sents = self.sentence_tokenizer() if self._sent_tokenizer is None else self._sent_tokenizer(self._text)
             self.sentences = list()
 
             s_idx = 0
@@ -202,12 +206,17 @@ class Paragraph:
             self._set_char_idx_to_sent_idx()
 
     def _set_char_idx_to_sent_idx(self):
-        sent_idx = 0
-        for char_idx in range(len(self.text)):
-            if self.sentences[sent_idx].start_idx <= char_idx < self.sentences[sent_idx].end_idx:
-                self.char_idx_to_sent_idx[char_idx] = sent_idx
-            elif char_idx == self.sentences[sent_idx].end_idx:
-                sent_idx += 1
+        # map the characters of each sentence at once; the character at the end index of a sentence
+        # is not mapped, even if the next sentence starts there
+        n_chars = len(self.text)
+        char_idx = 0
+        for sent_idx, sent in enumerate(self.sentences):
+            if char_idx >= n_chars:
+                break
+            self.char_idx_to_sent_idx.update(
+                dict.fromkeys(range(max(sent.start_idx, char_idx), min(sent.end_idx, n_chars)), sent_idx)
+            )
+            char_idx = sent.end_idx + 1
 
     def get_sentence_by_char_idx(self, char_idx: int):
         sent_idx = self.char_idx_to_sent_idx[char_idx]
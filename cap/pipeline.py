@@ -0,0 +1,231 @@
+"""
+A staged processing pipeline with bounded memory use.
+
+Items flow through a chain of stages connected by bounded queues. Each stage has its own
+worker threads, or a pool of worker processes for CPU-bound stages. Once the queue of a
+slow stage is full, the stages before it block (backpressure). Across all stages, at most
+`max_in_flight` items are between the source and the consumer at any time. Memory use
+therefore depends on the number of workers, not on the number of items.
+
+A worker process that dies, e.g., killed by the OS for running out of memory, breaks the pool of
+its stage: the items it has not finished fail with `BrokenProcessPool`, which the consumer raises.
+"""
+import queue
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Optional, Callable, Iterable, Iterator, List, Any
+
+logger = logging.getLogger(__name__)
+
+# how often blocked workers check whether the pipeline is shutting down, in seconds
+_POLL_INTERVAL = 0.1
+
+# marks the end of the items in a queue
+_END = object()
+
+
+class _PipelineStopped(Exception):
+    pass
+
+
+@dataclass
+class Stage:
+    name: str
+    # applied to each item; returns the item passed to the next stage.
+    # Must be picklable (defined at the module level) if `use_processes`
+    func: Callable[[Any], Any]
+    num_workers: Optional[int] = 1
+    # run `func` in a pool of `num_workers` processes instead of in threads
+    use_processes: Optional[bool] = False
+    # called in each worker process when it starts
+    initializer: Optional[Callable] = None
+    initargs: Optional[tuple] = ()
+    # items for which `bypass` returns True are passed to the next stage unchanged
+    bypass: Optional[Callable[[Any], bool]] = None
+    # capacity of the input queue of the stage; defaults to twice the number of workers
+    queue_size: Optional[int] = None
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while True:
+        try:
+            return q.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            if stop.is_set():
+                raise _PipelineStopped
+
+
+def _put(q: queue.Queue, entry, stop: threading.Event):
+    while True:
+        try:
+            q.put(entry, timeout=_POLL_INTERVAL)
+            return
+        except queue.Full:
+            if stop.is_set():
+                raise _PipelineStopped
+
+
+def _apply(executor: ProcessPoolExecutor, func: Callable, item, stop: threading.Event):
+    # raises `BrokenProcessPool` if a worker process died
+    future = executor.submit(func, item)
+    while True:
+        try:
+            return future.result(timeout=_POLL_INTERVAL)
+        except FutureTimeoutError:
+            if stop.is_set():
+                future.cancel()
+                raise _PipelineStopped
+
+
+def run_pipeline(items: Iterable,
+                 stages: List[Stage],
+                 max_in_flight: Optional[int] = None,
+                 ordered: Optional[bool] = True) -> Iterator:
+    """
+    Pass the items through the stages and yield the outputs of the last stage.
+
+    An exception raised by a stage is re-raised by this generator when the failed item
+    would have been yielded. If a worker thread fails outside of a stage function, e.g., in `bypass`,
+    the pipeline stops and its exception is raised at once. Closing the generator early stops all stages.
+
+    Parameters
+    ----------
+    items: the input items. The iterable is consumed in a background thread
+    stages: the stages applied to each item, in order
+    max_in_flight: maximum number of items taken from `items` but not yet yielded.
+        Defaults to twice the total number of workers
+    ordered: yield the outputs in the order of `items`. Otherwise, they are yielded as soon as they are ready
+
+    Returns
+    -------
+    an iterator over the processed items
+    """
+    if not stages:
+        raise ValueError("A pipeline needs at least one stage")
+    for stage in stages:
+        if stage.num_workers < 1:
+            raise ValueError(f"Stage '{stage.name}' needs at least one worker, got {stage.num_workers}")
+    if max_in_flight is None:
+        max_in_flight = 2 * sum(stage.num_workers for stage in stages)
+    if max_in_flight < 1:
+        raise ValueError(f"`max_in_flight` must be positive, got {max_in_flight}")
+
+    stop = threading.Event()
+    in_flight = threading.Semaphore(max_in_flight)
+    # the output queue needs no bound since `in_flight` already limits the number of items in it
+    queues = [queue.Queue(maxsize=stage.queue_size or 2 * stage.num_workers) for stage in stages] + [queue.Queue()]
+    source_errors = list()
+    worker_errors = list()
+
+    # number of workers of each stage that have not finished yet, the last one passes on the end marker
+    n_active_workers = [stage.num_workers for stage in stages]
+    n_active_lock = threading.Lock()
+
+    def feed():
+        try:
+            for seq, item in enumerate(items):
+                while not in_flight.acquire(timeout=_POLL_INTERVAL):
+                    if stop.is_set():
+                        return
+                _put(queues[0], (seq, True, item), stop)
+        except _PipelineStopped:
+            return
+        except BaseException as e:
+            source_errors.append(e)
+        try:
+            _put(queues[0], _END, stop)
+        except _PipelineStopped:
+            pass
+
+    def work(stage_idx: int, executor: Optional[ProcessPoolExecutor]):
+        stage = stages[stage_idx]
+        input_queue, output_queue = queues[stage_idx], queues[stage_idx + 1]
+        try:
+            while True:
+                entry = _get(input_queue, stop)
+                if entry is _END:
+                    with n_active_lock:
+                        n_active_workers[stage_idx] -= 1
+                        is_last = n_active_workers[stage_idx] == 0
+                    # let the other workers of the stage see the end marker as well
+                    _put(output_queue if is_last else input_queue, _END, stop)
+                    return
+
+                seq, ok, item = entry
+                if ok and (stage.bypass is None or not stage.bypass(item)):
+                    try:
+                        item = stage.func(item) if executor is None else _apply(executor, stage.func, item, stop)
+                    except _PipelineStopped:
+                        raise
+                    except Exception as e:
+                        # passed on to the consumer, which re-raises it
+                        ok, item = False, e
+                _put(output_queue, (seq, ok, item), stop)
+        except _PipelineStopped:
+            return
+        except BaseException as e:
+            # the item is lost, so the consumer would wait for it forever
+            worker_errors.append(e)
+            stop.set()
+
+    executors = list()
+    threads = [threading.Thread(target=feed, name='pipeline-source', daemon=True)]
+    finished = False
+    try:
+        for stage_idx, stage in enumerate(stages):
+            executor = None
+            if stage.use_processes:
+                executor = ProcessPoolExecutor(
+                    max_workers=stage.num_workers, initializer=stage.initializer, initargs=stage.initargs
+                )
+                executors.append(executor)
+                # start the worker processes now rather than on the first item, so that they are not
+                # forked while the threads of the pipeline hold locks
+                executor.submit(int).result()
+            for worker_idx in range(stage.num_workers):
+                threads.append(threading.Thread(
+                    target=work, args=(stage_idx, executor), name=f'pipeline-{stage.name}-{worker_idx}', daemon=True
+                ))
+        for thread in threads:
+            thread.start()
+
+        # outputs that are ready but wait for earlier items, at most `max_in_flight`
+        pending = dict()
+        next_seq = 0
+        while True:
+            try:
+                entry = _get(queues[-1], stop)
+            except _PipelineStopped:
+                raise worker_errors[0]
+            if entry is _END:
+                break
+            seq, ok, item = entry
+            if ordered:
+                pending[seq] = (ok, item)
+                ready = list()
+                while next_seq in pending:
+                    ready.append(pending.pop(next_seq))
+                    next_seq += 1
+            else:
+                ready = [(ok, item)]
+
+            for ok, item in ready:
+                in_flight.release()
+                if not ok:
+                    raise item
+                yield item
+
+        if source_errors:
+            raise source_errors[0]
+        finished = True
+
+    finally:
+        stop.set()
+        for executor in executors:
+            # items that are being processed when the pipeline is closed early are finished in the background
+            executor.shutdown(wait=finished, cancel_futures=not finished)
+        for thread in threads:
+            if thread.is_alive():
+                thread.join(timeout=10 * _POLL_INTERVAL)
@@ -0,0 +1,239 @@
+"""
+Per-stage timing of the article processing pipeline.
+
+The stages of processing one document are wrapped with `profiler.stage(name)`. When profiling is
+disabled (the default) `stage` returns a shared no-op context manager, so instrumented code only
+pays for a method call and an attribute check.
+
+Each process has its own `profiler` and each thread its own current document; workers return one
+record per document, which the main process collects with `StageStatistics`. Records of the
+same document from different pipeline stages are combined with `merge_records`.
+"""
+import json
+import math
+import time
+import threading
+from typing import Optional, List, Dict, Tuple, Callable
+
+
+class _NullContext:
+    # `contextlib.nullcontext` is not available before python 3.7
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class _StageTimer:
+    __slots__ = ('_profiler', '_name', '_start', '_child_time')
+
+    def __init__(self, profiler: "StageProfiler", name: str):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._child_time = 0.0
+        stack = self._profiler._state.stack
+        stack.append(self)
+        if self._profiler.stage_callback is not None:
+            self._profiler.stage_callback('/'.join(timer._name for timer in stack))
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        elapsed = time.perf_counter() - self._start
+        state = self._profiler._state
+        stack = state.stack
+        stack.pop()
+        if stack:
+            stack[-1]._child_time += elapsed
+        # on errors, keep reporting the stage that raised
+        if self._profiler.stage_callback is not None and exc_type is None:
+            self._profiler.stage_callback('/'.join(timer._name for timer in stack))
+
+        stats = state.stages.get(self._name)
+        if stats is None:
+            stats = state.stages[self._name] = [0.0, 0.0, 0]
+        stats[0] += elapsed
+        stats[1] += elapsed - self._child_time
+        stats[2] += 1
+        return False
+
+
+class _DocumentState(threading.local):
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.stack: List[_StageTimer] = list()
+        self.stages: Dict[str, list] = dict()
+        self.publisher = None
+        self.doc_start = None
+
+
+class StageProfiler:
+    """
+    Accumulates the wall time and the number of calls of each stage for the current document.
+    Nested stages are allowed: `time` includes the nested stages, `self_time` excludes them.
+    Enabling is process-wide; the current document is tracked per thread.
+
+    Independently of timing, `stage_callback` is called with the path of the current stage
+    (e.g., 'construct/sentence_tokenize') whenever it changes; see `cap.watchdog`.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stage_callback: Optional[Callable[[str], None]] = None
+        self._state = _DocumentState()
+
+    def enable(self, enabled: Optional[bool] = True):
+        self.enabled = enabled
+        return self
+
+    def set_stage_callback(self, callback: Optional[Callable[[str], None]]):
+        self.stage_callback = callback
+        return self
+
+    def stage(self, name: str):
+        if not self.enabled and self.stage_callback is None:
+            return _NULL_CONTEXT
+        return _StageTimer(self, name)
+
+    def set_publisher(self, publisher: Optional[str]):
+        if self.enabled:
+            self._state.publisher = publisher
+        return self
+
+    def start_document(self):
+        if self.enabled:
+            self._state.reset()
+            self._state.doc_start = time.perf_counter()
+        return self
+
+    def end_document(self, **info) -> Optional[dict]:
+        """
+        Returns
+        -------
+        the record of the current document, including `info`, or None if profiling is disabled
+        """
+        state = self._state
+        if not self.enabled or state.doc_start is None:
+            return None
+        record = dict(info)
+        record['publisher'] = state.publisher
+        record['total'] = time.perf_counter() - state.doc_start
+        record['stages'] = {
+            name: {'time': t, 'self_time': self_t, 'count': n} for name, (t, self_t, n) in state.stages.items()
+        }
+        state.doc_start = None
+        return record
+
+
+profiler = StageProfiler()
+
+
+def merge_records(record: Optional[dict], other: Optional[dict]) -> Optional[dict]:
+    """
+    Combine two records of the same document, e.g., from different stages of a pipeline.
+    Stage times and the total are added; other values are taken from `other` unless they are None.
+    """
+    if record is None or other is None:
+        return other if record is None else record
+    merged = dict(record)
+    merged.update({key: value for key, value in other.items() if value is not None})
+    merged['total'] = record['total'] + other['total']
+    merged['stages'] = {name: dict(stats) for name, stats in record['stages'].items()}
+    for name, stats in other['stages'].items():
+        if name not in merged['stages']:
+            merged['stages'][name] = dict(stats)
+            continue
+        for key, value in stats.items():
+            merged['stages'][name][key] = merged['stages'][name].get(key, 0) + value
+    return merged
+
+
+def get_percentile(sorted_values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of sorted values, i.e., the smallest value with at least `q` percent
+    of the values at or below it
+
+    Examples
+    --------
+    >>> get_percentile([1, 2, 3, 4, 5, 6], 50)
+    3
+    >>> get_percentile(list(range(1, 11)), 50)
+    5
+    >>> get_percentile([1, 2], 50)
+    1
+    >>> get_percentile(list(range(1, 101)), 99)
+    99
+    >>> get_percentile(list(range(1, 101)), 7)
+    7
+    """
+    if not sorted_values:
+        return 0.0
+    # rounded first, so that float error does not push an exact rank (e.g., 7 / 100 * 100) to the next value
+    rank = math.ceil(round(q * len(sorted_values) / 100, 6))
+    idx = min(max(rank - 1, 0), len(sorted_values) - 1)
+    return sorted_values[idx]
+
+
+class StageStatistics:
+    """
+    Collects the per-document records, optionally writing them as JSON lines,
+    and summarizes them per stage and per publisher.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None):
+        self._file = open(jsonl_path, 'w', encoding='utf-8') if jsonl_path else None
+        self._times: Dict[Tuple[str, str], List[float]] = dict()
+        self._counts: Dict[Tuple[str, str], int] = dict()
+        self._n_docs = 0
+        self._start = time.perf_counter()
+
+    def add(self, record: Optional[dict]):
+        if record is None:
+            return self
+        self._n_docs += 1
+        if self._file is not None:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+        publisher = record.get('publisher') or '<unknown>'
+        stages = dict(record['stages'])
+        stages['<document>'] = {'time': record['total'], 'count': 1}
+        for name, stats in stages.items():
+            for key in ((name, publisher), (name, '<all>')):
+                self._times.setdefault(key, list()).append(stats['time'])
+                self._counts[key] = self._counts.get(key, 0) + stats['count']
+        return self
+
+    def summary(self) -> str:
+        """
+        Format a table with the per-document time of each stage (in ms) and the number of calls
+        """
+        elapsed = time.perf_counter() - self._start
+        header = f"{'stage':<24} {'publisher':<12} {'docs':>7} {'calls':>8} {'total(s)':>10} " \
+                 f"{'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"
+        lines = [header, '-' * len(header)]
+        for (name, publisher) in sorted(self._times, key=lambda x: (x[1] != '<all>', x[1], x[0])):
+            values = sorted(self._times[(name, publisher)])
+            lines.append(
+                f"{name:<24} {publisher:<12} {len(values):>7} {self._counts[(name, publisher)]:>8} "
+                f"{sum(values):>10.2f} {sum(values) / len(values) * 1e3:>9.2f} "
+                f"{get_percentile(values, 50) * 1e3:>9.2f} {get_percentile(values, 90) * 1e3:>9.2f} "
+                f"{get_percentile(values, 99) * 1e3:>9.2f} {values[-1] * 1e3:>9.2f}"
+            )
+        lines.append(f"{self._n_docs} documents in {elapsed:.2f}s "
+                     f"({self._n_docs / elapsed if elapsed > 0 else 0:.2f} documents/s)")
+        return '\n'.join(lines)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,270 @@
+"""
+Registry of the publishers the article parser supports.
+
+Each publisher is described by a `PublisherSpec`: how its documents are recognized, where their
+doi is found, which parser backend builds their DOM and which function constructs the `Article`.
+The built-in publishers are registered by `cap.article_constr`. Other packages can add
+publishers, or replace built-in ones, through the `cap.publishers` entry point group, e.g.
+
+    [options.entry_points]
+    cap.publishers =
+        mypublisher = mypackage.parser:MY_PUBLISHER_SPEC
+
+An entry point may refer to a `PublisherSpec`, an iterable of them, or a function without
+arguments returning either. Entry points are loaded on the first lookup.
+
+The backend of a publisher can be changed at run time with `set_backend`, e.g., to benchmark a
+faster tree builder (`--html_backends` of `process_articles.py`, `benchmarks.html_parity`) or to
+stream large XML documents (`--xml_backends`, `benchmarks.xml_streaming`).
+"""
+import logging
+from dataclasses import dataclass
+from typing import Optional, Union, Callable, Dict, List, Tuple, Iterator, Any
+
+logger = logging.getLogger(__name__)
+
+PUBLISHER_ENTRY_POINT_GROUP = 'cap.publishers'
+
+# backends given by name; a backend can also be a function building the DOM from the document
+# (a str for html, the raw bytes for xml)
+HTML_BACKENDS = ('lxml', 'html5lib', 'html.parser', 'lxml.html')
+# builds an `lxml.html` tree instead of a BeautifulSoup, for the publishers with an lxml constructor
+LXML_TREE_BACKEND = 'lxml.html'
+# backends that can build only the `regions` of a document
+PARSE_FILTERING_BACKENDS = ('lxml', 'html.parser')
+XML_BACKENDS = ('etree', 'iterparse')
+# parses the document incrementally with the streaming constructor of the publisher instead of building the tree
+STREAMING_XML_BACKEND = 'iterparse'
+FILE_TYPE_BACKENDS = {'html': HTML_BACKENDS, 'xml': XML_BACKENDS}
+
+
+@dataclass
+class PublisherSpec:
+    name: str
+    # 'html' or 'xml'
+    file_type: str
+    # (dom, doi) -> (Article, ArticleComponentCheck)
+    constructor: Callable[..., Tuple[Any, Any]]
+    # dom -> lower-cased doi; raises if the doi is not found
+    doi_extractor: Callable[[Any], str]
+    # raw file contents -> whether the document is of this publisher. Detectors of the registered
+    # publishers are tried in registration order before the built-in detection, which
+    # recognizes the built-in publishers
+    detector: Optional[Callable[[bytes], bool]] = None
+    # raw file contents -> lower-cased doi or None if it cannot be reliably determined without the DOM
+    doi_sniffer: Optional[Callable[[bytes], Optional[str]]] = None
+    # name in `HTML_BACKENDS`/`XML_BACKENDS`, or a function building the DOM
+    backend: Union[str, Callable[[Any], Any]] = 'lxml'
+    # html elements the constructor and the doi extractor read, as (tag name, attributes) pairs; a 'class'
+    # attribute matches if it is part of the class of the element, other attributes match if they are equal.
+    # With the lxml and html.parser backends, only the matching elements and their subtrees are built;
+    # they are placed in an empty <head> (<title> and <meta>) or <body>. None to build the whole document
+    regions: Optional[Tuple[Tuple[str, Dict[str, str]], ...]] = None
+    # constructor and doi extractor working on an `lxml.html` tree, used with the 'lxml.html' backend
+    lxml_constructor: Optional[Callable[..., Tuple[Any, Any]]] = None
+    lxml_doi_extractor: Optional[Callable[[Any], str]] = None
+    # (raw contents, doi or None) -> (Article, ArticleComponentCheck), used with the 'iterparse' backend.
+    # Parses the document incrementally and reads the doi from it if not given
+    streaming_constructor: Optional[Callable[..., Tuple[Any, Any]]] = None
+
+    def __post_init__(self):
+        if self.file_type not in FILE_TYPE_BACKENDS:
+            raise ValueError(f"Unknown file type '{self.file_type}' of publisher '{self.name}'")
+        check_backend(self.file_type, self.backend)
+        check_backend_support(self, self.backend)
+
+
+_publishers: Dict[Tuple[str, str], PublisherSpec] = dict()
+_backend_overrides: Dict[Tuple[str, str], Union[str, Callable]] = dict()
+_entry_points_loaded = False
+
+
+def check_backend(file_type: str, backend: Union[str, Callable]):
+    if not callable(backend) and backend not in FILE_TYPE_BACKENDS[file_type]:
+        raise ValueError(f"Unknown {file_type} backend '{backend}'; "
+                         f"expected one of {FILE_TYPE_BACKENDS[file_type]} or a function")
+
+
+def check_lxml_support(spec: PublisherSpec):
+    if spec.lxml_constructor is None or spec.lxml_doi_extractor is None:
+        raise ValueError(f"The {spec.file_type} publisher '{spec.name}' has no lxml constructor "
+                         f"for the '{LXML_TREE_BACKEND}' backend")
+
+
+def check_streaming_support(spec: PublisherSpec):
+    if spec.streaming_constructor is None:
+        raise ValueError(f"The {spec.file_type} publisher '{spec.name}' has no streaming constructor "
+                         f"for the '{STREAMING_XML_BACKEND}' backend")
+
+
+def check_backend_support(spec: PublisherSpec, backend: Union[str, Callable]):
+    if backend == LXML_TREE_BACKEND:
+        check_lxml_support(spec)
+    elif backend == STREAMING_XML_BACKEND:
+        check_streaming_support(spec)
+
+
+def get_dom_functions(spec: PublisherSpec, backend: Union[str, Callable]) -> Tuple[Callable, Callable]:
+    """
+    The constructor and the doi extractor of a publisher for the DOM the backend builds
+    """
+    if backend == LXML_TREE_BACKEND:
+        check_lxml_support(spec)
+        return spec.lxml_constructor, spec.lxml_doi_extractor
+    return spec.constructor, spec.doi_extractor
+
+
+def get_backend_name(backend: Union[str, Callable]) -> str:
+    if callable(backend):
+        return getattr(backend, '__name__', 'custom')
+    return backend
+
+
+def register_publisher(spec: PublisherSpec, replace: Optional[bool] = False) -> PublisherSpec:
+    """
+    Add a publisher to the registry.
+
+    Parameters
+    ----------
+    spec: the publisher
+    replace: replace a registered publisher with the same name and file type instead of raising
+
+    Returns
+    -------
+    the registered spec
+    """
+    key = (spec.file_type, spec.name)
+    if key in _publishers and not replace:
+        raise ValueError(f"The {spec.file_type} publisher '{spec.name}' is already registered")
+    # re-registering keeps the detector order, so that replacing a publisher does not change
+    # which detector recognizes a document first
+    _publishers[key] = spec
+    return spec
+
+
+def iter_entry_points(group: str) -> list:
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        # python < 3.8
+        try:
+            import pkg_resources
+        except ImportError:
+            return list()
+        return list(pkg_resources.iter_entry_points(group))
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        return list(eps.select(group=group))
+    return list(eps.get(group, ()))
+
+
+def load_entry_points(group: Optional[str] = PUBLISHER_ENTRY_POINT_GROUP):
+    """
+    Register the publishers of the installed entry points. They replace built-in publishers of
+    the same name. A failing entry point is logged and skipped.
+    """
+    global _entry_points_loaded
+    _entry_points_loaded = True
+    for entry_point in iter_entry_points(group):
+        try:
+            specs = entry_point.load()
+            if callable(specs) and not isinstance(specs, PublisherSpec):
+                specs = specs()
+            if isinstance(specs, PublisherSpec):
+                specs = [specs]
+            for spec in specs:
+                if not isinstance(spec, PublisherSpec):
+                    raise TypeError(f"expected a PublisherSpec, got {type(spec).__name__}")
+                if (spec.file_type, spec.name) in _publishers:
+                    logger.info(f"Entry point '{entry_point.name}' replaces the {spec.file_type} "
+                                f"publisher '{spec.name}'")
+                register_publisher(spec, replace=True)
+        except Exception as e:
+            logger.warning(f"Failed to load the publishers of entry point '{entry_point.name}': {e!r}")
+
+
+def _ensure_entry_points():
+    if not _entry_points_loaded:
+        load_entry_points()
+
+
+def get_publisher(file_type: str, name: str) -> PublisherSpec:
+    _ensure_entry_points()
+    try:
+        return _publishers[(file_type, name)]
+    except KeyError:
+        raise ValueError(f"Unknown {file_type} publisher '{name}'")
+
+
+def iter_publishers(file_type: Optional[str] = None) -> Iterator[PublisherSpec]:
+    _ensure_entry_points()
+    for spec in list(_publishers.values()):
+        if file_type is None or spec.file_type == file_type:
+            yield spec
+
+
+def has_detectors(file_type: str) -> bool:
+    return any(spec.detector is not None for spec in iter_publishers(file_type))
+
+
+def detect_publisher(file_type: str, contents: bytes) -> Optional[str]:
+    """
+    Try the detectors of the registered publishers on the raw contents of a document.
+    A detector that raises is treated as not recognizing the document.
+
+    Returns
+    -------
+    the name of the first publisher whose detector accepts the document, or None
+    """
+    for spec in iter_publishers(file_type):
+        if spec.detector is None:
+            continue
+        try:
+            if spec.detector(contents):
+                return spec.name
+        except Exception as e:
+            logger.debug(f"The detector of publisher '{spec.name}' failed: {e!r}")
+    return None
+
+
+def set_backend(file_type: str, name: str, backend: Optional[Union[str, Callable]]):
+    """
+    Override the backend of a publisher, or restore the one of its spec if `backend` is None.
+    The publisher does not need to be registered yet.
+    """
+    if backend is None:
+        _backend_overrides.pop((file_type, name), None)
+        return
+    check_backend(file_type, backend)
+    if (file_type, name) in _publishers:
+        check_backend_support(_publishers[(file_type, name)], backend)
+    _backend_overrides[(file_type, name)] = backend
+
+
+def get_backend(spec: PublisherSpec) -> Union[str, Callable]:
+    return _backend_overrides.get((spec.file_type, spec.name), spec.backend)
+
+
+def parse_backend_overrides(overrides: Optional[List[str]], file_type: Optional[str] = 'html') -> Dict[str, str]:
+    """
+    Parse 'publisher=backend' items, e.g., ['elsevier=lxml', 'rsc=html.parser'] or ['elsevier=iterparse']
+    """
+    parsed = dict()
+    for override in overrides or ():
+        name, sep, backend = override.partition('=')
+        if not sep or not name.strip():
+            raise ValueError(f"Expected 'publisher=backend', got '{override}'")
+        check_backend(file_type, backend.strip())
+        parsed[name.strip().lower()] = backend.strip()
+    return parsed
+
+
+def set_backends(overrides: Optional[List[str]], file_type: Optional[str] = 'html'):
+    """
+    Replace all backend overrides of `file_type` by the 'publisher=backend' items of `overrides`
+    """
+    parsed = parse_backend_overrides(overrides, file_type)
+    for key in [key for key in _backend_overrides if key[0] == file_type]:
+        del _backend_overrides[key]
+    for name, backend in parsed.items():
+        set_backend(file_type, name, backend)
@@ -1,8 +1,7 @@
-import copy
 import re
 import bs4
 import numpy as np
-from typing import List, Optional
+from typing import List, Optional, Tuple, Dict
 from seqlbtoolkit.text import format_text
 
 from .article import (
@@ -14,19 +13,71 @@ from .table import (
     TableRow,
     TableCell
 )
+from .traversal import walk, DESCEND
+
+# children of ACS <sec> elements that become article elements
+XML_SECTION_LEAF_TAGS_ACS = ('label', 'title', 'p')
+# elements inside ACS paragraphs that are not part of the paragraph text
+XML_PARAGRAPH_SKIPPED_TAGS_ACS = ('table-wrap', 'fig')
+
+ELSEVIER_ARTICLE_NS = '{http://www.elsevier.com/xml/svapi/article/dtd}'
+ELSEVIER_XOCS_NS = '{http://www.elsevier.com/xml/xocs/dtd}'
+ELSEVIER_COMMON_NS = '{http://www.elsevier.com/xml/common/dtd}'
+
+ELSEVIER_ORIGINAL_TEXT_TAG = ELSEVIER_ARTICLE_NS + 'originalText'
+ELSEVIER_DOC_TAG = ELSEVIER_XOCS_NS + 'doc'
+ELSEVIER_DOI_TAG = ELSEVIER_XOCS_NS + 'doi'
+ELSEVIER_TITLE_TAG = ELSEVIER_COMMON_NS + 'title'
+ELSEVIER_ABSTRACT_TAG = ELSEVIER_COMMON_NS + 'abstract'
+ELSEVIER_SIMPLE_PARA_TAG = ELSEVIER_COMMON_NS + 'simple-para'
+ELSEVIER_TABLE_TAG = ELSEVIER_COMMON_NS + 'table'
+ELSEVIER_SECTIONS_TAG = ELSEVIER_COMMON_NS + 'sections'
+# elements `find_xml_components_elsevier` looks for
+ELSEVIER_COMPONENT_TAGS = frozenset((ELSEVIER_TITLE_TAG, ELSEVIER_ABSTRACT_TAG, ELSEVIER_TABLE_TAG, ELSEVIER_SECTIONS_TAG))
+
+
+def collect_xml_text(element, skip_tags, texts: List[str], skipped: list):
+    """
+    Append the text of `element` to `texts` in the order of `element.itertext()`, except for the
+    descendants whose tag is in `skip_tags`: these are appended to `skipped` and neither their text
+    nor the text following them (their tail) is collected
+    """
+    tag = element.tag
+    if not isinstance(tag, str) and tag is not None:
+        return
+
+    def visit(child, _):
+        if child.tag in skip_tags:
+            skipped.append(child)
+            return None
+        # comments and processing instructions have no text, but their tail is collected
+        child_tag = child.tag
+        if (isinstance(child_tag, str) or child_tag is None) and child.text:
+            texts.append(child.text)
+        return DESCEND
+
+    def leave(child, _):
+        if child.tail:
+            texts.append(child.tail)
+
+    if element.text:
+        texts.append(element.text)
+    walk(element, visit, leave=leave)
+
+
+def get_xml_text_skipping(element, skip_tags) -> Tuple[str, list]:
+    """
+    The formatted text of an element without the subtrees of the `skip_tags` descendants, which
+    are returned in document order. The element is not modified
 
-
-def pop_xml_element_iter(root, del_tag: List[str], popped_items: Optional[list] = None):
-    if popped_items is None:
-        popped_items = list()
-    for child in root.getchildren():
-
-        if child.tag in del_tag:
-            popped_items.append(child)
-            root.remove(child)
-        else:
-            pop_xml_element_iter(child, del_tag, popped_items)
-    return popped_items
+    Returns
+    -------
+    text, skipped elements
+    """
+    texts = list()
+    skipped = list()
+    collect_xml_text(element, skip_tags, texts, skipped)
+    return format_text(''.join(texts)), skipped
 
 
 def get_xml_text_iter(element):
@@ -36,65 +87,123 @@ def get_xml_text_iter(element):
     return format_text(''.join(txt))
 
 
+def find_xml_components_elsevier(doc):
+    """
+    Find the elements the Elsevier constructor reads in one traversal of the document
+
+    Returns
+    -------
+    the last title, the last author abstract (or None), the tables, and the last sections (or None)
+    """
+    title_element = None
+    abs_element = None
+    table_elements = list()
+    sections_element = None
+    # filter first: the few matches are dispatched below, most elements only pay for the membership test
+    for element in [element for element in doc.iter() if element.tag in ELSEVIER_COMPONENT_TAGS]:
+        tag = element.tag
+        if tag == ELSEVIER_TITLE_TAG:
+            title_element = element
+        elif tag == ELSEVIER_ABSTRACT_TAG:
+            if element.attrib.get('class') == 'author':
+                abs_element = element
+        elif tag == ELSEVIER_TABLE_TAG:
+            table_elements.append(element)
+        elif tag == ELSEVIER_SECTIONS_TAG:
+            sections_element = element
+    return title_element, abs_element, table_elements, sections_element
+
+
 def xml_section_extract_elsevier(section_root, element_list=None) -> List[ArticleElement]:
     """
     Depth-first search of the text in the sections
     """
     if element_list is None:
         element_list = list()
-    for child in section_root:
-        if 'label' in child.tag or 'section-title' in child.tag or 'para' in child.tag:
-            target_txt = get_xml_text_iter(child)
-            element_type = None
-            if 'label' in child.tag:
-                element_type = ArticleElementType.SECTION_ID
-            elif 'section-title' in child.tag:
-                element_type = ArticleElementType.SECTION_TITLE
-            elif 'para' in child.tag:
-                element_type = ArticleElementType.PARAGRAPH
-            element = ArticleElement(type=element_type, content=target_txt)
-            element_list.append(element)
-        elif 'section' in child.tag:
-            xml_section_extract_elsevier(section_root=child, element_list=element_list)
+    walk(section_root, visit_xml_section_elsevier, element_list)
     return element_list
 
 
+def visit_xml_section_elsevier(child, element_list: List[ArticleElement]):
+    """
+    Visitor of `xml_section_extract_elsevier`: extract the leaves and descend into the sub-sections
+    """
+    if is_xml_section_leaf_elsevier(child.tag):
+        xml_section_leaf_extract_elsevier(child, element_list)
+    elif 'section' in child.tag:
+        return element_list
+    return None
+
+
+def is_xml_section_leaf_elsevier(tag: str) -> bool:
+    return 'label' in tag or 'section-title' in tag or 'para' in tag
+
+
+def xml_section_leaf_extract_elsevier(child, element_list: List[ArticleElement]):
+    """
+    Append the element of a section label, title or paragraph
+    """
+    target_txt = get_xml_text_iter(child)
+    element_type = None
+    if 'label' in child.tag:
+        element_type = ArticleElementType.SECTION_ID
+    elif 'section-title' in child.tag:
+        element_type = ArticleElementType.SECTION_TITLE
+    elif 'para' in child.tag:
+        element_type = ArticleElementType.PARAGRAPH
+    element = ArticleElement(type=element_type, content=target_txt)
+    element_list.append(element)
+
+
 def xml_section_extract_acs(section_root, element_list=None) -> List[ArticleElement]:
     """
     Depth-first search of the text in the sections
     """
     if element_list is None:
         element_list = list()
-    for child in section_root:
-        if child.tag in ['label', 'title', 'p']:
-            xml_tables = list()
-            if child.tag == 'label':
-                element_type = ArticleElementType.SECTION_ID
-                target_txt = get_xml_text_iter(child)
-            elif child.tag == 'title':
-                element_type = ArticleElementType.SECTION_TITLE
-                target_txt = get_xml_text_iter(child)
-            else:  # child.tag == 'p'
-                child_cp = copy.deepcopy(child)
-                items = pop_xml_element_iter(child_cp, [r'table-wrap', r'fig'])
-                for item in items:
-                    if item.tag == r'table-wrap':
-                        xml_tables.append(item)
-                element_type = ArticleElementType.PARAGRAPH
-                target_txt = get_xml_text_iter(child_cp)
-            element = ArticleElement(type=element_type, content=target_txt)
-            element_list.append(element)
-
-            for xml_table in xml_tables:
-                element_type = ArticleElementType.TABLE
-                tbl = xml_table_extract_acs(xml_table)
-                element = ArticleElement(type=element_type, content=tbl)
-                element_list.append(element)
-        elif child.tag == 'sec':
-            xml_section_extract_acs(section_root=child, element_list=element_list)
+    walk(section_root, visit_xml_section_acs, element_list)
     return element_list
 
 
+def visit_xml_section_acs(child, element_list: List[ArticleElement]):
+    """
+    Visitor of `xml_section_extract_acs`: extract the leaves and descend into the sub-sections
+    """
+    if child.tag in XML_SECTION_LEAF_TAGS_ACS:
+        xml_section_leaf_extract_acs(child, element_list)
+    elif child.tag == 'sec':
+        return element_list
+    return None
+
+
+def xml_section_leaf_extract_acs(child, element_list: List[ArticleElement]):
+    """
+    Append the element of a section label, title or paragraph, followed by the tables of a paragraph
+    """
+    xml_tables = list()
+    if child.tag == 'label':
+        element_type = ArticleElementType.SECTION_ID
+        target_txt = get_xml_text_iter(child)
+    elif child.tag == 'title':
+        element_type = ArticleElementType.SECTION_TITLE
+        target_txt = get_xml_text_iter(child)
+    else:  # child.tag == 'p'
+        # tables and figures are left out of the paragraph text; tables follow the paragraph
+        target_txt, items = get_xml_text_skipping(child, XML_PARAGRAPH_SKIPPED_TAGS_ACS)
+        for item in items:
+            if item.tag == r'table-wrap':
+                xml_tables.append(item)
+        element_type = ArticleElementType.PARAGRAPH
+    element = ArticleElement(type=element_type, content=target_txt)
+    element_list.append(element)
+
+    for xml_table in xml_tables:
+        element_type = ArticleElementType.TABLE
+        tbl = xml_table_extract_acs(xml_table)
+        element = ArticleElement(type=element_type, content=tbl)
+        element_list.append(element)
+
+
 def html_section_extract_nature(section_root: bs4.element.Tag,
                                 element_list: Optional[List] = None):
     """
@@ -102,29 +211,38 @@ def html_section_extract_nature(section_root: bs4.element.Tag,
     """
     if element_list is None:
         element_list = list()
-
-    for child in section_root.children:
-        block_name = child.name
-        try:
-            # if the child is a section title
-            if re.match(r"h[0-9]", block_name):
-                element_type = ArticleElementType.SECTION_TITLE
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            # if the child is a section block
-            elif block_name == 'p':
-                element_type = ArticleElementType.PARAGRAPH
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            elif 'figure' in block_name or 'table' in block_name:
-                continue
-            else:
-                html_section_extract_nature(section_root=child, element_list=element_list)
-        except TypeError:
-            pass
+    walk(section_root, visit_html_section_nature, element_list)
     return element_list
 
 
+def visit_html_section_nature(child, element_list: List):
+    """
+    Visitor of `html_section_extract_nature`
+    """
+    block_name = child.name
+    # strings have no name
+    if block_name is None:
+        return None
+    try:
+        # if the child is a section title
+        if re.match(r"h[0-9]", block_name):
+            element_type = ArticleElementType.SECTION_TITLE
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        # if the child is a section block
+        elif block_name == 'p':
+            element_type = ArticleElementType.PARAGRAPH
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        elif 'figure' in block_name or 'table' in block_name:
+            return None
+        else:
+            return element_list
+    except TypeError:
+        pass
+    return None
+
+
 def html_section_extract_wiley(section_root: bs4.element.Tag,
                                element_list: Optional[List] = None):
     """
@@ -132,39 +250,44 @@ def html_section_extract_wiley(section_root: bs4.element.Tag,
     """
     if element_list is None:
         element_list = list()
+    walk(section_root, visit_html_section_wiley, element_list)
+    return element_list
 
-    for child in section_root.children:
 
-        child_name = child.name
-        if isinstance(child, bs4.element.Tag):
-            child_class = child.attrs.get('class', '')
-            if isinstance(child_class, list):
-                child_class = ''.join(child_class)
+def visit_html_section_wiley(child, element_list: List):
+    """
+    Visitor of `html_section_extract_wiley`
+    """
+    child_name = child.name
+    # strings have no name
+    if child_name is None:
+        return None
+    child_class = child.attrs.get('class', '')
+    if isinstance(child_class, list):
+        child_class = ''.join(child_class)
+
+    try:
+        # if the child is a section title
+        if re.match(r"h[0-9]", child_name):
+            element_type = ArticleElementType.SECTION_TITLE
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        # if the child is a section block
+        elif child_name == 'p':
+            element_type = ArticleElementType.PARAGRAPH
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        elif child_name == 'div' and child_class == 'article-table-content':
+            element_type = ArticleElementType.TABLE
+            tbl = html_table_extract_wiley(child)
+            element_list.append(ArticleElement(type=element_type, content=tbl))
+        elif 'figure' in child_name or 'table' in child_name:
+            return None
         else:
-            child_class = ''
-
-        try:
-            # if the child is a section title
-            if re.match(r"h[0-9]", child_name):
-                element_type = ArticleElementType.SECTION_TITLE
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            # if the child is a section block
-            elif child_name == 'p':
-                element_type = ArticleElementType.PARAGRAPH
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            elif child_name == 'div' and child_class == 'article-table-content':
-                element_type = ArticleElementType.TABLE
-                tbl = html_table_extract_wiley(child)
-                element_list.append(ArticleElement(type=element_type, content=tbl))
-            elif 'figure' in child_name or 'table' in child_name:
-                continue
-            else:
-                html_section_extract_wiley(section_root=child, element_list=element_list)
-        except TypeError:
-            pass
-    return element_list
+            return element_list
+    except TypeError:
+        pass
+    return None
 
 
 def html_section_extract_rsc(section_root: bs4.element.Tag,
@@ -179,64 +302,72 @@ def html_section_extract_rsc(section_root: bs4.element.Tag,
     if n_h2 is None:
         n_h2 = len(section_root.find_all('h2'))
 
-    for child in section_root.children:
+    walk(section_root, visit_html_section_rsc, (element_list, n_h2))
+    return element_list
 
-        child_name = child.name
-        if isinstance(child, bs4.element.Tag):
-            child_class = child.attrs.get('class', '')
-            if isinstance(child_class, list):
-                child_class = ''.join(child_class)
-        else:
-            child_class = ''
 
-        try:
-            # if the child is a section title
-            if re.match(r"h[2-9]+", child_name):
-                element_type = ArticleElementType.SECTION_TITLE
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            # if the child is a section block
-            elif child_name == 'p':
-                # the article cannot start with paragraph
+def visit_html_section_rsc(child, state: Tuple[List, int]):
+    """
+    Visitor of `html_section_extract_rsc`, with the element list and the number of <h2> of the
+    whole section root as state
+    """
+    child_name = child.name
+    # strings have no name
+    if child_name is None:
+        return None
+    child_class = child.attrs.get('class', '')
+    if isinstance(child_class, list):
+        child_class = ''.join(child_class)
+
+    element_list, n_h2 = state
+    try:
+        # if the child is a section title
+        if re.match(r"h[2-9]+", child_name):
+            element_type = ArticleElementType.SECTION_TITLE
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        # if the child is a section block
+        elif child_name == 'p':
+            # the article cannot start with paragraph
+            if not element_list:
+                if 'abstract' in child_class.lower():
+                    element_list.append("<abs>")
+                return None
+            element_type = ArticleElementType.PARAGRAPH
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        elif child_name == 'span':
+            if n_h2 > 1:
                 if not element_list:
-                    if 'abstract' in child_class.lower():
-                        element_list.append("<abs>")
-                    continue
-                element_type = ArticleElementType.PARAGRAPH
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            elif child_name == 'span':
-                if n_h2 > 1:
-                    if not element_list:
-                        if len(child.find_all('h2')) > 0:
-                            html_section_extract_rsc(section_root=child, element_list=element_list, n_h2=n_h2)
-                        continue
-                    cid = child.get('id', '')
-                    if len(element_list) == 1 and element_list[0] == '<abs>':
-                        element_type = ArticleElementType.PARAGRAPH
-                        target_txt = format_text(child.text)
-                        element_list[0] = ArticleElement(type=element_type, content=target_txt)
-                        continue
-                    elif element_list[-1].type != ArticleElementType.SECTION_TITLE and 'sec' not in cid:
-                        continue
-                element_type = ArticleElementType.PARAGRAPH
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            elif child_name == 'div' and child_class == 'rtable__wrapper':
-                tbl = html_table_extract_rsc(child)
-                element_type = ArticleElementType.TABLE
-                element_list.append(ArticleElement(type=element_type, content=tbl))
-            # skip table captions (will be captured in `html_table_extract_rsc`)
-            elif child_name == 'div' and child_class == 'table_caption':
-                continue
-            # skip figures (for now)
-            elif 'figure' in child_name or (child_name == 'div' and child_class == 'image_table'):
-                continue
-            else:
-                html_section_extract_rsc(section_root=child, element_list=element_list, n_h2=n_h2)
-        except TypeError:
-            pass
-    return element_list
+                    if len(child.find_all('h2')) > 0:
+                        return state
+                    return None
+                cid = child.get('id', '')
+                if len(element_list) == 1 and element_list[0] == '<abs>':
+                    element_type = ArticleElementType.PARAGRAPH
+                    target_txt = format_text(child.text)
+                    element_list[0] = ArticleElement(type=element_type, content=target_txt)
+                    return None
+                elif element_list[-1].type != ArticleElementType.SECTION_TITLE and 'sec' not in cid:
+                    return None
+            element_type = ArticleElementType.PARAGRAPH
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        elif child_name == 'div' and child_class == 'rtable__wrapper':
+            tbl = html_table_extract_rsc(child)
+            element_type = ArticleElementType.TABLE
+            element_list.append(ArticleElement(type=element_type, content=tbl))
+        # skip table captions (will be captured in `html_table_extract_rsc`)
+        elif child_name == 'div' and child_class == 'table_caption':
+            return None
+        # skip figures (for now)
+        elif 'figure' in child_name or (child_name == 'div' and child_class == 'image_table'):
+            return None
+        else:
+            return state
+    except TypeError:
+        pass
+    return None
 
 
 def html_section_extract_springer(section_root: bs4.element.Tag,
@@ -246,53 +377,60 @@ def html_section_extract_springer(section_root: bs4.element.Tag,
     """
     if element_list is None:
         element_list = list()
+    walk(section_root, visit_html_section_springer, element_list)
+    return element_list
 
-    for child in section_root.children:
-        child_name = child.name
-        if isinstance(child, bs4.element.Tag):
-            child_class = child.attrs.get('class', '')
-            if isinstance(child_class, list):
-                child_class = ''.join(child_class)
-        else:
-            child_class = ''
-        try:
-            # if the child is a section title
-            if re.match(r"h[0-9]", child_name):
-                element_type = ArticleElementType.SECTION_TITLE
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            # if the child is a section block
-            elif child_name == 'p':
-                element_type = ArticleElementType.PARAGRAPH
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            elif 'figure' in child_name or 'table' in child_name or (child_name == 'div' and child_class == 'Table'):
-                continue
-            elif child_name == 'div' and child_class == 'Table':
-                tbl = html_table_extract_springer(child)
+
+def visit_html_section_springer(child, element_list: List):
+    """
+    Visitor of `html_section_extract_springer`. The tables and figures of a paragraph block are
+    extracted from the tree before the walk descends into it
+    """
+    child_name = child.name
+    # strings have no name
+    if child_name is None:
+        return None
+    child_class = child.attrs.get('class', '')
+    if isinstance(child_class, list):
+        child_class = ''.join(child_class)
+    try:
+        # if the child is a section title
+        if re.match(r"h[0-9]", child_name):
+            element_type = ArticleElementType.SECTION_TITLE
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        # if the child is a section block
+        elif child_name == 'p':
+            element_type = ArticleElementType.PARAGRAPH
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        elif 'figure' in child_name or 'table' in child_name or (child_name == 'div' and child_class == 'Table'):
+            return None
+        elif child_name == 'div' and child_class == 'Table':
+            tbl = html_table_extract_springer(child)
+            element_type = ArticleElementType.TABLE
+            element_list.append(ArticleElement(type=element_type, content=tbl))
+        elif child_name == 'div' and child_class == 'Para':
+
+            for s in child.find_all('div', {"class": "Table"}):
+                table_element = s.extract()
                 element_type = ArticleElementType.TABLE
+                tbl = html_table_extract_springer(table_element)
                 element_list.append(ArticleElement(type=element_type, content=tbl))
-            elif child_name == 'div' and child_class == 'Para':
+            for s in child.find_all('figure'):
+                s.extract()
 
-                for s in child.find_all('div', {"class": "Table"}):
-                    table_element = s.extract()
-                    element_type = ArticleElementType.TABLE
-                    tbl = html_table_extract_springer(table_element)
-                    element_list.append(ArticleElement(type=element_type, content=tbl))
-                for s in child.find_all('figure'):
-                    s.extract()
-
-                if not child.find_all('p'):
-                    element_type = ArticleElementType.PARAGRAPH
-                    target_txt = format_text(child.text)
-                    element_list.append(ArticleElement(type=element_type, content=target_txt))
-                else:
-                    html_section_extract_springer(section_root=child, element_list=element_list)
+            if not child.find_all('p'):
+                element_type = ArticleElementType.PARAGRAPH
+                target_txt = format_text(child.text)
+                element_list.append(ArticleElement(type=element_type, content=target_txt))
             else:
-                html_section_extract_springer(section_root=child, element_list=element_list)
-        except TypeError:
-            pass
-    return element_list
+                return element_list
+        else:
+            return element_list
+    except TypeError:
+        pass
+    return None
 
 
 def html_section_extract_aip(section_root: bs4.element.Tag,
@@ -320,130 +458,169 @@ def get_leaf_section_elements(soup: bs4.BeautifulSoup, text=None):
     if text is None:
         text = ['']
 
-    block_name = soup.name
-    if isinstance(soup, bs4.element.Tag):
-        root_class = soup.attrs.get('class', '')
-        if isinstance(root_class, list):
-            root_class = ''.join(root_class)
-    else:
-        root_class = ''
+    # paragraphs are built as lists of strings and joined once, when the walk is done
+    fragments = [[ele] if isinstance(ele, str) else ele for ele in text]
+    is_walked = visit_leaf_section_element(soup, fragments) is not None
+    if is_walked:
+        walk(soup, visit_leaf_section_element, fragments)
+    text[:] = [''.join(ele) if isinstance(ele, list) else ele for ele in fragments]
+    return text if is_walked else None
+
+
+def visit_leaf_section_element(node, text: List):
+    """
+    Visitor of `get_leaf_section_elements`: strings are appended to the fragments of the current
+    paragraph, titles and tables are appended as elements, and paragraphs and tables start a new paragraph
+    """
+    if isinstance(node, bs4.element.NavigableString):
+        text[-1].append(str(node))
+        return None
+
+    block_name = node.name
+    root_class = node.attrs.get('class', '')
+    if isinstance(root_class, list):
+        root_class = ''.join(root_class)
 
     if re.match(r"h[0-9]", block_name):
         element_type = ArticleElementType.SECTION_TITLE
-        target_txt = format_text(soup.text)
+        target_txt = format_text(node.text)
         text.append(ArticleElement(type=element_type, content=target_txt))
-        text.append('')
+        text.append(list())
         return None
     elif block_name == 'p':
-        text.append('')
+        text.append(list())
     elif block_name == 'div' and 'tables' in root_class:
         element_type = ArticleElementType.TABLE
-        tbl = html_table_extract_elsevier(soup)
+        tbl = html_table_extract_elsevier(node)
         text.append(ArticleElement(type=element_type, content=tbl))
-        text.append('')
+        text.append(list())
     elif 'figure' in block_name:
         return None
+    return text
+
+
+def is_sec_like_section(section: bs4.element.Tag) -> bool:
+    sec_id = section.get('id', '').lower()
+    return sec_id.startswith('s') or ('sec' in sec_id)
+
 
-    for child in soup.children:
-        if isinstance(child, bs4.element.NavigableString):
-            text[-1] += str(child)
+def get_descendant_section_facts(root: bs4.element.Tag) -> Dict[int, Tuple[bool, bool]]:
+    """
+    Support function for `html_section_extract_elsevier`: in one post-order pass, find for every
+    <section> below `root` whether it has descendant <section>s and whether one of them is `sec`-like
+
+    Returns
+    -------
+    id of the section tag -> (has descendant sections, has a `sec`-like descendant section)
+    """
+    facts = dict()
+    # [tag, children iterator, has descendant sections, has a `sec`-like descendant section]
+    stack = [[root, iter(root.children), False, False]]
+    while stack:
+        frame = stack[-1]
+        for child in frame[1]:
+            if isinstance(child, bs4.element.Tag):
+                stack.append([child, iter(child.children), False, False])
+                break
         else:
-            get_leaf_section_elements(child, text=text)
-    return text
+            stack.pop()
+            tag, _, has_section, has_sec_like = frame
+            if tag.name == 'section':
+                facts[id(tag)] = (has_section, has_sec_like)
+                has_section = True
+                has_sec_like = has_sec_like or is_sec_like_section(tag)
+            if stack:
+                parent = stack[-1]
+                parent[2] = parent[2] or has_section
+                parent[3] = parent[3] or has_sec_like
+    return facts
 
 
 def html_section_extract_elsevier(section_root: bs4.element.Tag,
                                   element_list: Optional[List] = None,
-                                  record_data: Optional[bool] = False):
+                                  record_data: Optional[bool] = False,
+                                  section_facts: Optional[Dict[int, Tuple[bool, bool]]] = None):
     """
     Depth-first search of the text in sections
+
+    Whether a section has (`sec`-like) sub-sections is looked up in `section_facts`, which is
+    computed for the whole `section_root` on the first call, so that every node is visited a
+    bounded number of times
     """
     if element_list is None:
         element_list = list()
+    if section_facts is None:
+        section_facts = get_descendant_section_facts(section_root)
 
-    for child in section_root:
-        block_name = child.name
+    walk(section_root, visit_html_section_elsevier, (element_list, record_data, section_facts))
+    return element_list
 
-        if isinstance(child, bs4.element.Tag):
-            child_class = child.attrs.get('class', '')
-            if isinstance(child_class, list):
-                child_class = ''.join(child_class)
-        else:
-            child_class = ''
 
-        try:
-            # if the child is a section
-            if block_name == 'section':
-                sec_id = child.get('id', '').lower()
-                if (not sec_id.startswith('s')) and ('sec' not in sec_id):
-                    sub_secs = child.find_all('section')
-
-                    exist_sub_para = False
-                    for sub_sec in sub_secs:
-                        sub_sec_id = sub_sec.get('id', '').lower()
-                        if sub_sec_id.startswith('s') or ('sec' in sub_sec_id):
-                            exist_sub_para = True
-                            break
-                    if exist_sub_para:
-                        html_section_extract_elsevier(
-                            section_root=child,
-                            element_list=element_list,
-                            record_data=False
-                        )
-                    else:
-                        continue
-                elif not child.find_all('section'):  # leaf section
-                    if record_data:
-                        ele_list = get_leaf_section_elements(child)
-                        new_list = list()
-                        for ele in ele_list:
-                            if not ele:
-                                continue
-                            if not isinstance(ele, str):
-                                new_list.append(ele)
-                            else:
-                                sub_txt = ele.split('\n')
-                                for txt in sub_txt:
-                                    if not txt:
-                                        continue
-                                    element_type = ArticleElementType.PARAGRAPH
-                                    target_txt = format_text(txt)
-                                    new_list.append(ArticleElement(type=element_type, content=target_txt))
-                        element_list += new_list
-                else:
-                    html_section_extract_elsevier(
-                        section_root=child,
-                        element_list=element_list,
-                        record_data=True
-                    )
-            # if the child is a section title
-            elif re.match(r"h[0-9]", block_name):
-                if record_data:
-                    element_type = ArticleElementType.SECTION_TITLE
-                    target_txt = format_text(child.text)
-                    element_list.append(ArticleElement(type=element_type, content=target_txt))
-            # if the child is a section block
-            elif block_name == 'p':
-                if record_data:
-                    element_type = ArticleElementType.PARAGRAPH
-                    target_txt = format_text(child.text)
-                    element_list.append(ArticleElement(type=element_type, content=target_txt))
-            elif block_name == 'div' and 'tables' in child_class:
+def visit_html_section_elsevier(child, state: Tuple[List, bool, Dict[int, Tuple[bool, bool]]]):
+    """
+    Visitor of `html_section_extract_elsevier`, with the element list, whether the elements of the
+    current section are recorded, and the section facts as state
+    """
+    block_name = child.name
+    # strings have no name
+    if block_name is None:
+        return None
+    child_class = child.attrs.get('class', '')
+    if isinstance(child_class, list):
+        child_class = ''.join(child_class)
+
+    element_list, record_data, section_facts = state
+    try:
+        # if the child is a section
+        if block_name == 'section':
+            has_sub_secs, exist_sub_para = section_facts[id(child)]
+            if not is_sec_like_section(child):
+                if exist_sub_para:
+                    return element_list, False, section_facts
+            elif not has_sub_secs:  # leaf section
                 if record_data:
-                    element_type = ArticleElementType.TABLE
-                    tbl = html_table_extract_elsevier(child)
-                    element_list.append(ArticleElement(type=element_type, content=tbl))
-            elif 'figure' in block_name:
-                continue
+                    ele_list = get_leaf_section_elements(child)
+                    new_list = list()
+                    for ele in ele_list:
+                        if not ele:
+                            continue
+                        if not isinstance(ele, str):
+                            new_list.append(ele)
+                        else:
+                            sub_txt = ele.split('\n')
+                            for txt in sub_txt:
+                                if not txt:
+                                    continue
+                                element_type = ArticleElementType.PARAGRAPH
+                                target_txt = format_text(txt)
+                                new_list.append(ArticleElement(type=element_type, content=target_txt))
+                    element_list += new_list
             else:
-                html_section_extract_elsevier(
-                    section_root=child,
-                    element_list=element_list,
-                    record_data=record_data
-                )
-        except TypeError:
-            pass
-    return element_list
+                return element_list, True, section_facts
+        # if the child is a section title
+        elif re.match(r"h[0-9]", block_name):
+            if record_data:
+                element_type = ArticleElementType.SECTION_TITLE
+                target_txt = format_text(child.text)
+                element_list.append(ArticleElement(type=element_type, content=target_txt))
+        # if the child is a section block
+        elif block_name == 'p':
+            if record_data:
+                element_type = ArticleElementType.PARAGRAPH
+                target_txt = format_text(child.text)
+                element_list.append(ArticleElement(type=element_type, content=target_txt))
+        elif block_name == 'div' and 'tables' in child_class:
+            if record_data:
+                element_type = ArticleElementType.TABLE
+                tbl = html_table_extract_elsevier(child)
+                element_list.append(ArticleElement(type=element_type, content=tbl))
+        elif 'figure' in block_name:
+            return None
+        else:
+            return state
+    except TypeError:
+        pass
+    return None
 
 
 def html_section_extract_acs(section_root: bs4.element.Tag,
@@ -453,51 +630,61 @@ def html_section_extract_acs(section_root: bs4.element.Tag,
     """
     if element_list is None:
         element_list = list()
+    walk(section_root, visit_html_section_acs, element_list)
+    return element_list
 
-    for child in section_root.children:
-        block_name = child.name
-        try:
-            # if the child is a section title
-            if re.match(r"h[0-9]", block_name):
-                hid = child.get('id', '')
-                if not re.match(r"_i[0-9]+", hid):
-                    continue
-                element_type = ArticleElementType.SECTION_TITLE
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            # if the child is a section block
-            elif block_name == 'div':
-                div_class = child.get('class', [''])
-                # exclude all figures
-                for s in child.find_all('figure'):
-                    s.extract()
-
-                if len(div_class) == 0:
-                    div_class = ['']
-                if div_class[0] == "NLM_p":
-                    for s in child.find_all('div', {"class": "NLM_table-wrap"}):
-                        table_element = s.extract()
-                        element_type = ArticleElementType.TABLE
-                        tbl = html_table_extract_acs(table_element)
-                        element_list.append(ArticleElement(type=element_type, content=tbl))
-
-                    element_type = ArticleElementType.PARAGRAPH
-                    target_txt = format_text(child.text)
-                    element_list.append(ArticleElement(type=element_type, content=target_txt))
 
-                elif div_class[0] == "NLM_table-wrap":
-                    tbl = html_table_extract_acs(child)
+def visit_html_section_acs(child, element_list: List):
+    """
+    Visitor of `html_section_extract_acs`. The figures of a block are extracted from the tree
+    before the walk descends into it
+    """
+    block_name = child.name
+    # strings have no name
+    if block_name is None:
+        return None
+    try:
+        # if the child is a section title
+        if re.match(r"h[0-9]", block_name):
+            hid = child.get('id', '')
+            if not re.match(r"_i[0-9]+", hid):
+                return None
+            element_type = ArticleElementType.SECTION_TITLE
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        # if the child is a section block
+        elif block_name == 'div':
+            div_class = child.get('class', [''])
+            # exclude all figures
+            for s in child.find_all('figure'):
+                s.extract()
+
+            if len(div_class) == 0:
+                div_class = ['']
+            if div_class[0] == "NLM_p":
+                for s in child.find_all('div', {"class": "NLM_table-wrap"}):
+                    table_element = s.extract()
                     element_type = ArticleElementType.TABLE
+                    tbl = html_table_extract_acs(table_element)
                     element_list.append(ArticleElement(type=element_type, content=tbl))
-                else:
-                    html_section_extract_acs(section_root=child, element_list=element_list)
-            elif 'figure' in block_name:
-                continue
+
+                element_type = ArticleElementType.PARAGRAPH
+                target_txt = format_text(child.text)
+                element_list.append(ArticleElement(type=element_type, content=target_txt))
+
+            elif div_class[0] == "NLM_table-wrap":
+                tbl = html_table_extract_acs(child)
+                element_type = ArticleElementType.TABLE
+                element_list.append(ArticleElement(type=element_type, content=tbl))
             else:
-                html_section_extract_acs(section_root=child, element_list=element_list)
-        except TypeError:
-            pass
-    return element_list
+                return element_list
+        elif 'figure' in block_name:
+            return None
+        else:
+            return element_list
+    except TypeError:
+        pass
+    return None
 
 
 def html_section_extract_aaas(section_root: bs4.element.Tag,
@@ -508,34 +695,42 @@ def html_section_extract_aaas(section_root: bs4.element.Tag,
 
     if element_list is None:
         element_list = list()
+    walk(section_root, visit_html_section_aaas, element_list)
+    return element_list
 
-    for child in section_root.children:
-        block_name = child.name
-        try:
-            # if the child is a section title
-            if re.match(r"h[2-9]", block_name):
-                h2_class = child.get('class', [])
-                if len(h2_class) > 0:
-                    continue
-                element_type = ArticleElementType.SECTION_TITLE
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            # if the child is a section block
-            elif block_name == 'p':
-                pid = child.get('id', '')
-                if not re.match(r"p-[1-9]+", pid):
-                    continue
-                element_type = ArticleElementType.PARAGRAPH
-                target_txt = format_text(child.text)
-                element_list.append(ArticleElement(type=element_type, content=target_txt))
-            elif 'figure' in block_name or 'table' in block_name:
-                continue
-            else:
-                html_section_extract_aaas(section_root=child, element_list=element_list)
-        except TypeError:
-            pass
 
-    return element_list
+def visit_html_section_aaas(child, element_list: List):
+    """
+    Visitor of `html_section_extract_aaas`
+    """
+    block_name = child.name
+    # strings have no name
+    if block_name is None:
+        return None
+    try:
+        # if the child is a section title
+        if re.match(r"h[2-9]", block_name):
+            h2_class = child.get('class', [])
+            if len(h2_class) > 0:
+                return None
+            element_type = ArticleElementType.SECTION_TITLE
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        # if the child is a section block
+        elif block_name == 'p':
+            pid = child.get('id', '')
+            if not re.match(r"p-[1-9]+", pid):
+                return None
+            element_type = ArticleElementType.PARAGRAPH
+            target_txt = format_text(child.text)
+            element_list.append(ArticleElement(type=element_type, content=target_txt))
+        elif 'figure' in block_name or 'table' in block_name:
+            return None
+        else:
+            return element_list
+    except TypeError:
+        pass
+    return None
 
 
 def xml_table_extract_elsevier(xml_table):
@@ -727,14 +922,23 @@ def get_element_text_recursive(root, text=None):
     block_name = root.name
     if block_name == 'a' or block_name == 'span':
         return None
-    for child in root.children:
-        if isinstance(child, bs4.element.NavigableString):
-            text.append(format_text(str(child)))
-        else:
-            get_element_text_recursive(child, text=text)
+    walk(root, visit_element_text, text)
     return format_text(''.join(text))
 
 
+def visit_element_text(node, text: List[str]):
+    """
+    Visitor of `get_element_text_recursive`: the text of anchors and spans is left out
+    """
+    if isinstance(node, bs4.element.NavigableString):
+        text.append(format_text(str(node)))
+        return None
+    block_name = node.name
+    if block_name == 'a' or block_name == 'span':
+        return None
+    return text
+
+
 def html_table_extract_rsc(table_div: bs4.element.Tag):
     tables = table_div.find_all('table')
     if not tables:
@@ -810,20 +1014,21 @@ def html_table_extract_springer(table_div: bs4.element.Tag):
 
 
 def get_acs_footnote(footnote_div: bs4.element.Tag):
+    # every footnote is a list of strings, joined at the end
     footnotes = list()
     pars = footnote_div.find_all('p')
     for p in pars:
         for child in p.children:
             if isinstance(child, bs4.element.NavigableString):
                 if not footnotes:
-                    footnotes.append(format_text(str(child)))
+                    footnotes.append([format_text(str(child))])
                 else:
-                    footnotes[-1] += str(child)
+                    footnotes[-1].append(str(child))
             elif child.name == 'i':
-                footnotes.append(format_text(child.text))
+                footnotes.append([format_text(child.text)])
             else:
-                footnotes[-1] += child.text
-    return footnotes
+                footnotes[-1].append(child.text)
+    return [''.join(footnote) for footnote in footnotes]
 
 
 def html_table_extract_acs(table_div: bs4.element.Tag):
@@ -856,6 +1061,7 @@ def html_table_extract_acs(table_div: bs4.element.Tag):
 def html_table_extract_elsevier(table_div: bs4.element.Tag):
     caption = ''
     table_id = table_div.get('id', '<EMPTY>')
+    # every footnote is a list of strings, joined at the end
     footnotes = list()
 
     for child in table_div.children:
@@ -864,17 +1070,18 @@ def html_table_extract_elsevier(table_div: bs4.element.Tag):
         if 'captions' in child_class.lower():
             caption = format_text(child.text)
         if 'legend' in child_class.lower():
-            footnotes.append(format_text(child.text))
+            footnotes.append([format_text(child.text)])
         if 'footnotes' in child_class:
             for foot_element in child.children:
                 foot_name = foot_element.name
                 if foot_name == 'dt':
-                    footnotes.append(f"{format_text(foot_element.text)} ")
+                    footnotes.append([f"{format_text(foot_element.text)} "])
                 elif foot_name == 'dd':
                     if footnotes:
-                        footnotes[-1] += format_text(foot_element.text)
+                        footnotes[-1].append(format_text(foot_element.text))
                     else:
-                        footnotes.append(format_text(foot_element.text))
+                        footnotes.append([format_text(foot_element.text)])
+    footnotes = [''.join(footnote) for footnote in footnotes]
 
     tables = table_div.find_all('table')
     if tables:
@@ -0,0 +1,504 @@
+"""
+Section, paragraph and table extraction on `lxml.html` trees.
+
+The functions mirror the BeautifulSoup extractors of `cap.section_extr` and produce the same
+`ArticleElement` lists, but find elements with compiled XPath expressions and read the tree of
+libxml2 directly instead of walking Python objects. They are used by the publishers that
+register an lxml constructor, when their backend is set to 'lxml.html' (see `cap.registry`).
+The `benchmarks.extraction_parity` harness checks that both backends agree.
+
+Only publishers whose pages are built with lxml have an lxml constructor; the html5lib trees of
+Elsevier and RSC pages differ from the lxml ones.
+"""
+import re
+import numpy as np
+from typing import List, Optional
+from lxml import etree
+import lxml.html
+from seqlbtoolkit.text import format_text
+
+from .article import (
+    ArticleElement,
+    ArticleElementType
+)
+from .table import (
+    Table,
+    TableRow,
+    TableCell
+)
+from .traversal import walk
+
+HEADING_PATTERN = re.compile(r"h[0-9]")
+AAAS_HEADING_PATTERN = re.compile(r"h[2-9]")
+ACS_HEADING_ID_PATTERN = re.compile(r"_i[0-9]+")
+AAAS_PARAGRAPH_ID_PATTERN = re.compile(r"p-[1-9]+")
+
+# `Tag.text` of beautifulsoup4 leaves out the contents of these elements
+TEXTLESS_TAGS = frozenset(('script', 'style', 'template'))
+HAS_TEXTLESS_DESCENDANT = etree.XPath('boolean(.//script|.//style|.//template)')
+
+FIND_SECTIONS = etree.XPath('.//section')
+FIND_PARAGRAPHS = etree.XPath('.//p')
+FIND_DIVS = etree.XPath('.//div')
+FIND_TABLES = etree.XPath('.//table')
+FIND_FIGURES = etree.XPath('.//figure')
+FIND_TITLES = etree.XPath('.//title')
+FIND_HEADERS = etree.XPath('.//header')
+FIND_LIST_ITEMS = etree.XPath('.//li')
+FIND_H2S = etree.XPath('.//h2')
+
+
+def find_by_class(tag: str) -> etree.XPath:
+    """
+    Descendants with a class, like `find_all(tag, {'class': name})`: one of the classes or the whole attribute
+    """
+    return etree.XPath(
+        f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), concat(' ', $name, ' ')) or @class = $name]"
+    )
+
+
+FIND_DIVS_BY_CLASS = find_by_class('div')
+FIND_ANCHORS_BY_CLASS = find_by_class('a')
+FIND_VIEW_DOI_ANCHORS = etree.XPath(".//a[@data-track-action = 'view doi']")
+
+
+def parse_lxml_html(contents: str) -> lxml.html.HtmlElement:
+    """
+    Build the `lxml.html` tree of a page, with the same parser settings as the lxml tree builder of BeautifulSoup
+    """
+    # encoding declarations are not allowed in unicode strings
+    parser = lxml.html.HTMLParser(encoding='utf-8', strip_cdata=False)
+    return lxml.html.document_fromstring(contents.encode('utf-8'), parser=parser)
+
+
+def find_first(root, tag: str):
+    """
+    The first element named `tag` in the tree of `root`, or None, like `soup.<tag>`
+    """
+    for element in root.iter(tag):
+        return element
+    return None
+
+
+def is_tag(node) -> bool:
+    # comments and processing instructions have a function as their tag
+    return isinstance(node.tag, str)
+
+
+def get_text(element) -> str:
+    """
+    The text of an element, as `Tag.text`
+    """
+    if element.tag in TEXTLESS_TAGS:
+        return ''
+    if not HAS_TEXTLESS_DESCENDANT(element):
+        return ''.join(element.itertext())
+    texts = list()
+    if element.text and is_tag(element):
+        texts.append(element.text)
+    walk(element, _visit_text, texts, leave=_leave_text)
+    return ''.join(texts)
+
+
+def _visit_text(child, texts: list):
+    # the tail of comments and of textless elements is text of their parent
+    if not is_tag(child) or child.tag in TEXTLESS_TAGS:
+        if child.tail:
+            texts.append(child.tail)
+        return None
+    if child.text:
+        texts.append(child.text)
+    return texts
+
+
+def _leave_text(child, texts: list):
+    if child.tail:
+        texts.append(child.tail)
+
+
+def get_classes(element) -> List[str]:
+    """
+    The class attribute as a list, as BeautifulSoup splits multi-valued attributes
+    """
+    return (element.get('class') or '').split()
+
+
+def get_next_sibling_text(element) -> str:
+    """
+    `element.nextSibling.text`: the tail of the element if it has one, otherwise the text of the next node
+    """
+    if element.tail:
+        return element.tail
+    sibling = element.getnext()
+    if sibling is None:
+        raise AttributeError("'NoneType' object has no attribute 'text'")
+    # the text of comments is left out as well
+    return get_text(sibling) if is_tag(sibling) else ''
+
+
+def extract(element):
+    """
+    Remove an element from the tree, like `Tag.extract`: the text following it stays in place
+    """
+    parent = element.getparent()
+    if parent is None:
+        return element
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or '') + element.tail
+        else:
+            parent.text = (parent.text or '') + element.tail
+        element.tail = None
+    parent.remove(element)
+    return element
+
+
+def has_section_ancestor(element) -> bool:
+    for _ in element.iterancestors('section'):
+        return True
+    return False
+
+
+# --- tables ---
+
+def get_html_table_row(tr) -> TableRow:
+    cells = list()
+    for child in tr:
+        if is_tag(child) and child.tag in ('th', 'td'):
+            height = np.uint8(child.get('rowspan', 1))
+            width = np.uint8(child.get('colspan', 1))
+            cells.append(TableCell(format_text(get_text(child)), width, height))
+    return TableRow(cells)
+
+
+def get_html_table_rows(root, rows: Optional[List] = None, include_foot: Optional[bool] = True):
+    if rows is None:
+        rows = list()
+
+    tb_elements = ('thead', 'tbody', 'tfoot') if include_foot else ('thead', 'tbody')
+    for child in root:
+        if not is_tag(child):
+            continue
+        if child.tag in tb_elements:
+            get_html_table_rows(child, rows)
+        elif child.tag == 'tr':
+            rows.append(get_html_table_row(child))
+    return rows
+
+
+def get_first_table_rows(table_div) -> list:
+    tables = FIND_TABLES(table_div)
+    return get_html_table_rows(tables[0]) if tables else list()
+
+
+def html_table_extract_wiley(table_div):
+    caption = format_text(' '.join(get_text(header) for header in FIND_HEADERS(table_div)))
+    table_id = table_div.get('id', '<EMPTY>')
+
+    tb_div = None
+    for div in FIND_DIVS(table_div):
+        if 'footnotes' in ' '.join(get_classes(div)):
+            tb_div = div
+
+    footnotes = list()
+    if tb_div is not None:
+        footnotes = [format_text(get_text(li)) for li in FIND_LIST_ITEMS(tb_div)]
+
+    return Table(
+        idx=table_id,
+        caption=caption,
+        rows=get_first_table_rows(table_div),
+        footnotes=footnotes).format_rows()
+
+
+def html_table_extract_springer(table_div):
+    caption_divs = FIND_DIVS_BY_CLASS(table_div, name='Caption')
+    caption = format_text(get_text(caption_divs[0])) if caption_divs else ''
+    table_id = table_div.get('id', '<EMPTY>')
+
+    footnote_divs = FIND_DIVS_BY_CLASS(table_div, name='TableFooter')
+    footnotes = list()
+    if footnote_divs:
+        footnotes = [format_text(get_text(p)) for p in FIND_PARAGRAPHS(footnote_divs[0])]
+
+    return Table(
+        idx=table_id,
+        caption=caption,
+        rows=get_first_table_rows(table_div),
+        footnotes=footnotes).format_rows()
+
+
+def get_acs_footnote(footnote_div) -> List[str]:
+    # every footnote is a list of strings, joined at the end
+    footnotes = list()
+
+    def add_string(string):
+        if not footnotes:
+            footnotes.append([format_text(string)])
+        else:
+            footnotes[-1].append(string)
+
+    for p in FIND_PARAGRAPHS(footnote_div):
+        if p.text:
+            add_string(p.text)
+        for child in p:
+            if not is_tag(child):
+                # comments are strings for BeautifulSoup
+                if child.text:
+                    add_string(child.text)
+            elif child.tag == 'i':
+                footnotes.append([format_text(get_text(child))])
+            else:
+                footnotes[-1].append(get_text(child))
+            if child.tail:
+                add_string(child.tail)
+    return [''.join(footnote) for footnote in footnotes]
+
+
+def html_table_extract_acs(table_div):
+    caption = ''
+    table_id = table_div.get('id', '<EMPTY>')
+    footnotes = list()
+    if table_div.text:
+        # the BeautifulSoup extractor fails on strings between the children
+        raise AttributeError("'NavigableString' object has no attribute 'get'")
+    for child in table_div:
+        if not is_tag(child):
+            raise AttributeError("'Comment' object has no attribute 'get'")
+        child_class = ' '.join(get_classes(child))
+        if 'caption' in child_class.lower():
+            caption = format_text(get_text(child))
+        if 'table-wrap-foot' in child_class:
+            footnotes = get_acs_footnote(child)
+        if child.tail:
+            raise AttributeError("'NavigableString' object has no attribute 'get'")
+
+    return Table(
+        idx=table_id,
+        caption=caption,
+        rows=get_first_table_rows(table_div),
+        footnotes=footnotes).format_rows()
+
+
+# --- sections ---
+
+def html_section_extract_nature(section_root, element_list: Optional[List] = None):
+    """
+    Depth-first search of the text in the sections
+    """
+    if element_list is None:
+        element_list = list()
+    walk(section_root, visit_html_section_nature, element_list)
+    return element_list
+
+
+def visit_html_section_nature(child, element_list: List):
+    if not is_tag(child):
+        return None
+    block_name = child.tag
+    if HEADING_PATTERN.match(block_name):
+        element_list.append(ArticleElement(type=ArticleElementType.SECTION_TITLE,
+                                           content=format_text(get_text(child))))
+    elif block_name == 'p':
+        element_list.append(ArticleElement(type=ArticleElementType.PARAGRAPH,
+                                           content=format_text(get_text(child))))
+    elif 'figure' in block_name or 'table' in block_name:
+        return None
+    else:
+        return element_list
+    return None
+
+
+def html_section_extract_wiley(section_root, element_list: Optional[List] = None):
+    """
+    Depth-first search of the text in the sections
+    """
+    if element_list is None:
+        element_list = list()
+    walk(section_root, visit_html_section_wiley, element_list)
+    return element_list
+
+
+def visit_html_section_wiley(child, element_list: List):
+    if not is_tag(child):
+        return None
+    child_name = child.tag
+    if HEADING_PATTERN.match(child_name):
+        element_list.append(ArticleElement(type=ArticleElementType.SECTION_TITLE,
+                                           content=format_text(get_text(child))))
+    elif child_name == 'p':
+        element_list.append(ArticleElement(type=ArticleElementType.PARAGRAPH,
+                                           content=format_text(get_text(child))))
+    elif child_name == 'div' and ''.join(get_classes(child)) == 'article-table-content':
+        element_list.append(ArticleElement(type=ArticleElementType.TABLE,
+                                           content=html_table_extract_wiley(child)))
+    elif 'figure' in child_name or 'table' in child_name:
+        return None
+    else:
+        return element_list
+    return None
+
+
+def html_section_extract_springer(section_root, element_list: Optional[List] = None):
+    """
+    Depth-first search of the text in the sections
+    """
+    if element_list is None:
+        element_list = list()
+    walk(section_root, visit_html_section_springer, element_list)
+    return element_list
+
+
+def visit_html_section_springer(child, element_list: List):
+    if not is_tag(child):
+        return None
+    child_name = child.tag
+    child_class = ''.join(get_classes(child))
+    if HEADING_PATTERN.match(child_name):
+        element_list.append(ArticleElement(type=ArticleElementType.SECTION_TITLE,
+                                           content=format_text(get_text(child))))
+    elif child_name == 'p':
+        element_list.append(ArticleElement(type=ArticleElementType.PARAGRAPH,
+                                           content=format_text(get_text(child))))
+    elif 'figure' in child_name or 'table' in child_name or (child_name == 'div' and child_class == 'Table'):
+        return None
+    elif child_name == 'div' and child_class == 'Para':
+        for s in FIND_DIVS_BY_CLASS(child, name='Table'):
+            element_list.append(ArticleElement(type=ArticleElementType.TABLE,
+                                               content=html_table_extract_springer(extract(s))))
+        for s in FIND_FIGURES(child):
+            extract(s)
+
+        if not FIND_PARAGRAPHS(child):
+            element_list.append(ArticleElement(type=ArticleElementType.PARAGRAPH,
+                                               content=format_text(get_text(child))))
+        else:
+            return element_list
+    else:
+        return element_list
+    return None
+
+
+def html_section_extract_aip(section_root, element_list: Optional[List] = None):
+    if element_list is None:
+        element_list = list()
+
+    for section in FIND_DIVS(section_root):
+        if 'NLM_paragraph' in get_classes(section):
+            element_list.append(ArticleElement(type=ArticleElementType.PARAGRAPH,
+                                               content=format_text(get_text(section))))
+    return element_list
+
+
+def html_section_extract_acs(section_root, element_list: Optional[List] = None):
+    """
+    Depth-first search of the text in the sections
+    """
+    if element_list is None:
+        element_list = list()
+    # the children are modified while they are visited
+    walk(section_root, visit_html_section_acs, element_list, children=list)
+    return element_list
+
+
+def visit_html_section_acs(child, element_list: List):
+    if not is_tag(child):
+        return None
+    block_name = child.tag
+    if HEADING_PATTERN.match(block_name):
+        if not ACS_HEADING_ID_PATTERN.match(child.get('id', '')):
+            return None
+        element_list.append(ArticleElement(type=ArticleElementType.SECTION_TITLE,
+                                           content=format_text(get_text(child))))
+    elif block_name == 'div':
+        div_class = get_classes(child) or ['']
+        # exclude all figures
+        for s in FIND_FIGURES(child):
+            extract(s)
+
+        if div_class[0] == "NLM_p":
+            for s in FIND_DIVS_BY_CLASS(child, name='NLM_table-wrap'):
+                element_list.append(ArticleElement(type=ArticleElementType.TABLE,
+                                                   content=html_table_extract_acs(extract(s))))
+            element_list.append(ArticleElement(type=ArticleElementType.PARAGRAPH,
+                                               content=format_text(get_text(child))))
+        elif div_class[0] == "NLM_table-wrap":
+            element_list.append(ArticleElement(type=ArticleElementType.TABLE,
+                                               content=html_table_extract_acs(child)))
+        else:
+            return element_list
+    elif 'figure' in block_name:
+        return None
+    else:
+        return element_list
+    return None
+
+
+def html_section_extract_aaas(section_root, element_list: Optional[List] = None):
+    """
+    Depth-first search of the text in the sections
+    """
+    if element_list is None:
+        element_list = list()
+    walk(section_root, visit_html_section_aaas, element_list)
+    return element_list
+
+
+def visit_html_section_aaas(child, element_list: List):
+    if not is_tag(child):
+        return None
+    block_name = child.tag
+    if AAAS_HEADING_PATTERN.match(block_name):
+        if get_classes(child):
+            return None
+        element_list.append(ArticleElement(type=ArticleElementType.SECTION_TITLE,
+                                           content=format_text(get_text(child))))
+    elif block_name == 'p':
+        if not AAAS_PARAGRAPH_ID_PATTERN.match(child.get('id', '')):
+            return None
+        element_list.append(ArticleElement(type=ArticleElementType.PARAGRAPH,
+                                           content=format_text(get_text(child))))
+    elif 'figure' in block_name or 'table' in block_name:
+        return None
+    else:
+        return element_list
+    return None
+
+
+# --- doi ---
+
+def search_html_doi_lxml(root, publisher: str) -> str:
+    """
+    Find the doi at the location `search_html_doi_publisher` uses for `publisher`
+    """
+    if publisher == 'acs':
+        doi_url = get_text(FIND_DIVS_BY_CLASS(root, name='article_header-doiurl')[0]).strip().lower()
+    elif publisher == 'wiley':
+        doi_url = get_text(FIND_ANCHORS_BY_CLASS(root, name='epub-doi')[0]).strip().lower()
+    elif publisher == 'springer':
+        doi_sec = None
+        for span in root.iter('span'):
+            if 'bibliographic-information__value' in ' '.join(get_classes(span)) and 'doi.org' in get_text(span):
+                doi_sec = span
+        if doi_sec is None:
+            raise AttributeError("'NoneType' object has no attribute 'text'")
+        doi_url = get_text(doi_sec).strip().lower()
+    elif publisher == 'nature':
+        doi_url = get_text(FIND_VIEW_DOI_ANCHORS(root)[0]).strip().lower()
+    elif publisher == 'aip':
+        doi_url = get_text(FIND_DIVS_BY_CLASS(root, name='publicationContentCitation')[0]).strip().lower()
+    elif publisher == 'aaas':
+        anchor = FIND_DIVS_BY_CLASS(root, name='self-citation')[0].find('.//a')
+        if anchor is None:
+            raise AttributeError("'NoneType' object has no attribute 'text'")
+        doi_url = get_text(anchor).strip().split()[-1].strip().lower()
+    else:
+        raise ValueError('Unknown publisher')
+
+    doi_url_prefix = "https://doi.org/"
+    try:
+        doi = doi_url[doi_url.index(doi_url_prefix) + len(doi_url_prefix):].strip()
+    except ValueError:
+        doi = doi_url
+    return doi
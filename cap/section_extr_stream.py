@@ -0,0 +1,289 @@
+"""
+Streaming extraction of XML articles with `iterparse`.
+
+The functions walk the start and end events of the document once and extract the doi, title,
+abstract, tables and section elements when their element closes, with the same extractors as the
+constructors of `cap.article_constr` on the whole element tree. Subtrees are cleared as soon as
+nothing reads them anymore, so the tree in memory holds the open elements and the largest
+section element (e.g., a paragraph with its tables) instead of the whole document, including the
+references and the math the constructors never read.
+
+They are used by the xml publishers that register a streaming constructor, when their backend is
+set to 'iterparse' (see `cap.registry`). The `benchmarks.xml_streaming` harness checks that the
+streamed articles are the same as the ones constructed from the whole tree.
+"""
+import io
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Any
+
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+from .article import ArticleElement, ArticleElementType
+from .section_extr import (
+    XML_SECTION_LEAF_TAGS_ACS,
+    ELSEVIER_ORIGINAL_TEXT_TAG,
+    ELSEVIER_DOC_TAG,
+    ELSEVIER_DOI_TAG,
+    ELSEVIER_TITLE_TAG,
+    ELSEVIER_ABSTRACT_TAG,
+    ELSEVIER_SIMPLE_PARA_TAG,
+    ELSEVIER_TABLE_TAG,
+    ELSEVIER_SECTIONS_TAG,
+    is_xml_section_leaf_elsevier,
+    xml_section_leaf_extract_elsevier,
+    xml_section_leaf_extract_acs,
+    xml_table_extract_elsevier
+)
+
+
+@dataclass
+class StreamedXmlArticle:
+    """
+    The components of an XML article, as read by the constructors from the whole tree.
+    Values are None if the element they are read from is not in the document.
+    """
+    # text of the first doi element
+    doi_text: Optional[List[Optional[str]]] = None
+    # whether the elements the constructor requires are found
+    has_doc: Optional[bool] = False
+    has_body: Optional[bool] = False
+    title: Optional[Any] = None
+    abstract: Optional[Any] = None
+    # table elements, empty if one of the tables failed to be extracted
+    tables: List[ArticleElement] = field(default_factory=list)
+    sections: Optional[List[ArticleElement]] = None
+    # the first error raised by the section extraction
+    section_error: Optional[Exception] = None
+
+
+@dataclass
+class _OpenElement:
+    element: Any
+    # order of the start event, to order the results of nested elements as the tree constructors do
+    idx: int
+    # the subtree is read when the element closes, so it must not be cleared before
+    is_read: Optional[bool] = False
+    # section collectors (see `_SectionCollector`) this element is a section leaf of, and the ones whose
+    # sections are searched for leaves in its children
+    leaf_of: Tuple = ()
+    chain_of: Tuple = ()
+
+
+@dataclass
+class _SectionCollector:
+    idx: int
+    elements: List[ArticleElement] = field(default_factory=list)
+    error: Optional[Exception] = None
+
+
+def iter_xml_events(contents: bytes):
+    return ET.iterparse(io.BytesIO(contents), events=('start', 'end'))
+
+
+def get_stripped_itertext(element) -> str:
+    iter_txt = list()
+    for txt in element.itertext():
+        if txt.strip():
+            iter_txt.append(txt)
+    return ''.join(iter_txt)
+
+
+def keep_last(current: Optional[Tuple[int, Any]], idx: int, value) -> Tuple[int, Any]:
+    """
+    Keep the value of the element that starts last, i.e., the last one of `Element.iter`
+    """
+    if current is None or idx > current[0]:
+        return idx, value
+    return current
+
+
+def stream_xml_elsevier(contents: bytes) -> StreamedXmlArticle:
+    """
+    Read the components `ArticleFunctions.article_construct_xml_elsevier` and `search_xml_doi_publisher`
+    read from the whole tree, in one pass over the events of the document
+
+    Parameters
+    ----------
+    contents: raw file contents
+
+    Returns
+    -------
+    StreamedXmlArticle
+    """
+    streamed = StreamedXmlArticle()
+    stack: List[_OpenElement] = list()
+    n_open_read = 0
+    original_text = None
+    doc = None
+    in_doc = False
+    doi_element = None
+    # (start index, value) of the last title, abstract and sections
+    title = None
+    abstract = None
+    sections = None
+    tables = list()
+    tables_failed = False
+
+    for idx, (event, element) in enumerate(iter_xml_events(contents)):
+        if event == 'start':
+            parent = stack[-1] if stack else None
+            entry = _OpenElement(element=element, idx=idx)
+            tag = element.tag
+            if parent is not None and parent.element is stack[0].element and original_text is None \
+                    and tag == ELSEVIER_ORIGINAL_TEXT_TAG:
+                original_text = element
+            elif parent is not None and parent.element is original_text and doc is None and tag == ELSEVIER_DOC_TAG:
+                doc = element
+                in_doc = True
+            if doi_element is None and tag == ELSEVIER_DOI_TAG:
+                doi_element = element
+            if in_doc:
+                if tag == ELSEVIER_TITLE_TAG or tag == ELSEVIER_TABLE_TAG:
+                    entry.is_read = True
+                elif tag == ELSEVIER_ABSTRACT_TAG and element.attrib.get('class') == 'author':
+                    entry.is_read = True
+                if parent.chain_of:
+                    if is_xml_section_leaf_elsevier(tag):
+                        entry.leaf_of = parent.chain_of
+                        entry.is_read = True
+                    elif 'section' in tag:
+                        entry.chain_of = parent.chain_of
+                if tag == ELSEVIER_SECTIONS_TAG:
+                    entry.chain_of = entry.chain_of + (_SectionCollector(idx=idx),)
+            n_open_read += entry.is_read
+            stack.append(entry)
+            continue
+
+        entry = stack.pop()
+        n_open_read -= entry.is_read
+        tag = element.tag
+        if element is doi_element:
+            streamed.doi_text = [element.text]
+        if element is doc:
+            in_doc = False
+        elif in_doc:
+            if tag == ELSEVIER_TITLE_TAG:
+                title = keep_last(title, entry.idx, get_stripped_itertext(element).strip())
+            elif tag == ELSEVIER_ABSTRACT_TAG and entry.is_read:
+                abs_paras = [get_stripped_itertext(abs_ele) for abs_ele in element.iter(tag=ELSEVIER_SIMPLE_PARA_TAG)]
+                abstract = keep_last(abstract, entry.idx, abs_paras)
+            elif tag == ELSEVIER_TABLE_TAG and not tables_failed:
+                try:
+                    tbl = xml_table_extract_elsevier(element)
+                    tables.append((entry.idx, ArticleElement(type=ArticleElementType.TABLE, content=tbl)))
+                except Exception:
+                    tables_failed = True
+            for collector in entry.leaf_of:
+                if collector.error is None:
+                    try:
+                        xml_section_leaf_extract_elsevier(element, collector.elements)
+                    except Exception as e:
+                        collector.error = e
+            if tag == ELSEVIER_SECTIONS_TAG:
+                collector = entry.chain_of[-1]
+                sections = keep_last(sections, collector.idx, collector)
+        if not n_open_read:
+            element.clear()
+
+    streamed.has_doc = doc is not None
+    if title is not None:
+        streamed.title = title[1]
+    if abstract is not None:
+        streamed.abstract = abstract[1]
+    if not tables_failed:
+        streamed.tables = [table for _, table in sorted(tables, key=lambda x: x[0])]
+    if sections is not None:
+        streamed.sections = sections[1].elements
+        streamed.section_error = sections[1].error
+    return streamed
+
+
+def stream_xml_acs(contents: bytes) -> StreamedXmlArticle:
+    """
+    Read the components `ArticleFunctions.article_construct_xml_acs` and `search_xml_doi_publisher`
+    read from the whole tree, in one pass over the events of the document
+
+    Parameters
+    ----------
+    contents: raw file contents
+
+    Returns
+    -------
+    StreamedXmlArticle
+    """
+    streamed = StreamedXmlArticle()
+    stack: List[_OpenElement] = list()
+    n_open_read = 0
+    front = None
+    body = None
+    in_front = False
+    doi_element = None
+    title_text = list()
+    abs_text = list()
+    collector = _SectionCollector(idx=0)
+
+    for idx, (event, element) in enumerate(iter_xml_events(contents)):
+        if event == 'start':
+            parent = stack[-1] if stack else None
+            entry = _OpenElement(element=element, idx=idx)
+            tag = element.tag
+            if parent is not None and parent.element is stack[0].element:
+                if front is None and tag == 'front':
+                    front = element
+                    in_front = True
+                elif body is None and tag == 'body':
+                    body = element
+                    entry.chain_of = (collector,)
+            if doi_element is None and tag == 'article-id':
+                doi_element = element
+            if in_front and tag == 'abstract' and not element.attrib:
+                entry.is_read = True
+            if parent is not None and parent.chain_of:
+                if tag in XML_SECTION_LEAF_TAGS_ACS:
+                    entry.leaf_of = parent.chain_of
+                    entry.is_read = True
+                elif tag == 'sec':
+                    entry.chain_of = parent.chain_of
+            n_open_read += entry.is_read
+            stack.append(entry)
+            continue
+
+        entry = stack.pop()
+        n_open_read -= entry.is_read
+        tag = element.tag
+        if element is doi_element:
+            streamed.doi_text = [element.text]
+        if element is front:
+            in_front = False
+        elif in_front:
+            if tag == 'article-title':
+                title_text.append((entry.idx, element.text))
+            elif tag == 'abstract' and entry.is_read:
+                abs_text.append((entry.idx, list(element.itertext())))
+        if entry.leaf_of and collector.error is None:
+            try:
+                xml_section_leaf_extract_acs(element, collector.elements)
+            except Exception as e:
+                collector.error = e
+        if not n_open_read:
+            element.clear()
+
+    streamed.has_doc = front is not None
+    streamed.has_body = body is not None
+    streamed.title = [text for _, text in sorted(title_text, key=lambda x: x[0])]
+    streamed.abstract = [txt for _, element_text in sorted(abs_text, key=lambda x: x[0]) for txt in element_text]
+    if body is not None:
+        streamed.sections = collector.elements
+        streamed.section_error = collector.error
+    return streamed
+
+
+def get_streamed_doi(streamed: StreamedXmlArticle) -> str:
+    """
+    The doi as extracted by `search_xml_doi_publisher`, raising the same errors if it is missing
+    """
+    doi_sec = streamed.doi_text or list()
+    return doi_sec[0].strip().lower()
@@ -0,0 +1,439 @@
+"""
+Compact, torch-free serialization of `Article` objects.
+
+The format stores each paragraph's text once; sentences, tokens and annotation spans are kept as
+integer offsets into that text. The payload is encoded with a small msgpack-style tagged binary
+encoding and compressed with zlib.
+
+Layout: MAGIC (4 bytes) | format version (1 byte) | flags (1 byte) | payload
+"""
+import sys
+import zlib
+import pickle
+import struct
+import numbers
+from array import array
+from typing import Optional, Union, BinaryIO, List
+
+from .article import Article, ArticleElement, ArticleElementType
+from .paragraph import Paragraph, Sentence
+from .table import Table, TableRow, TableCell
+
+MAGIC = b'CAPA'
+FORMAT_VERSION = 2
+FLAG_ZLIB = 0x01
+
+_T_NONE = 0
+_T_FALSE = 1
+_T_TRUE = 2
+_T_INT = 3
+_T_FLOAT = 4
+_T_STR = 5
+_T_BYTES = 6
+_T_LIST = 7
+_T_DICT = 8
+_T_TUPLE = 9
+_T_UINT32_ARRAY = 10  # version 2
+
+_DOUBLE = struct.Struct('>d')
+
+
+# --- tagged binary encoding ---
+
+def _pack_varint(buf: bytearray, n: int):
+    while True:
+        byte = n & 0x7f
+        n >>= 7
+        if n:
+            buf.append(byte | 0x80)
+        else:
+            buf.append(byte)
+            return
+
+
+def _pack(buf: bytearray, obj):
+    if obj is None:
+        buf.append(_T_NONE)
+    elif obj is True:
+        buf.append(_T_TRUE)
+    elif obj is False:
+        buf.append(_T_FALSE)
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        buf.append(_T_STR)
+        _pack_varint(buf, len(data))
+        buf += data
+    elif isinstance(obj, numbers.Integral):
+        obj = int(obj)
+        buf.append(_T_INT)
+        _pack_varint(buf, (obj << 1) if obj >= 0 else ((-obj << 1) - 1))  # zigzag
+    elif isinstance(obj, numbers.Real):
+        buf.append(_T_FLOAT)
+        buf += _DOUBLE.pack(float(obj))
+    elif isinstance(obj, array):
+        # offset arrays are by far the most numerous values; store them as one little-endian block
+        if obj.typecode != 'I':
+            obj = array('I', obj)
+        if sys.byteorder != 'little':
+            obj = array('I', obj)
+            obj.byteswap()
+        buf.append(_T_UINT32_ARRAY)
+        _pack_varint(buf, len(obj))
+        buf += obj.tobytes()
+    elif isinstance(obj, (bytes, bytearray)):
+        buf.append(_T_BYTES)
+        _pack_varint(buf, len(obj))
+        buf += obj
+    elif isinstance(obj, (list, tuple)):
+        buf.append(_T_LIST if isinstance(obj, list) else _T_TUPLE)
+        _pack_varint(buf, len(obj))
+        for item in obj:
+            _pack(buf, item)
+    elif isinstance(obj, dict):
+        buf.append(_T_DICT)
+        _pack_varint(buf, len(obj))
+        for k, v in obj.items():
+            _pack(buf, k)
+            _pack(buf, v)
+    else:
+        raise TypeError(f"Unsupported type for serialization: {type(obj)}")
+
+
+class _Unpacker:
+    def __init__(self, data: bytes):
+        self._data = data
+        self._pos = 0
+
+    def _varint(self):
+        shift = 0
+        n = 0
+        while True:
+            byte = self._data[self._pos]
+            self._pos += 1
+            n |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return n
+            shift += 7
+
+    def unpack(self):
+        tag = self._data[self._pos]
+        self._pos += 1
+        if tag == _T_NONE:
+            return None
+        elif tag == _T_TRUE:
+            return True
+        elif tag == _T_FALSE:
+            return False
+        elif tag == _T_INT:
+            n = self._varint()
+            return (n >> 1) if not n & 1 else -((n + 1) >> 1)
+        elif tag == _T_STR:
+            length = self._varint()
+            s = self._data[self._pos: self._pos + length].decode('utf-8')
+            self._pos += length
+            return s
+        elif tag == _T_FLOAT:
+            value, = _DOUBLE.unpack_from(self._data, self._pos)
+            self._pos += _DOUBLE.size
+            return value
+        elif tag == _T_BYTES:
+            length = self._varint()
+            b = bytes(self._data[self._pos: self._pos + length])
+            self._pos += length
+            return b
+        elif tag == _T_UINT32_ARRAY:
+            length = self._varint()
+            arr = array('I')
+            arr.frombytes(self._data[self._pos: self._pos + 4 * length])
+            if sys.byteorder != 'little':
+                arr.byteswap()
+            self._pos += 4 * length
+            return arr
+        elif tag in (_T_LIST, _T_TUPLE):
+            items = [self.unpack() for _ in range(self._varint())]
+            return items if tag == _T_LIST else tuple(items)
+        elif tag == _T_DICT:
+            n = self._varint()
+            d = dict()
+            for _ in range(n):
+                k = self.unpack()
+                d[k] = self.unpack()
+            return d
+        raise ValueError(f"Unknown type tag {tag} at position {self._pos - 1}")
+
+
+# --- article components ---
+
+def _encode_anno(anno: dict):
+    """
+    {source: {(start, end): label}} -> [source, [start, end, label, ...], ...]
+    """
+    encoded = list()
+    for src, spans in anno.items():
+        flat = list()
+        for (s, e), v in spans.items():
+            flat += [s, e, v]
+        encoded += [src, flat]
+    return encoded
+
+
+def _decode_anno(encoded: list):
+    anno = dict()
+    for i in range(0, len(encoded), 2):
+        flat = encoded[i + 1]
+        anno[encoded[i]] = {(flat[j], flat[j + 1]): flat[j + 2] for j in range(0, len(flat), 3)}
+    return anno
+
+
+def _encode_grouped_anno(grouped_anno):
+    # grouped annotations hold arbitrary metric objects; they are rare and kept as pickles
+    return pickle.dumps(grouped_anno, protocol=pickle.HIGHEST_PROTOCOL) if grouped_anno else None
+
+
+def _decode_grouped_anno(encoded):
+    return pickle.loads(encoded) if encoded is not None else list()
+
+
+def _encode_tokens(text: str, tokens: Optional[List[str]]):
+    """
+    Encode tokens as flattened (offset, length) pairs into `text`.
+    Falls back to the token strings if a token is not a substring of the text.
+    """
+    if tokens is None:
+        return None
+    offsets = array('I')
+    pos = 0
+    for token in tokens:
+        idx = text.find(token, pos)
+        if idx < 0:
+            return list(tokens)
+        offsets.append(idx)
+        offsets.append(len(token))
+        pos = idx + len(token)
+    return offsets
+
+
+def _decode_tokens(text: str, encoded):
+    if encoded is None:
+        return None
+    if encoded and isinstance(encoded[0], str):
+        return encoded
+    offsets = iter(encoded)
+    return [text[idx: idx + length] for idx, length in zip(offsets, offsets)]
+
+
+def _new_sentence(text, tokens, anno, start_idx, end_idx, grouped_anno) -> Sentence:
+    # bypass `__init__` to avoid re-tokenizing the text
+    sent = Sentence.__new__(Sentence)
+    sent._text = text
+    sent._tokens = tokens
+    sent._anno = anno
+    sent.start_idx = start_idx
+    sent.end_idx = end_idx
+    sent.grouped_anno = grouped_anno
+    sent._word_tokenizer = None
+    return sent
+
+
+def _encode_sentence(sent: Optional[Sentence]):
+    if sent is None:
+        return None
+    return [
+        sent.text, _encode_tokens(sent.text, sent.tokens), _encode_anno(sent.anno),
+        sent.start_idx, _encode_grouped_anno(sent.grouped_anno)
+    ]
+
+
+def _decode_sentence(encoded) -> Optional[Sentence]:
+    if encoded is None:
+        return None
+    text, tokens, anno, start_idx, grouped_anno = encoded
+    return _new_sentence(
+        text=text,
+        tokens=_decode_tokens(text, tokens),
+        anno=_decode_anno(anno),
+        start_idx=start_idx,
+        end_idx=start_idx + len(text),
+        grouped_anno=_decode_grouped_anno(grouped_anno)
+    )
+
+
+def _encode_paragraph(para: Optional[Paragraph]):
+    if para is None:
+        return None
+    text = para.text
+    sents = list()
+    for sent in para.sentences:
+        # sentence texts are slices of the paragraph text; only keep them if they are not
+        sent_text = sent.text if text[sent.start_idx: sent.end_idx] != sent.text else None
+        sents.append([
+            sent.start_idx, sent.end_idx, sent_text, _encode_tokens(sent.text, sent.tokens),
+            _encode_anno(sent.anno), _encode_grouped_anno(sent.grouped_anno)
+        ])
+    return [text, sents, _encode_anno(para.anno), _encode_grouped_anno(para.grouped_anno)]
+
+
+def _decode_paragraph(encoded) -> Optional[Paragraph]:
+    if encoded is None:
+        return None
+    text, sents, anno, grouped_anno = encoded
+
+    sentences = list()
+    for start_idx, end_idx, sent_text, tokens, sent_anno, sent_grouped_anno in sents:
+        sent_text = text[start_idx: end_idx] if sent_text is None else sent_text
+        sentences.append(_new_sentence(
+            text=sent_text,
+            tokens=_decode_tokens(sent_text, tokens),
+            anno=_decode_anno(sent_anno),
+            start_idx=start_idx,
+            end_idx=end_idx,
+            grouped_anno=_decode_grouped_anno(sent_grouped_anno)
+        ))
+
+    # bypass `__init__` to avoid re-tokenizing the text
+    para = Paragraph.__new__(Paragraph)
+    para._text = text
+    para._anno = _decode_anno(anno)
+    para.sentences = sentences
+    para.grouped_anno = _decode_grouped_anno(grouped_anno)
+    para.char_idx_to_sent_idx = dict()
+    para._sent_tokenizer = None
+    para._tokens = [s.tokens for s in sentences]
+    if sentences:
+        para._set_char_idx_to_sent_idx()
+    return para
+
+
+def _encode_table(table: Table):
+    rows = None
+    if table._rows is not None:
+        rows = [
+            [[c.text, c.width, c.height, c.linked_top, c.linked_left] for c in row.cells]
+            for row in table._rows
+        ]
+    return [table._label, table._id, table._caption, rows, table._footnotes]
+
+
+def _decode_table(encoded) -> Table:
+    label, idx, caption, rows, footnotes = encoded
+    if rows is not None:
+        rows = [TableRow([TableCell(*cell) for cell in row]) for row in rows]
+    return Table(label=label, idx=idx, caption=caption, rows=rows, footnotes=footnotes)
+
+
+def _encode_section(element: ArticleElement):
+    if element.type == ArticleElementType.PARAGRAPH:
+        content = _encode_paragraph(element.content)
+    elif element.type == ArticleElementType.TABLE:
+        content = _encode_table(element.content)
+    else:
+        content = element.content
+    return [element.type.value, content]
+
+
+def _decode_section(encoded) -> ArticleElement:
+    element_type, content = encoded
+    element_type = ArticleElementType(element_type)
+    if element_type == ArticleElementType.PARAGRAPH:
+        content = _decode_paragraph(content)
+    elif element_type == ArticleElementType.TABLE:
+        content = _decode_table(content)
+    return ArticleElement(type=element_type, content=content)
+
+
+def encode_article(article: Article) -> list:
+    # title and abstract may also hold raw values (e.g., empty strings); encoded components are
+    # stored as tuples to tell them apart
+    title, abstract = article.title, article.abstract
+    return [
+        article.doi,
+        article.publisher,
+        tuple(_encode_sentence(title)) if isinstance(title, Sentence) else title,
+        tuple(_encode_paragraph(abstract)) if isinstance(abstract, Paragraph) else abstract,
+        [_encode_section(section) for section in article.sections]
+    ]
+
+
+def decode_article(encoded: list) -> Article:
+    doi, publisher, title, abstract, sections = encoded
+
+    article = Article.__new__(Article)
+    article._doi = doi
+    article._publisher = publisher
+    article._title = _decode_sentence(title) if isinstance(title, tuple) else title
+    article._abstract = _decode_paragraph(abstract) if isinstance(abstract, tuple) else abstract
+    article._sections = [_decode_section(section) for section in sections]
+    article._sec_id_to_sec = dict()
+    article._set_sec_id_to_sec()
+    return article
+
+
+# --- public api ---
+
+def dumps_object(obj, compress: Optional[bool] = True) -> bytes:
+    """
+    Serialize a tree of plain python objects (None, bool, int, float, str, bytes, list, tuple, dict)
+    """
+    buf = bytearray()
+    _pack(buf, obj)
+    flags = 0
+    payload = bytes(buf)
+    if compress:
+        payload = zlib.compress(payload)
+        flags |= FLAG_ZLIB
+    return MAGIC + bytes((FORMAT_VERSION, flags)) + payload
+
+
+def loads_object(data: bytes):
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a serialized CAP object!")
+    version, flags = data[len(MAGIC)], data[len(MAGIC) + 1]
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Unsupported serialization format version: {version}")
+    payload = data[len(MAGIC) + 2:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    return _Unpacker(payload).unpack()
+
+
+def dumps(article: Article, compress: Optional[bool] = True) -> bytes:
+    """
+    Serialize an article
+
+    Parameters
+    ----------
+    article: the article to serialize
+    compress: whether to compress the payload with zlib
+
+    Returns
+    -------
+    serialized bytes
+    """
+    return dumps_object(encode_article(article), compress=compress)
+
+
+def loads(data: bytes) -> Article:
+    """
+    Deserialize an article serialized by `dumps`
+    """
+    return decode_article(loads_object(data))
+
+
+def dump(article: Article, file: Union[str, BinaryIO], compress: Optional[bool] = True):
+    data = dumps(article, compress=compress)
+    if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+        with open(file, 'wb') as f:
+            f.write(data)
+    else:
+        file.write(data)
+
+
+def load(file: Union[str, BinaryIO]) -> Article:
+    if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+        with open(file, 'rb') as f:
+            return loads(f.read())
+    return loads(file.read())
+
+
+def is_serialized_article(data: bytes) -> bool:
+    return data[:len(MAGIC)] == MAGIC
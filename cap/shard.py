@@ -0,0 +1,216 @@
+import os
+import re
+import glob
+import json
+import pickle
+import logging
+from typing import Optional, Callable, Any, List, Tuple, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+SHARD_SUFFIX = '.bin'
+INDEX_SUFFIX = '.idx.jsonl'
+TMP_SUFFIX = '.tmp'
+
+
+def serialize_pickle(obj) -> bytes:
+    return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def deserialize_record(data: bytes):
+    """
+    Load a record serialized either with `cap.serialization.dumps` or with pickle
+    """
+    from .serialization import is_serialized_article, loads
+    if is_serialized_article(data):
+        return loads(data)
+    return pickle.loads(data)
+
+
+class ShardWriter:
+    """
+    Pack many serialized records into size-bounded shard files.
+
+    Each shard `<prefix>-<n>.bin` comes with an index `<prefix>-<n>.idx.jsonl` that maps the record
+    keys (dois) to their (shard, offset, length), so that every record stays randomly accessible.
+    Records are written to a buffered temporary file; when a shard is full it is flushed, synced and
+    renamed into place together with its index, so that readers never see a partial shard.
+    """
+
+    def __init__(self,
+                 output_dir: str,
+                 prefix: Optional[str] = 'shard',
+                 max_shard_bytes: Optional[int] = 256 * 2 ** 20,
+                 buffer_bytes: Optional[int] = 8 * 2 ** 20,
+                 on_commit: Optional[Callable[[str, List[Any]], None]] = None):
+        """
+        Parameters
+        ----------
+        output_dir: where to save the shards
+        prefix: shard file name prefix. Writers running in parallel must use different prefixes
+        max_shard_bytes: a shard is rotated when adding a record would exceed this size
+        buffer_bytes: write buffer size
+        on_commit: called with the shard path and the `meta` objects of its records once a shard is
+            finalized; can be used to mark the records as durably saved
+        """
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+
+        self._output_dir = output_dir
+        self._prefix = prefix
+        self._max_shard_bytes = max_shard_bytes
+        self._buffer_bytes = buffer_bytes
+        self._on_commit = on_commit
+
+        self._shard_idx = self._get_next_shard_idx()
+        self._file = None
+        self._offset = 0
+        self._index: List[Tuple[str, int, int]] = list()
+        self._metas: List[Any] = list()
+
+    def _get_next_shard_idx(self):
+        shard_ids = [-1]
+        pattern = re.compile(rf"^{re.escape(self._prefix)}-(\d+){re.escape(SHARD_SUFFIX)}$")
+        # only match the files of this writer, other writers may share the output directory
+        tmp_pattern = re.compile(
+            rf"^{re.escape(self._prefix)}-\d+({re.escape(SHARD_SUFFIX)}|{re.escape(INDEX_SUFFIX)}){re.escape(TMP_SUFFIX)}$"
+        )
+        for file_name in os.listdir(self._output_dir):
+            m = pattern.match(file_name)
+            if m:
+                shard_ids.append(int(m.group(1)))
+            elif tmp_pattern.match(file_name):
+                logger.warning(f"Removing incomplete shard file {file_name}")
+                os.remove(os.path.join(self._output_dir, file_name))
+        return max(shard_ids) + 1
+
+    @property
+    def shard_name(self):
+        return f"{self._prefix}-{self._shard_idx:05d}{SHARD_SUFFIX}"
+
+    @property
+    def shard_path(self):
+        return os.path.join(self._output_dir, self.shard_name)
+
+    @property
+    def index_path(self):
+        return os.path.join(self._output_dir, f"{self._prefix}-{self._shard_idx:05d}{INDEX_SUFFIX}")
+
+    def write(self, key: str, data: bytes, meta: Optional[Any] = None) -> Tuple[str, int, int]:
+        """
+        Append a record to the current shard
+
+        Parameters
+        ----------
+        key: record key, usually the doi of the article
+        data: serialized record
+        meta: any object passed to `on_commit` when the shard is finalized
+
+        Returns
+        -------
+        shard name, offset and length of the record
+        """
+        if self._file is not None and self._offset + len(data) > self._max_shard_bytes:
+            self.rotate()
+        if self._file is None:
+            self._file = open(self.shard_path + TMP_SUFFIX, 'wb', buffering=self._buffer_bytes)
+            self._offset = 0
+
+        location = (self.shard_name, self._offset, len(data))
+        self._file.write(data)
+        self._index.append((key, self._offset, len(data)))
+        self._metas.append(meta)
+        self._offset += len(data)
+        return location
+
+    def rotate(self):
+        """
+        Finalize the current shard; the next record starts a new one
+        """
+        if self._file is None:
+            return self
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        os.replace(self.shard_path + TMP_SUFFIX, self.shard_path)
+
+        with open(self.index_path + TMP_SUFFIX, 'w', encoding='utf-8') as f:
+            for key, offset, length in self._index:
+                f.write(json.dumps({'doi': key, 'shard': self.shard_name, 'offset': offset, 'length': length}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.index_path + TMP_SUFFIX, self.index_path)
+
+        if self._on_commit is not None:
+            self._on_commit(self.shard_path, self._metas)
+
+        self._index = list()
+        self._metas = list()
+        self._shard_idx += 1
+        return self
+
+    def close(self):
+        self.rotate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ShardReader:
+    """
+    Random and sequential access to the records written by `ShardWriter`
+    """
+
+    def __init__(self,
+                 shard_dir: str,
+                 prefix: Optional[str] = None,
+                 deserialize: Optional[Callable[[bytes], Any]] = deserialize_record):
+        self._shard_dir = shard_dir
+        self._deserialize = deserialize
+        self._index: Dict[str, Tuple[str, int, int]] = dict()
+
+        index_pattern = f"{prefix}-*{INDEX_SUFFIX}" if prefix else f"*{INDEX_SUFFIX}"
+        for index_path in sorted(glob.glob(os.path.join(shard_dir, index_pattern))):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    item = json.loads(line)
+                    self._index[item['doi']] = (item['shard'], item['offset'], item['length'])
+
+    def keys(self):
+        return self._index.keys()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key: str):
+        return key in self._index
+
+    def locate(self, key: str) -> Tuple[str, int, int]:
+        return self._index[key]
+
+    def read_bytes(self, key: str) -> bytes:
+        shard, offset, length = self._index[key]
+        with open(os.path.join(self._shard_dir, shard), 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def __getitem__(self, key: str):
+        return self._deserialize(self.read_bytes(key))
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """
+        Iterate over all records, reading each shard sequentially
+        """
+        by_shard = dict()
+        for key, (shard, offset, length) in self._index.items():
+            by_shard.setdefault(shard, list()).append((offset, length, key))
+        for shard in sorted(by_shard):
+            with open(os.path.join(self._shard_dir, shard), 'rb') as f:
+                for offset, length, key in sorted(by_shard[shard]):
+                    f.seek(offset)
+                    yield key, self._deserialize(f.read(length))
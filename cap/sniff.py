@@ -0,0 +1,406 @@
+"""
+Cheap, DOM-free inspection of raw article bytes.
+
+The functions in this module mirror the locations used by `search_html_doi_publisher` and
+`search_xml_doi_publisher`, but work with regular expressions on the undecoded file contents.
+They never raise: `None` is returned whenever the result is uncertain, in which case the caller
+should fall back to the full parser.
+"""
+import re
+import html
+from typing import Optional, Dict, Tuple, Pattern
+
+DOI_URL_PREFIX = "https://doi.org/"
+DOI_PATTERN = re.compile(r"^10\.\d{4,9}/\S+$")
+
+TAG_ATTR_PATTERN = re.compile(
+    rb"""([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?"""
+)
+TAG_PATTERN = re.compile(rb"<[^>]*>")
+
+# candidate opening tags of the elements `search_html_doi_publisher` reads the doi from
+# publisher -> (tag name, candidate regex)
+HTML_DOI_CANDIDATES: Dict[str, Tuple[bytes, Pattern]] = {
+    'acs': (b'div', re.compile(rb"<div\b[^>]*article_header-doiurl[^>]*>", re.I)),
+    'wiley': (b'a', re.compile(rb"<a\b[^>]*epub-doi[^>]*>", re.I)),
+    'springer': (b'span', re.compile(rb"<span\b[^>]*bibliographic-information__value[^>]*>", re.I)),
+    'rsc': (b'div', re.compile(rb"<div\b[^>]*article_info[^>]*>", re.I)),
+    'elsevier': (b'a', re.compile(rb"<a\b[^>]*\bdoi\b[^>]*>", re.I)),
+    'nature': (b'a', re.compile(rb"<a\b[^>]*view doi[^>]*>", re.I)),
+    'aip': (b'div', re.compile(rb"<div\b[^>]*publicationContentCitation[^>]*>", re.I)),
+    'aaas': (b'div', re.compile(rb"<div\b[^>]*self-citation[^>]*>", re.I)),
+}
+
+# the publisher is detected from this many leading bytes
+PUBLISHER_SNIFF_BYTES = 64 * 1024
+
+# tokens of an html document that `check_html_publisher` depends on. Comments, scripts and styles are
+# matched as a whole so that the markup in them is ignored; a lone opening means it is cut off
+HTML_PUBLISHER_TOKEN_PATTERN = re.compile(
+    rb"(?P<skip><!--.*?-->|<(?P<raw>script|style)(?=[\s/>])[^>]*>.*?</(?P=raw)\s*>)"
+    rb"|(?P<open><!--|<(?:script|style)(?=[\s/>]))"
+    rb"|<(?P<tag>meta|html|title)(?=[\s/>])[^>]*>",
+    re.I | re.S
+)
+HTML_TITLE_END_PATTERN = re.compile(rb"</title\s*>", re.I)
+# the prolog of an XML document and the opening tag of the root element
+XML_ROOT_TOKEN_PATTERN = re.compile(
+    rb"(?P<skip><\?.*?\?>|<!--.*?-->|<!DOCTYPE(?:[^\[>]|\[.*?\])*>|\s+)"
+    rb"|<(?P<tag>[^\s/>!?]+)[^>]*>",
+    re.S
+)
+XML_PUBLISHER_NAME_TOKEN_PATTERN = re.compile(
+    rb"(?P<skip><!--.*?-->|<!\[CDATA\[.*?\]\]>)|(?P<open><!--|<!\[CDATA\[)"
+    rb"|(?P<xmlns>\sxmlns\s*=)|<publisher-name(?=[\s/>])[^>]*>",
+    re.S
+)
+
+XOCS_NAMESPACE_PATTERN = re.compile(rb"""xmlns(?::([\w.-]+))?\s*=\s*["']http://www\.elsevier\.com/xml/xocs/dtd["']""")
+JATS_ARTICLE_ID_PATTERN = re.compile(rb"<article-id\b[^>]*>([^<]*)</article-id>")
+JATS_PUBLISHER_NAME_PATTERN = re.compile(rb"<publisher-name\b[^>]*>([^<]*)</publisher-name>")
+
+
+def get_tag_attrs(open_tag: bytes) -> Dict[str, str]:
+    """
+    Parse the attributes of an opening tag such as `<a class="doi" href="...">`
+    """
+    attrs = dict()
+    inner = open_tag[1:-1].split(None, 1)
+    if len(inner) < 2:
+        return attrs
+    for name, dq, sq, bare in TAG_ATTR_PATTERN.findall(inner[1]):
+        value = dq or sq or bare
+        attrs[name.decode('utf-8', 'replace').lower()] = html.unescape(value.decode('utf-8', 'replace'))
+    return attrs
+
+
+def has_class(attrs: Dict[str, str], class_name: str) -> bool:
+    """
+    Same semantics as `soup.find_all(tag, {'class': class_name})`
+    """
+    class_value = attrs.get('class', '')
+    return class_name in class_value.split() or class_value == class_name
+
+
+def get_element_inner(contents: bytes, open_end: int, tag: bytes) -> Optional[bytes]:
+    """
+    Get the raw content between an opening tag that ends at `open_end` and its matching closing tag
+    """
+    depth = 1
+    for m in re.finditer(rb"<(/?)" + tag + rb"\b[^>]*>", contents[open_end:], re.I):
+        if m.group(1):
+            depth -= 1
+        elif not m.group(0).endswith(b'/>'):
+            depth += 1
+        if depth == 0:
+            return contents[open_end: open_end + m.start()]
+    return None
+
+
+def get_inner_text(inner: bytes) -> str:
+    """
+    Approximate `Tag.text` of an element from its raw inner content
+    """
+    text = TAG_PATTERN.sub(b'', inner).decode('utf-8', 'replace')
+    return html.unescape(text)
+
+
+def get_first_inner_element(inner: bytes, tag: bytes) -> Optional[bytes]:
+    """
+    Approximate `Tag.<tag>`, i.e., the first descendant with the given tag name
+    """
+    m = re.search(rb"<" + tag + rb"\b[^>]*>", inner, re.I)
+    if not m:
+        return None
+    return get_element_inner(inner, m.end(), tag)
+
+
+def strip_doi_url(doi_url: str) -> Optional[str]:
+    try:
+        doi = doi_url[doi_url.index(DOI_URL_PREFIX) + len(DOI_URL_PREFIX):].strip()
+    except ValueError:
+        doi = doi_url
+    return doi if DOI_PATTERN.match(doi) else None
+
+
+def sniff_html_publisher_doi(contents: bytes, publisher: str) -> Optional[str]:
+    """
+    Look for the doi at the location `search_html_doi_publisher` uses for `publisher`
+    """
+    tag, candidate_pattern = HTML_DOI_CANDIDATES[publisher]
+
+    doi_url = None
+    for m in candidate_pattern.finditer(contents):
+        attrs = get_tag_attrs(m.group(0))
+
+        if publisher == 'acs' and has_class(attrs, 'article_header-doiurl') or \
+                publisher == 'aip' and has_class(attrs, 'publicationContentCitation') or \
+                publisher == 'wiley' and has_class(attrs, 'epub-doi') or \
+                publisher == 'elsevier' and has_class(attrs, 'doi'):
+            inner = get_element_inner(contents, m.end(), tag)
+            if inner is None:
+                return None
+            doi_url = get_inner_text(inner).strip().lower()
+            break
+
+        elif publisher == 'nature' and attrs.get('data-track-action') == 'view doi':
+            inner = get_element_inner(contents, m.end(), tag)
+            if inner is None:
+                return None
+            doi_url = get_inner_text(inner).strip().lower()
+            break
+
+        elif publisher == 'springer' and 'bibliographic-information__value' in attrs.get('class', ''):
+            # `search_html_doi_publisher` keeps the last matching span
+            inner = get_element_inner(contents, m.end(), tag)
+            if inner is None:
+                return None
+            text = get_inner_text(inner)
+            if 'doi.org' in text:
+                doi_url = text.strip().lower()
+
+        elif publisher in ('rsc', 'aaas') and has_class(attrs, 'article_info' if publisher == 'rsc' else 'self-citation'):
+            inner = get_element_inner(contents, m.end(), tag)
+            inner_a = get_first_inner_element(inner, b'a') if inner is not None else None
+            if inner_a is None:
+                return None
+            doi_url = get_inner_text(inner_a).strip()
+            if publisher == 'aaas':
+                doi_url = doi_url.split()[-1].strip() if doi_url else doi_url
+            doi_url = doi_url.lower()
+            break
+
+    if not doi_url:
+        return None
+    return strip_doi_url(doi_url)
+
+
+def sniff_html_doi(contents: bytes, publisher: Optional[str] = None) -> Optional[str]:
+    """
+    Extract the doi of an HTML article without building the DOM.
+
+    Parameters
+    ----------
+    contents: raw file contents
+    publisher: the publisher of the article, if known.
+        Otherwise, it is detected with `sniff_html_publisher`. Only the location of the article's
+        own publisher is checked: the locations of other publishers may match the dois of cited
+        articles, e.g., the `doi` links of a reference list
+
+    Returns
+    -------
+    lower-cased doi or None if it cannot be reliably determined
+    """
+    try:
+        if not publisher:
+            # the whole document is searched for the doi anyway
+            publisher = sniff_html_publisher(contents, max_bytes=len(contents))
+        if publisher not in HTML_DOI_CANDIDATES:
+            return None
+        return sniff_html_publisher_doi(contents, publisher)
+    except Exception:
+        return None
+
+
+def sniff_xml_doi(contents: bytes, publisher: Optional[str] = None) -> Optional[str]:
+    """
+    Extract the doi of an XML article without building the element tree.
+
+    Parameters
+    ----------
+    contents: raw file contents
+    publisher: the publisher of the article, if known
+
+    Returns
+    -------
+    lower-cased doi or None if it cannot be reliably determined
+    """
+    try:
+        if publisher in (None, 'elsevier'):
+            ns_match = XOCS_NAMESPACE_PATTERN.search(contents)
+            if ns_match:
+                prefix = ns_match.group(1) + b':' if ns_match.group(1) else b''
+                m = re.search(rb"<" + re.escape(prefix) + rb"doi\b[^>]*>([^<]*)</", contents)
+                return html.unescape(m.group(1).decode('utf-8')).strip().lower() if m else None
+            elif publisher:
+                return None
+
+        if publisher in (None, 'acs'):
+            # `check_xml_publisher` only accepts ACS documents in JATS format
+            pub_match = JATS_PUBLISHER_NAME_PATTERN.search(contents)
+            if not pub_match or \
+                    ' '.join(html.unescape(pub_match.group(1).decode('utf-8')).split()) != 'American Chemical Society':
+                return None
+            m = JATS_ARTICLE_ID_PATTERN.search(contents)
+            return html.unescape(m.group(1).decode('utf-8')).strip().lower() if m else None
+    except Exception:
+        return None
+    return None
+
+
+def get_meta_publisher(attrs: Dict[str, str]) -> Tuple[Optional[str], bool]:
+    """
+    The publisher a <meta> element indicates in `check_html_publisher`
+
+    Returns
+    -------
+    the publisher or None, and whether `check_html_publisher` stops at this element
+    """
+    name = attrs.get('name')
+    if name is None:
+        return None, False
+    content = attrs.get('content')
+    name_lower = name.lower()
+    if name_lower in ('dc.publisher', 'citation_publisher') and content is None:
+        # `check_html_publisher` skips the element on the KeyError
+        return None, False
+
+    if name_lower == 'dc.publisher':
+        if content == 'Springer':
+            return 'springer', True
+        if content == 'Nature Publishing Group':
+            return 'nature', True
+    if name_lower == 'citation_publisher' and 'John Wiley & Sons, Ltd' in content:
+        return 'wiley', True
+    if name_lower == 'dc.publisher':
+        if content == 'American Institute of PhysicsAIP' or 'AIP Publishing' in content:
+            return 'aip', True
+        for publisher, publisher_name in (('acs', 'American Chemical Society'),
+                                          ('rsc', 'The Royal Society of Chemistry'),
+                                          ('aaas', 'American Association for the Advancement of Science')):
+            if content.strip() == publisher_name:
+                return publisher, True
+        if content.strip() == 'World Scientific Publishing Company':
+            return 'cjps', False
+    if name == 'citation_springer_api_url':
+        return 'springer', True
+    return None, False
+
+
+def sniff_html_publisher(contents: bytes, max_bytes: Optional[int] = PUBLISHER_SNIFF_BYTES) -> Optional[str]:
+    """
+    Detect the publisher of an HTML article like `check_html_publisher`, from the first `max_bytes` only.
+
+    The publisher is decided by the first <meta> element naming one. Elements after the scanned
+    prefix may change the result when no such element is found in it (the `xmlns:rsc` attribute and
+    the ScienceDirect title are overridden by any publisher <meta>), so then None is returned
+    unless the whole document has been scanned.
+
+    Returns
+    -------
+    the publisher or None if it cannot be decided from the scanned bytes
+    """
+    try:
+        window = contents[:max_bytes]
+        is_complete = len(contents) <= max_bytes
+        publisher = None
+        is_rsc_namespace = None
+        title_start = None
+        for m in HTML_PUBLISHER_TOKEN_PATTERN.finditer(window):
+            if m.group('skip'):
+                continue
+            if m.group('open'):
+                # a comment or script continues after the scanned bytes
+                is_complete = False
+                break
+
+            tag = m.group('tag').lower()
+            if tag == b'meta':
+                meta_publisher, is_final = get_meta_publisher(get_tag_attrs(m.group(0)))
+                if is_final:
+                    return meta_publisher
+                publisher = meta_publisher or publisher
+            elif tag == b'html' and is_rsc_namespace is None:
+                is_rsc_namespace = get_tag_attrs(m.group(0)).get('xmlns:rsc') == 'urn:rsc.org'
+            elif tag == b'title' and title_start is None:
+                title_start = m.end()
+
+        if not is_complete:
+            return None
+        if publisher is None and is_rsc_namespace:
+            publisher = 'rsc'
+        if publisher is None and title_start is not None:
+            title_end = HTML_TITLE_END_PATTERN.search(window, title_start)
+            if title_end is None:
+                return None
+            pub_web = get_inner_text(window[title_start: title_end.start()]).strip().split(' - ')[-1]
+            if pub_web.lower() == 'sciencedirect':
+                publisher = 'elsevier'
+        return publisher
+    except Exception:
+        return None
+
+
+def sniff_xml_publisher(contents: bytes, max_bytes: Optional[int] = PUBLISHER_SNIFF_BYTES) -> Optional[str]:
+    """
+    Detect the publisher of an XML article like `check_xml_publisher`, from the first `max_bytes` only:
+    Elsevier by the namespace of the root element, ACS by the first <publisher-name>.
+
+    Returns
+    -------
+    the publisher or None if it cannot be decided from the scanned bytes
+    """
+    try:
+        window = contents[:max_bytes]
+        root = None
+        for m in XML_ROOT_TOKEN_PATTERN.finditer(window):
+            if m.group('skip'):
+                continue
+            root = m
+            break
+        if root is None:
+            return None
+
+        tag_name = root.group('tag').decode('utf-8')
+        attrs = dict()
+        for name, dq, sq, bare in TAG_ATTR_PATTERN.findall(root.group(0)[len(tag_name) + 1:-1]):
+            attrs[name.decode('utf-8')] = html.unescape((dq or sq or bare).decode('utf-8'))
+        prefix, _, local_name = tag_name.rpartition(':')
+        namespace = attrs.get(f'xmlns:{prefix}') if prefix else attrs.get('xmlns')
+        if prefix and namespace is None:
+            return None
+        if 'elsevier' in (f'{{{namespace}}}{local_name}' if namespace else local_name):
+            return 'elsevier'
+        if namespace is not None:
+            # <publisher-name> would be in the default namespace
+            return None
+
+        for m in XML_PUBLISHER_NAME_TOKEN_PATTERN.finditer(window, root.start()):
+            if m.group('skip'):
+                continue
+            if m.group('open') or m.group('xmlns'):
+                return None
+            text_end = window.find(b'<', m.end())
+            if text_end < 0 or window.startswith(b'<![CDATA[', text_end):
+                return None
+            text = html.unescape(window[m.end(): text_end].decode('utf-8'))
+            # `format_text` only collapses spaces and newlines of ascii text
+            if any(ord(c) > 127 for c in text) or '\t' in text:
+                return None
+            return 'acs' if ' '.join(text.split()) == 'American Chemical Society' else None
+        return None
+    except Exception:
+        return None
+
+
+def sniff_doi(file_type: str, contents: bytes, publisher: Optional[str] = None) -> Optional[str]:
+    """
+    Dispatch `contents` to the HTML or XML doi sniffer according to the file type
+    """
+    if file_type == 'html':
+        return sniff_html_doi(contents, publisher=publisher)
+    elif file_type == 'xml':
+        return sniff_xml_doi(contents, publisher=publisher)
+    return None
+
+
+def sniff_publisher(file_type: str, contents: bytes) -> Optional[str]:
+    """
+    Dispatch `contents` to the HTML or XML publisher sniffer according to the file type.
+    The whole document is scanned
+    """
+    if file_type == 'html':
+        return sniff_html_publisher(contents, max_bytes=len(contents))
+    elif file_type == 'xml':
+        return sniff_xml_publisher(contents, max_bytes=len(contents))
+    return None
@@ -0,0 +1,56 @@
+"""
+Iterative depth-first traversal of document trees.
+
+The section, paragraph and text extractors are visitors called by `walk` on every node below a
+root, in document order. The pending children of the open nodes are kept on an explicit stack
+instead of the Python call stack, so the depth of the tree is not bounded by the recursion limit,
+and a node costs one visitor call instead of a call of the whole extractor.
+
+`walk` works on any tree whose nodes iterate over their children: BeautifulSoup tags, and the
+elements of `xml.etree` and `lxml`.
+"""
+from typing import Any, Callable, Iterable, Optional
+
+# the state of visitors that do not carry one: descend into the children of the node
+DESCEND = True
+
+
+def walk(root,
+         visit: Callable[[Any, Any], Any],
+         state: Optional[Any] = DESCEND,
+         leave: Optional[Callable[[Any, Any], None]] = None,
+         children: Optional[Callable[[Any], Iterable]] = iter):
+    """
+    Depth-first walk of the descendants of `root`, in document order
+
+    Parameters
+    ----------
+    root: the node whose descendants are visited. The root itself is not visited
+    visit: called as `visit(node, state)` on every child of a visited node, with the state returned
+        for its parent (`state` for the children of the root). It returns the state the children
+        of the node are visited with, or None to skip them
+    state: the state the children of the root are visited with
+    leave: called as `leave(node, state)` once all the descendants of a node `visit` descended into
+        are visited, with the state returned for it
+    children: the children of a node. They are taken when the walk descends into the node, i.e.,
+        after it is visited, so visitors may modify the subtree of the node they visit
+
+    Returns
+    -------
+    None
+    """
+    stack = list()
+    node, nodes = root, iter(children(root))
+    while True:
+        for child in nodes:
+            child_state = visit(child, state)
+            if child_state is not None:
+                stack.append((node, nodes, state))
+                node, nodes, state = child, iter(children(child)), child_state
+                break
+        else:
+            if not stack:
+                return
+            if leave is not None:
+                leave(node, state)
+            node, nodes, state = stack.pop()
@@ -0,0 +1,289 @@
+"""
+Worker processes with a time and memory budget per task.
+
+Each worker runs one task at a time. A worker that exceeds the time budget is killed and
+replaced, so a pathological input cannot stall a run. Memory is bounded by limiting the address
+space of the worker (`RLIMIT_AS`, unix only) to its size after start-up plus the budget; an
+allocation beyond it raises `MemoryError` in the worker. The stage a worker is in is
+published through the stage profiler, so timed-out tasks report where they stalled.
+
+Tasks that exceed a budget or fail are reported as such instead of raising. The caller can add them
+to a `Quarantine`, a json lines file that can be used as the input list of a retry pass.
+"""
+import os
+import json
+import time
+import signal
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+from dataclasses import dataclass, asdict
+from typing import Optional, Callable, Iterable, Iterator, Any
+
+from .profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+# maximum length of the stage path shared by a worker
+_STAGE_BUFFER_SIZE = 256
+
+OUTCOME_DONE = 'done'
+OUTCOME_TIMEOUT = 'timeout'
+OUTCOME_MEMORY = 'memory'
+OUTCOME_CRASHED = 'crashed'
+OUTCOME_ERROR = 'error'
+
+
+@dataclass
+class TaskOutcome:
+    task: Any
+    # 'done', 'timeout', 'memory', 'crashed' (the worker died) or 'error' (the task function raised)
+    status: str
+    result: Any = None  # return value of the task function if `status` is 'done'
+    stage: Optional[str] = None  # the stage the worker was in when the budget was exceeded
+    elapsed: Optional[float] = None
+    error: Optional[str] = None
+
+
+def get_address_space_size() -> Optional[int]:
+    """
+    Size of the virtual memory of the current process in bytes, or None if it cannot be read (non-linux)
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def limit_memory(budget_mb: int):
+    """
+    Limit the address space of the current process to its current size plus `budget_mb`
+    """
+    try:
+        import resource
+    except ImportError:
+        logger.warning("Memory budgets are not supported on this platform")
+        return
+    limit = budget_mb * 2 ** 20 + (get_address_space_size() or 0)
+    _, hard_limit = resource.getrlimit(resource.RLIMIT_AS)
+    if hard_limit != resource.RLIM_INFINITY:
+        limit = min(limit, hard_limit)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard_limit))
+
+
+def _worker_main(conn, stage_buffer, func: Callable, initializer: Optional[Callable], initargs: tuple,
+                 memory_budget_mb: Optional[int]):
+    # the supervisor handles keyboard interrupts
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer is not None:
+        initializer(*initargs)
+
+    def publish_stage(stage_path: str):
+        stage_buffer.value = stage_path.encode('utf-8')[:_STAGE_BUFFER_SIZE - 1]
+
+    profiler.set_stage_callback(publish_stage)
+    if memory_budget_mb:
+        limit_memory(memory_budget_mb)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        stage_buffer.value = b''
+        try:
+            status, result = OUTCOME_DONE, func(task)
+        except MemoryError:
+            # reply after the traceback is released
+            status, result = OUTCOME_MEMORY, None
+        except Exception as e:
+            status, result = OUTCOME_ERROR, repr(e)
+        stage = stage_buffer.value.decode('utf-8', errors='replace') if status != OUTCOME_DONE else None
+        conn.send((status, stage, result))
+
+
+class _Worker:
+    def __init__(self, pool: "SupervisedPool"):
+        self.stage_buffer = multiprocessing.Array('c', _STAGE_BUFFER_SIZE, lock=False)
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, self.stage_buffer, pool.func, pool.initializer, pool.initargs, pool.memory_budget_mb),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        # (sequence number, task, start time) of the task being processed
+        self.current = None
+
+    @property
+    def stage(self) -> Optional[str]:
+        return self.stage_buffer.value.decode('utf-8', errors='replace') or None
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            os.kill(self.process.pid, signal.SIGKILL)
+            self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class SupervisedPool:
+    """
+    A pool of worker processes that enforces a time and memory budget per task.
+
+    Parameters
+    ----------
+    func: the task function; must be picklable if processes are spawned
+    num_workers: number of worker processes
+    initializer, initargs: called in each worker process when it starts, including replacements of killed workers
+    timeout: time budget per task in seconds. None for no limit
+    memory_budget_mb: memory budget of a worker on top of its size after start-up, in MB. None for no limit
+    """
+
+    def __init__(self,
+                 func: Callable,
+                 num_workers: Optional[int] = 1,
+                 initializer: Optional[Callable] = None,
+                 initargs: Optional[tuple] = (),
+                 timeout: Optional[float] = None,
+                 memory_budget_mb: Optional[int] = None):
+        self.func = func
+        self.num_workers = max(num_workers, 1)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.timeout = timeout
+        self.memory_budget_mb = memory_budget_mb
+
+    def imap(self, tasks: Iterable, max_pending: Optional[int] = None) -> Iterator[TaskOutcome]:
+        """
+        Run the tasks and yield their outcomes in the order of `tasks`.
+
+        Parameters
+        ----------
+        tasks: the task function arguments
+        max_pending: maximum number of finished outcomes waiting for an earlier task; no new tasks are
+            started once it is reached. Defaults to four times the number of workers
+
+        Returns
+        -------
+        iterator of TaskOutcome
+        """
+        max_pending = max_pending or 4 * self.num_workers
+        tasks = iter(tasks)
+        workers = [_Worker(self) for _ in range(self.num_workers)]
+        pending = dict()
+        next_seq = 0
+        n_dispatched = 0
+        exhausted = False
+
+        def replace(worker_idx: int):
+            workers[worker_idx].kill()
+            workers[worker_idx] = _Worker(self)
+
+        try:
+            while True:
+                for worker in workers:
+                    if exhausted or worker.current is not None or len(pending) >= max_pending:
+                        continue
+                    try:
+                        task = next(tasks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    worker.current = (n_dispatched, task, time.perf_counter())
+                    n_dispatched += 1
+                    worker.conn.send(task)
+
+                busy = [worker for worker in workers if worker.current is not None]
+                if not busy:
+                    # every dispatched task has been yielded
+                    break
+
+                wait_time = None
+                if self.timeout is not None:
+                    earliest_start = min(worker.current[2] for worker in busy)
+                    wait_time = max(earliest_start + self.timeout - time.perf_counter(), 0)
+                ready = wait([worker.conn for worker in busy], timeout=wait_time)
+
+                now = time.perf_counter()
+                for worker_idx, worker in enumerate(workers):
+                    if worker.current is None:
+                        continue
+                    seq, task, start = worker.current
+                    if worker.conn in ready:
+                        try:
+                            status, stage, result = worker.conn.recv()
+                        except (EOFError, OSError):
+                            # the worker died, e.g., killed by the OS for running out of memory
+                            outcome = TaskOutcome(task, OUTCOME_CRASHED, stage=worker.stage,
+                                                  error='the worker exited unexpectedly')
+                            replace(worker_idx)
+                        else:
+                            if status == OUTCOME_DONE:
+                                outcome = TaskOutcome(task, status, result=result)
+                            else:
+                                outcome = TaskOutcome(task, status, stage=stage or None, error=result)
+                            worker.current = None
+                            if status == OUTCOME_MEMORY:
+                                # the heap of the worker may be fragmented after a failed allocation
+                                replace(worker_idx)
+                    elif self.timeout is not None and now - start >= self.timeout:
+                        outcome = TaskOutcome(task, OUTCOME_TIMEOUT, stage=worker.stage)
+                        replace(worker_idx)
+                    else:
+                        continue
+                    outcome.elapsed = now - start
+                    pending[seq] = outcome
+
+                while next_seq in pending:
+                    yield pending.pop(next_seq)
+                    next_seq += 1
+        finally:
+            for worker in workers:
+                if worker.current is None:
+                    worker.stop()
+                else:
+                    worker.kill()
+
+
+class Quarantine:
+    """
+    Json lines file listing the inputs that exceeded their budget. Each line has a "path" field,
+    so that the file can be passed as the input of a retry pass.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.n_entries = 0
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def add(self, path: str, outcome: TaskOutcome, **info):
+        entry = {'path': path}
+        entry.update({k: v for k, v in asdict(outcome).items() if k not in ('task', 'result')})
+        entry.update(info)
+        entry['time'] = time.time()
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.n_entries += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
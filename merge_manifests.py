@@ -0,0 +1,101 @@
+import os
+import sys
+import glob
+import json
+import logging
+from datetime import datetime
+from transformers import HfArgumentParser
+from typing import Optional, List
+from dataclasses import dataclass, field
+
+from seqlbtoolkit.IO import set_logging, logging_args
+
+from cap.constants import PARSER_VERSION
+from cap.io import load_dois_to_skip
+from cap.manifest import MANIFEST_DONE_STATUSES, merge_manifests
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ManifestMergingArgs:
+    manifest_paths: List[str] = field(
+        metadata={"help": "The per-partition manifests written by `process_articles.py`. "
+                          "Glob patterns such as 'manifest.part-*.db' are accepted."}
+    )
+    output_manifest_path: str = field(
+        metadata={"help": "Where to save the merged manifest."}
+    )
+    skip_dois_paths: Optional[List[str]] = field(
+        default_factory=list,
+        metadata={"help": "Existing skip lists (json lists or one doi per line) to merge into the output skip list."}
+    )
+    output_skip_dois_path: Optional[str] = field(
+        default=None,
+        metadata={"help": "Where to save the merged skip list, a json list of the dois of all processed articles. "
+                          "Can be used as `skip_dois_path` of the following runs."}
+    )
+    log_file: Optional[str] = field(
+        default=None,
+        metadata={"help": "the directory of the log file. Set to '' to disable logging"}
+    )
+
+
+def merge(args: ManifestMergingArgs):
+    set_logging(args.log_file)
+    logger.setLevel(logging.INFO)
+
+    logging_args(args)
+
+    manifest_paths = list()
+    for path in args.manifest_paths:
+        matched_paths = sorted(glob.glob(path))
+        if not matched_paths:
+            logger.warning(f"No manifest found at {path}")
+        manifest_paths += matched_paths
+
+    logger.info(f"Merging {len(manifest_paths)} manifests")
+    merged = merge_manifests(manifest_paths, args.output_manifest_path, parser_version=PARSER_VERSION)
+
+    dois = set()
+    n_entries = 0
+    with merged:
+        for entry in merged.iter_entries():
+            n_entries += 1
+            if entry.status in MANIFEST_DONE_STATUSES and entry.doi:
+                dois.add(entry.doi.lower())
+    logger.info(f"Merged manifest has {n_entries} entries and {len(dois)} processed dois")
+
+    if args.output_skip_dois_path:
+        for skip_dois_path in args.skip_dois_paths:
+            dois.update(load_dois_to_skip(skip_dois_path))
+
+        output_dir = os.path.dirname(os.path.abspath(args.output_skip_dois_path))
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        with open(args.output_skip_dois_path, 'w', encoding='utf-8') as f:
+            json.dump(sorted(dois), f, indent=2)
+        logger.info(f"Saved {len(dois)} dois to {args.output_skip_dois_path}")
+
+    logger.info('Program finished.')
+
+
+if __name__ == '__main__':
+    _time = datetime.now().strftime("%m.%d.%y-%H.%M")
+    _current_file_name = os.path.basename(__file__)
+    if _current_file_name.endswith('.py'):
+        _current_file_name = _current_file_name[:-3]
+
+    # --- set up arguments ---
+    parser = HfArgumentParser(ManifestMergingArgs)
+    if len(sys.argv) == 2 and sys.argv[1].endswith(".json"):
+        merging_args, = parser.parse_json_file(
+            json_file=os.path.abspath(sys.argv[1])
+        )
+    else:
+        merging_args, = parser.parse_args_into_dataclasses()
+
+    if merging_args.log_file is None:
+        merging_args.log_file = os.path.join('logs', f'{_current_file_name}.{_time}.log')
+
+    merge(args=merging_args)
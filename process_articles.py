@@ -1,11 +1,13 @@
 import os
 import sys
-import json
-import torch
+import time
 import logging
+import itertools
+import collections
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from transformers import HfArgumentParser
-from typing import Optional
+from typing import Optional, List, Dict, Tuple, Iterable, Callable
 from dataclasses import dataclass, field
 
 from seqlbtoolkit.Text import substring_mapping
@@ -15,8 +17,36 @@ from cap.article_constr import (
     parse_html,
     parse_xml
 )
-from cap.constants import CHAR_TO_HTML_LBS
-from cap.io import get_file_paths
+from cap.cache import ParseCache
+from cap.constants import CHAR_TO_HTML_LBS, PARSER_VERSION
+from cap.dedup import (
+    DEFAULT_DEDUP_PREFERENCE,
+    DedupRecord,
+    parse_preference,
+    find_duplicates,
+    get_duplicate_paths,
+    replace_failed_representatives,
+    save_duplicates
+)
+from cap.io import (
+    ArticleFile,
+    iter_article_files,
+    iter_prefetched,
+    get_listed_input_fields,
+    load_dois_to_skip,
+    get_partition,
+    get_partition_path_key,
+    get_article_file_path_key,
+    get_partition_file_path
+)
+from cap.manifest import ProcessingManifest, ManifestEntry, get_content_hash
+from cap.pipeline import Stage, run_pipeline
+from cap.profiling import profiler, merge_records, StageStatistics
+from cap.registry import parse_backend_overrides, set_backends
+from cap.serialization import dumps as serialize_article
+from cap.shard import ShardWriter, serialize_pickle
+from cap.sniff import sniff_doi
+from cap.watchdog import SupervisedPool, Quarantine, OUTCOME_DONE, OUTCOME_TIMEOUT, OUTCOME_MEMORY, OUTCOME_ERROR
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +54,8 @@ logger = logging.getLogger(__name__)
 @dataclass
 class ArticleProcessingArgs:
     input_dir: str = field(
-        metadata={"help": "The path to the HTML/XML article file."}
+        metadata={"help": "The path to the HTML/XML article files. Can be a directory (searched recursively), "
+                          "a zip/tar(.gz) archive or a json/jsonl/text file listing the input paths."}
     )
     output_dir: Optional[str] = field(
         default='./output',
@@ -38,10 +69,700 @@ class ArticleProcessingArgs:
         default='./data/seqcx-anno/exist-dois.json',
         metadata={'help': 'load existing dois (optional).'}
     )
+    num_workers: Optional[int] = field(
+        default=1,
+        metadata={'help': 'Number of worker processes used to parse and save articles. '
+                          'Set to 1 to process the articles sequentially in the main process.'}
+    )
+    chunk_size: Optional[int] = field(
+        default=16,
+        metadata={'help': 'Number of articles dispatched to a worker process at a time.'}
+    )
+    prefetch_depth: Optional[int] = field(
+        default=0,
+        metadata={'help': 'Number of input files read ahead by background threads while the current ones are '
+                          'processed, to hide the latency of (network) storage. Set to 0 to disable.'}
+    )
+    prefetch_buffer_mb: Optional[int] = field(
+        default=256,
+        metadata={'help': 'Maximum size of the files that are read ahead but not yet processed in MB.'}
+    )
+    html_tree_builder: Optional[str] = field(
+        default='auto',
+        metadata={'help': "How html articles are parsed. "
+                          "'auto': detect the publisher and doi without a DOM, then parse once; "
+                          "'legacy': parse with lxml, then again with html5lib for Elsevier and RSC; "
+                          "'lxml': parse once with lxml for all publishers (fastest, output may differ for "
+                          "Elsevier and RSC; check with `python -m benchmarks.html_parity`)",
+                  'choices': ('auto', 'legacy', 'lxml')}
+    )
+    html_backends: Optional[List[str]] = field(
+        default=None,
+        metadata={'help': "Override the parser backend of html publishers, as 'publisher=backend' items, "
+                          "e.g., 'elsevier=lxml rsc=html.parser'. Backends: lxml, html5lib, html.parser, and "
+                          "lxml.html (XPath extraction on lxml trees; Nature, Wiley, Springer, AIP, ACS and AAAS). "
+                          "Used with `html_tree_builder` 'auto'; see `cap.registry`."}
+    )
+    xml_backends: Optional[List[str]] = field(
+        default=None,
+        metadata={'help': "Override the parser backend of xml publishers, as 'publisher=backend' items, "
+                          "e.g., 'elsevier=iterparse acs=iterparse'. Backends: etree (build the whole tree) and "
+                          "iterparse (construct the article while parsing and free the parsed subtrees, "
+                          "for large documents)."}
+    )
+    deduplicate: Optional[bool] = field(
+        default=False,
+        metadata={'help': 'Before processing, group the input files by the doi sniffed from their contents '
+                          '(or by content hash) and only process one file per article.'}
+    )
+    dedup_preference: Optional[str] = field(
+        default=DEFAULT_DEDUP_PREFERENCE,
+        metadata={'help': "Comma-separated file types in decreasing order of preference for choosing the file "
+                          "that is processed among duplicates, e.g., 'xml,html' to parse publisher XML "
+                          "rather than saved HTML."}
+    )
+    dedup_report_path: Optional[str] = field(
+        default=None,
+        metadata={'help': 'Where to save the skipped duplicates and their representatives (json lines).'}
+    )
+    pipeline: Optional[bool] = field(
+        default=False,
+        metadata={'help': 'Run reading, parsing and saving as separate stages connected by bounded queues, '
+                          'each with its own workers. Parsing uses `num_workers` processes. '
+                          'A slow stage holds back the ones before it, so memory use does not grow with the corpus.'}
+    )
+    read_workers: Optional[int] = field(
+        default=2,
+        metadata={'help': 'Number of threads reading the input files. Only used with `pipeline`.'}
+    )
+    write_workers: Optional[int] = field(
+        default=2,
+        metadata={'help': 'Number of threads saving the processed articles. Only used with `pipeline`.'}
+    )
+    max_in_flight: Optional[int] = field(
+        default=None,
+        metadata={'help': 'Maximum number of articles held by the pipeline at a time. '
+                          'Defaults to twice the total number of workers. Only used with `pipeline`.'}
+    )
+    doc_timeout: Optional[float] = field(
+        default=None,
+        metadata={'help': 'Time budget for processing one article in seconds. Articles are processed by '
+                          'supervised worker processes, which are killed and replaced when they exceed it. '
+                          'Offending files are added to the quarantine list.'}
+    )
+    doc_memory_budget_mb: Optional[int] = field(
+        default=None,
+        metadata={'help': 'Memory budget of a worker process for processing one article in MB, on top of its size '
+                          'after start-up (unix only). Offending files are added to the quarantine list.'}
+    )
+    quarantine_path: Optional[str] = field(
+        default=None,
+        metadata={'help': 'Json lines file the articles exceeding their budget are appended to, with the stage '
+                          'where they stalled. Defaults to `quarantine.jsonl` in `output_dir`. '
+                          'Pass it as `input_dir` with `retry_quarantined` and relaxed budgets to retry them.'}
+    )
+    retry_quarantined: Optional[bool] = field(
+        default=False,
+        metadata={'help': 'Process articles that are recorded as quarantined in the manifest. '
+                          'They are skipped by default.'}
+    )
+    use_parse_cache: Optional[bool] = field(
+        default=False,
+        metadata={'help': 'Cache the parsed articles by the content hash of their input, the parser version and '
+                          'the parse options, and deserialize them instead of parsing unchanged inputs again, '
+                          'e.g., when the corpus is processed again after a change of the downstream code.'}
+    )
+    parse_cache_path: Optional[str] = field(
+        default=None,
+        metadata={'help': 'Path to the SQLite database of the parse cache; use a local disk. '
+                          'Defaults to `parse_cache.db` in `output_dir`. Only used with `use_parse_cache`.'}
+    )
+    parse_cache_size_mb: Optional[int] = field(
+        default=4096,
+        metadata={'help': 'Maximum size of the cached articles in MB; the least recently used ones are evicted '
+                          'beyond it. Only used with `use_parse_cache`.'}
+    )
+    manifest_path: Optional[str] = field(
+        default=None,
+        metadata={'help': 'Path to the SQLite processing manifest. '
+                          'Input files that are already processed by the current parser version and have not '
+                          'changed since are skipped; new, changed and failed files are (re-)processed.'}
+    )
+    shard_output: Optional[bool] = field(
+        default=False,
+        metadata={'help': 'Pack the processed articles into size-bounded shard files with a doi index '
+                          'instead of saving one file per article.'}
+    )
+    max_shard_size_mb: Optional[int] = field(
+        default=256,
+        metadata={'help': 'Maximum size of a shard file in MB.'}
+    )
+    serialization: Optional[str] = field(
+        default='torch',
+        metadata={'help': "How to serialize the processed articles. "
+                          "'torch': `torch.save` pickles (.pt); "
+                          "'cap': compact torch-free format readable with `cap.serialization.load` (.cap)",
+                  'choices': ('torch', 'cap')}
+    )
+    shard_index: Optional[int] = field(
+        default=0,
+        metadata={'help': 'Index of the partition of the input corpus processed by this run (0-based). '
+                          'Used to distribute the corpus over multiple nodes.'}
+    )
+    num_shards: Optional[int] = field(
+        default=1,
+        metadata={'help': 'Number of partitions the input corpus is split into. '
+                          'Every file belongs to exactly one partition.'}
+    )
+    partition_key: Optional[str] = field(
+        default='path',
+        metadata={'help': "What the partition of a file is decided by. "
+                          "'path': the file path relative to `input_dir`, which requires no reading; "
+                          "'doi': the doi sniffed from the file contents (falls back to the path), "
+                          "so that duplicates of an article are always processed by the same node.",
+                  'choices': ('path', 'doi')}
+    )
+    profile_stages: Optional[bool] = field(
+        default=False,
+        metadata={'help': 'Record the wall time of each processing stage (reading, parsing, publisher detection, '
+                          'article construction, tokenization, saving) and log a summary per stage and publisher.'}
+    )
+    profile_path: Optional[str] = field(
+        default=None,
+        metadata={'help': 'Where to save the per-document stage timings as json lines. '
+                          'Only used with `profile_stages`.'}
+    )
     debug_mode: Optional[bool] = field(
         default=False, metadata={"help": "Debugging mode with fewer training data"}
     )
 
+    def __post_init__(self):
+        parse_preference(self.dedup_preference)
+        parse_backend_overrides(self.html_backends)
+        parse_backend_overrides(self.xml_backends, 'xml')
+        if not 0 <= self.shard_index < self.num_shards:
+            raise ValueError(f"`shard_index` must be in [0, {self.num_shards}), got {self.shard_index}")
+        if self.pipeline and self.supervised:
+            raise ValueError("`doc_timeout` and `doc_memory_budget_mb` are not supported with `pipeline`")
+
+    @property
+    def supervised(self) -> bool:
+        return bool(self.doc_timeout or self.doc_memory_budget_mb)
+
+    def get_parse_cache_path(self) -> str:
+        return self.parse_cache_path or os.path.join(self.output_dir, 'parse_cache.db')
+
+
+@dataclass
+class ArticleProcessingResult:
+    file_path: str
+    # 'saved', 'skipped', 'unchanged', 'excluded', 'quarantined' or 'failed'
+    status: Optional[str] = 'failed'
+    file_type: Optional[str] = None
+    doi: Optional[str] = None
+    publisher: Optional[str] = None
+    save_path: Optional[str] = None
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+    content_hash: Optional[str] = None
+    partition_path_key: Optional[str] = None  # recorded by the input list, see `ArticleFile`
+    from_cache: Optional[bool] = False  # whether the article is loaded from the parse cache
+    contents: Optional[bytes] = None  # contents of the input file, between reading and parsing
+    data: Optional[bytes] = None  # serialized article, between parsing and saving
+    profile: Optional[dict] = None  # stage timings, if `profile_stages`
+    errors: List[str] = field(default_factory=list)
+
+
+# per-process state shared by all articles handled by a worker; set by `init_article_worker`
+_worker_state = dict()
+
+
+def init_article_worker(args: ArticleProcessingArgs, dois_to_skip: set):
+    _worker_state['args'] = args
+    _worker_state['dois_to_skip'] = dois_to_skip
+    _worker_state['supervised'] = False
+    profiler.enable(args.profile_stages)
+    set_backends(args.html_backends)
+    set_backends(args.xml_backends, 'xml')
+
+
+def init_supervised_article_worker(args: ArticleProcessingArgs, dois_to_skip: set):
+    init_article_worker(args, dois_to_skip)
+    # `MemoryError` is left to the supervising worker pool, which quarantines the article
+    _worker_state['supervised'] = True
+
+
+def get_parse_cache(args: ArticleProcessingArgs) -> Optional[ParseCache]:
+    """
+    The parse cache of the current process, opened on first use: the SQLite connection of the
+    main process must not be used by the worker processes forked from it
+    """
+    if not args.use_parse_cache:
+        return None
+    pid, parse_cache = _worker_state.get('parse_cache', (None, None))
+    if pid != os.getpid():
+        parse_cache = ParseCache(args.get_parse_cache_path(), parser_version=PARSER_VERSION,
+                                 max_size_bytes=args.parse_cache_size_mb * 2 ** 20)
+        _worker_state['parse_cache'] = (os.getpid(), parse_cache)
+    return parse_cache
+
+
+def close_parse_cache():
+    pid, parse_cache = _worker_state.pop('parse_cache', (None, None))
+    if pid == os.getpid():
+        parse_cache.close()
+
+
+def read_article(article_file: ArticleFile, known_hash: Optional[str] = None) -> ArticleProcessingResult:
+    """
+    Read an article file. `contents` of the returned result is None if
+    the article needs no further processing (failed to read or unchanged).
+
+    Parameters
+    ----------
+    article_file: the HTML/XML article file
+    known_hash: content hash of the file when it was last processed successfully.
+        The article is not processed again if the content has not changed.
+
+    Returns
+    -------
+    ArticleProcessingResult
+    """
+    file_path = os.path.normpath(article_file.path)
+    result = ArticleProcessingResult(file_path=file_path, file_type=article_file.file_type,
+                                     partition_path_key=article_file.partition_path_key)
+
+    if result.file_type is None:
+        result.errors.append('Unsupported file type!')
+        return result
+
+    try:
+        with profiler.stage('read'):
+            result.size, result.mtime = article_file.stat()
+            contents = article_file.read()
+    except Exception as e:
+        result.errors.append(f"Failed to read file. Error: {e}")
+        return result
+
+    with profiler.stage('hash'):
+        result.content_hash = get_content_hash(contents)
+    if known_hash is not None and result.content_hash == known_hash:
+        result.status = 'unchanged'
+        return result
+
+    result.contents = contents
+    return result
+
+
+def get_save_path(file_path: str, doi: str, args: ArticleProcessingArgs) -> str:
+    save_dir = os.path.normpath(os.path.abspath(file_path)).split(os.sep)
+    save_dir[-2] += '_processed'
+    suffix = 'cap' if args.serialization == 'cap' else 'pt'
+    save_dir[-1] = f"{substring_mapping(doi, CHAR_TO_HTML_LBS)}.{suffix}"
+    return os.path.normpath(os.path.join(args.output_dir, os.sep.join(save_dir[-2:])))
+
+
+def serialize(article, args: ArticleProcessingArgs) -> bytes:
+    if args.serialization == 'cap':
+        return serialize_article(article)
+    if args.shard_output:
+        return serialize_pickle(article)
+    # only workers saving with torch pay for importing it
+    import io
+    import torch
+    buffer = io.BytesIO()
+    torch.save(article, buffer)
+    return buffer.getvalue()
+
+
+def get_parse_options(file_type: str, args: ArticleProcessingArgs) -> str:
+    """
+    The options that may change the article parsed from a file, as part of the parse cache key
+    """
+    if file_type == 'html':
+        return f"tree_builder={args.html_tree_builder} backends={' '.join(args.html_backends or [])}"
+    return f"backends={' '.join(args.xml_backends or [])}"
+
+
+def parse_article(result: ArticleProcessingResult) -> ArticleProcessingResult:
+    """
+    Parse the contents read by `read_article` and serialize the article to `result.data`.
+    Errors are captured in the result instead of being logged so that
+    the function can run in worker processes.
+    """
+    contents, result.contents = result.contents, None
+    args = _worker_state['args']
+
+    # skip known articles before building the DOM
+    with profiler.stage('sniff_doi'):
+        sniffed_doi = sniff_doi(result.file_type, contents)
+    if args.num_shards > 1 and args.partition_key == 'doi':
+        partition_key = sniffed_doi or result.partition_path_key or \
+            get_partition_path_key(result.file_path, args.input_dir)
+        if get_partition(partition_key, args.num_shards) != args.shard_index:
+            # the article belongs to another node
+            result.status = 'excluded'
+            return result
+
+    if sniffed_doi and sniffed_doi in _worker_state['dois_to_skip']:
+        result.doi = sniffed_doi
+        result.status = 'skipped'
+        return result
+
+    parse_cache = get_parse_cache(args)
+    parse_options = get_parse_options(result.file_type, args)
+    cached = None
+    if parse_cache is not None:
+        with profiler.stage('parse_cache_read'):
+            cached = parse_cache.get(result.content_hash, parse_options)
+
+    if cached is not None:
+        article, component_check = cached
+        result.from_cache = True
+        profiler.set_publisher(article.publisher)
+    else:
+        try:
+            if result.file_type == 'html':
+                article, component_check = parse_html(result.file_path, contents, tree_builder=args.html_tree_builder)
+            else:
+                article, component_check = parse_xml(result.file_path, contents)
+        except Exception as e:
+            if isinstance(e, MemoryError) and _worker_state['supervised']:
+                raise
+            result.errors.append(f"Failed to parse file. Error: {e}")
+            return result
+
+        if parse_cache is not None:
+            with profiler.stage('parse_cache_write'):
+                parse_cache.put(result.content_hash, article, component_check, parse_options)
+
+    result.doi = article.doi
+    result.publisher = article.publisher
+
+    try:
+        if article.doi.lower() in _worker_state['dois_to_skip']:
+            result.status = 'skipped'
+            return result
+    except Exception as e:
+        result.errors.append(f"Failed to get the dois. Error: {e}")
+        return result
+
+    try:
+        with profiler.stage('serialize'):
+            result.data = serialize(article, args)
+        if not args.shard_output:
+            result.save_path = get_save_path(result.file_path, article.doi, args)
+    except Exception as e:
+        if isinstance(e, MemoryError) and _worker_state['supervised']:
+            raise
+        result.errors.append(f"Failed to save results. Error: {e}")
+        return result
+
+    if args.shard_output:
+        # the main process appends the article to the current shard
+        result.status = 'saved'
+    return result
+
+
+def write_article(result: ArticleProcessingResult) -> ArticleProcessingResult:
+    """
+    Save the serialized article to `result.save_path`
+    """
+    try:
+        with profiler.stage('write'):
+            os.makedirs(os.path.split(result.save_path)[0], exist_ok=True)
+            with open(result.save_path, 'wb') as f:
+                f.write(result.data)
+    except Exception as e:
+        result.save_path = None
+        result.errors.append(f"Failed to save results. Error: {e}")
+        return result
+    finally:
+        result.data = None
+
+    result.status = 'saved'
+    return result
+
+
+def process_article(article_file: ArticleFile, known_hash: Optional[str] = None) -> ArticleProcessingResult:
+    """
+    Read, parse and save a single article.
+
+    Parameters
+    ----------
+    article_file: the HTML/XML article file
+    known_hash: content hash of the file when it was last processed successfully.
+        The article is not processed again if the content has not changed.
+
+    Returns
+    -------
+    ArticleProcessingResult
+    """
+    result = read_article(article_file, known_hash)
+    if result.contents is not None:
+        parse_article(result)
+    if result.data is not None and not _worker_state['args'].shard_output:
+        write_article(result)
+    return result
+
+
+def process_article_task(task: Tuple[ArticleFile, Optional[str]]) -> ArticleProcessingResult:
+    profiler.start_document()
+    result = process_article(*task)
+    result.profile = profiler.end_document(path=result.file_path, status=result.status)
+    return result
+
+
+def process_article_chunk_task(tasks: List[Tuple[ArticleFile, Optional[str]]]) -> List[ArticleProcessingResult]:
+    return [process_article_task(task) for task in tasks]
+
+
+def read_article_task(task: Tuple[ArticleFile, Optional[str]]) -> ArticleProcessingResult:
+    profiler.start_document()
+    result = read_article(*task)
+    result.profile = profiler.end_document(path=result.file_path, status=result.status)
+    return result
+
+
+def parse_article_task(result: ArticleProcessingResult) -> ArticleProcessingResult:
+    profiler.start_document()
+    parse_article(result)
+    result.profile = merge_records(result.profile, profiler.end_document(status=result.status))
+    return result
+
+
+def write_article_task(result: ArticleProcessingResult) -> ArticleProcessingResult:
+    profiler.start_document()
+    write_article(result)
+    result.profile = merge_records(result.profile, profiler.end_document(status=result.status))
+    return result
+
+
+def iter_partition_files(article_files: Iterable[ArticleFile], args: ArticleProcessingArgs):
+    """
+    Keep the files assigned to partition `args.shard_index` by their paths
+    """
+    for article_file in article_files:
+        path_key = get_article_file_path_key(article_file, args.input_dir)
+        if get_partition(path_key, args.num_shards) == args.shard_index:
+            yield article_file
+
+
+def iter_input_files(args: ArticleProcessingArgs) -> Iterable[ArticleFile]:
+    """
+    Lazily list the input files of the partition processed by this run
+    """
+    article_files = iter_article_files(args.input_dir)
+    if args.num_shards > 1 and args.partition_key == 'path':
+        article_files = iter_partition_files(article_files, args)
+    return article_files
+
+
+def iter_article_tasks(article_files: Iterable[ArticleFile],
+                       manifest: Optional[ProcessingManifest] = None,
+                       retry_quarantined: Optional[bool] = False):
+    """
+    Yield (article file, known content hash) pairs of the files that need to be processed.
+    Files recorded as done in the manifest are dropped if their size and mtime have not changed,
+    and so are quarantined files unless `retry_quarantined`.
+    """
+    n_unchanged = 0
+    n_quarantined = 0
+    for article_file in article_files:
+        if manifest is None:
+            yield article_file, None
+            continue
+
+        entry = manifest.get(article_file.path)
+        try:
+            size, mtime = article_file.stat()
+            if manifest.is_unchanged(entry, size, mtime):
+                n_unchanged += 1
+                continue
+            if not retry_quarantined and manifest.is_quarantined(entry, size, mtime):
+                n_quarantined += 1
+                continue
+        except OSError:
+            pass
+        yield article_file, entry.content_hash if manifest.is_up_to_date(entry) else None
+
+    if manifest is not None:
+        logger.info(f"{n_unchanged} articles are unchanged since the last run and skipped")
+        if n_quarantined:
+            logger.info(f"{n_quarantined} articles are quarantined and skipped; "
+                        f"use `retry_quarantined` to process them")
+
+
+def record_result(manifest: ProcessingManifest, result: ArticleProcessingResult):
+    if result.status == 'unchanged':
+        entry = manifest.get(result.file_path)
+        entry.size = result.size
+        entry.mtime = result.mtime
+    else:
+        entry = ManifestEntry(
+            input_path=result.file_path,
+            size=result.size,
+            mtime=result.mtime,
+            content_hash=result.content_hash,
+            output_path=result.save_path,
+            publisher=result.publisher,
+            doi=result.doi,
+            status=result.status,
+            error='\n'.join(result.errors) if result.errors else None
+        )
+    manifest.record(entry)
+
+
+def iter_results_sequential(tasks: Iterable[Tuple[ArticleFile, Optional[str]]],
+                            args: ArticleProcessingArgs,
+                            dois_to_skip: set):
+    init_article_worker(args, dois_to_skip)
+    for task in tasks:
+        logger.info(f"Processing {os.path.normpath(task[0].path)}")
+        yield process_article_task(task)
+
+
+def iter_results_parallel(tasks: Iterable[Tuple[ArticleFile, Optional[str]]],
+                          args: ArticleProcessingArgs,
+                          dois_to_skip: set):
+    """
+    Distribute the articles over a process pool.
+    Results are yielded in the order of `tasks` regardless of which worker finishes first.
+    A worker process that dies, e.g., killed by the OS for running out of memory, raises `BrokenProcessPool`.
+    """
+    chunk_size = max(args.chunk_size, 1)
+    tasks = iter(tasks)
+
+    executor = ProcessPoolExecutor(
+        max_workers=args.num_workers,
+        initializer=init_article_worker,
+        initargs=(args, dois_to_skip)
+    )
+    try:
+        # start the worker processes before the prefetching threads consume `tasks`,
+        # so that they are not forked while a thread holds a lock
+        executor.submit(int).result()
+
+        # bound the number of dispatched but not yet collected chunks
+        # so that archive members are not all loaded into memory at once
+        futures = collections.deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(futures) < 4 * args.num_workers:
+                chunk = list(itertools.islice(tasks, chunk_size))
+                if not chunk:
+                    exhausted = True
+                    break
+                futures.append(executor.submit(process_article_chunk_task, chunk))
+            if not futures:
+                return
+            for result in futures.popleft().result():
+                logger.info(f"Processing {result.file_path}")
+                yield result
+    finally:
+        # chunks that have not started are dropped if the results are not consumed to the end
+        executor.shutdown(cancel_futures=True)
+
+
+def iter_results_supervised(tasks: Iterable[Tuple[ArticleFile, Optional[str]]],
+                            args: ArticleProcessingArgs,
+                            dois_to_skip: set,
+                            quarantine: Quarantine):
+    """
+    Process the articles in worker processes with a time and memory budget per article.
+    Articles exceeding it are added to the quarantine list. Results are yielded in the order of `tasks`.
+    """
+    pool = SupervisedPool(
+        func=process_article_task,
+        num_workers=args.num_workers,
+        initializer=init_supervised_article_worker,
+        initargs=(args, dois_to_skip),
+        timeout=args.doc_timeout,
+        memory_budget_mb=args.doc_memory_budget_mb
+    )
+    for outcome in pool.imap(tasks):
+        if outcome.status == OUTCOME_DONE:
+            result = outcome.result
+            logger.info(f"Processing {result.file_path}")
+            yield result
+            continue
+
+        article_file = outcome.task[0]
+        result = ArticleProcessingResult(file_path=os.path.normpath(article_file.path),
+                                         file_type=article_file.file_type)
+        logger.info(f"Processing {result.file_path}")
+        try:
+            result.size, result.mtime = article_file.stat()
+        except OSError:
+            pass
+
+        if outcome.status == OUTCOME_ERROR:
+            # a bug rather than a pathological input
+            result.errors.append(f"Failed to process file. Error: {outcome.error}")
+            yield result
+            continue
+
+        reason = {OUTCOME_TIMEOUT: f'exceeded the time budget of {args.doc_timeout}s',
+                  OUTCOME_MEMORY: f'exceeded the memory budget of {args.doc_memory_budget_mb}MB'
+                  if args.doc_memory_budget_mb else 'ran out of memory'}.get(
+            outcome.status, 'crashed the worker')
+        result.errors.append(f"Quarantined {result.file_path}: {reason} in stage {outcome.stage or 'unknown'}")
+        result.status = 'quarantined'
+        # the quarantine file is the input list of the retry pass
+        quarantine.add(result.file_path, outcome, **get_listed_input_fields(article_file, args.input_dir),
+                       doc_timeout=args.doc_timeout, doc_memory_budget_mb=args.doc_memory_budget_mb,
+                       parser_version=PARSER_VERSION)
+        yield result
+
+
+def iter_results_pipeline(tasks: Iterable[Tuple[ArticleFile, Optional[str]]],
+                          args: ArticleProcessingArgs,
+                          dois_to_skip: set):
+    """
+    Read, parse and save the articles in separate stages connected by bounded queues.
+    Parsing runs in worker processes; reading and saving run in threads of the main process.
+    Results are yielded in the order of `tasks`.
+    """
+    # the read and write threads use the state of the main process
+    init_article_worker(args, dois_to_skip)
+
+    stages = [
+        Stage(name='read', func=read_article_task, num_workers=args.read_workers),
+        # tokenization happens while the article is constructed, so it is part of this stage.
+        # Serializing is as well: the article has to be pickled to leave the worker process anyway
+        Stage(name='parse', func=parse_article_task, num_workers=args.num_workers, use_processes=True,
+              initializer=init_article_worker, initargs=(args, dois_to_skip),
+              bypass=lambda r: r.contents is None),
+        # shards are written by the main process
+        Stage(name='write', func=write_article_task, num_workers=args.write_workers,
+              bypass=lambda r: r.data is None or args.shard_output),
+    ]
+    for result in run_pipeline(tasks, stages, max_in_flight=args.max_in_flight):
+        logger.info(f"Processing {result.file_path}")
+        yield result
+
+
+def iter_results_with_fallbacks(results: Iterable[ArticleProcessingResult],
+                                duplicates: Dict[str, List[DedupRecord]],
+                                iter_results: Callable[[Iterable[ArticleFile]], Iterable[ArticleProcessingResult]],
+                                args: ArticleProcessingArgs):
+    """
+    Yield the results, then process the next preferred duplicate of each representative that failed,
+    until an article succeeds or it has no duplicates left.
+    """
+    while True:
+        failed_paths = set()
+        for result in results:
+            if result.status in ('failed', 'quarantined') and result.file_path in duplicates:
+                failed_paths.add(result.file_path)
+            yield result
+
+        fallback_paths = replace_failed_representatives(duplicates, failed_paths)
+        if not fallback_paths:
+            return
+        logger.info(f"Processing the duplicates of {len(fallback_paths)} articles that failed")
+        results = iter_results(f for f in iter_input_files(args) if os.path.normpath(f.path) in fallback_paths)
+
 
 def process_articles(args: ArticleProcessingArgs):
     set_logging(args.log_file)
@@ -50,60 +771,164 @@ def process_articles(args: ArticleProcessingArgs):
     logging_args(args)
 
     logger.info("Getting article paths")
-    file_list = get_file_paths(args.input_dir)
-    logger.info(f"{len(file_list)} articles to be processed")
+    article_files = iter_input_files(args)
 
     if os.path.isfile(args.skip_dois_path):
-        with open(args.skip_dois_path, 'r', encoding='utf-8') as f:
-            dois_to_skip = json.load(f)
+        dois_to_skip = load_dois_to_skip(args.skip_dois_path)
     else:
         if args.skip_dois_path:
             logger.warning("Argument 'skip_dois_path' is not empty but cannot be read.")
-        dois_to_skip = list()
+        dois_to_skip = set()
+
+    if args.num_shards > 1:
+        logger.info(f"Processing partition {args.shard_index} of {args.num_shards} by {args.partition_key}")
+
+    if args.deduplicate:
+        logger.info(f"Looking for duplicate articles; preferring file types {args.dedup_preference}")
+        dedup_files = iter_input_files(args)
+        if args.prefetch_depth > 0:
+            dedup_files = iter_prefetched(
+                dedup_files, depth=args.prefetch_depth, max_buffer_bytes=args.prefetch_buffer_mb * 2 ** 20
+            )
+        duplicates = find_duplicates(dedup_files, args.dedup_preference)
+        if args.dedup_report_path:
+            dedup_report_path = args.dedup_report_path if args.num_shards == 1 else \
+                get_partition_file_path(args.dedup_report_path, args.shard_index, args.num_shards)
+            save_duplicates(duplicates, dedup_report_path)
+            logger.info(f"Duplicates are listed in {dedup_report_path}")
+        duplicate_paths = get_duplicate_paths(duplicates)
+        article_files = (f for f in article_files if os.path.normpath(f.path) not in duplicate_paths)
+
+    manifest = None
+    if args.manifest_path:
+        # nodes keep separate manifests; they are combined by `merge_manifests.py`
+        manifest_path = args.manifest_path if args.num_shards == 1 else \
+            get_partition_file_path(args.manifest_path, args.shard_index, args.num_shards)
+        logger.info(f"Loading processing manifest from {manifest_path}")
+        manifest = ProcessingManifest(manifest_path, parser_version=PARSER_VERSION)
+
+    if args.use_parse_cache:
+        parse_cache_path = args.get_parse_cache_path()
+        # create the database before the worker processes open it
+        with ParseCache(parse_cache_path, parser_version=PARSER_VERSION) as parse_cache:
+            logger.info(f"Using the parse cache in {parse_cache_path} "
+                        f"({parse_cache.total_size / 2 ** 20:.1f} of {args.parse_cache_size_mb} MB used)")
 
     logger.info("Processing articles")
 
-    for file_idx, file_path in enumerate(file_list):
+    quarantine = None
+    if args.supervised:
+        quarantine_path = args.quarantine_path or os.path.join(args.output_dir, 'quarantine.jsonl')
+        if args.num_shards > 1:
+            quarantine_path = get_partition_file_path(quarantine_path, args.shard_index, args.num_shards)
+        if os.path.abspath(quarantine_path) == os.path.abspath(args.input_dir):
+            raise ValueError("The quarantine list cannot be appended to while it is the input; "
+                             "set a different `quarantine_path` for the retry pass")
+        logger.info(f"Using {args.num_workers} supervised worker processes; "
+                    f"articles exceeding their budget are listed in {quarantine_path}")
+        quarantine = Quarantine(quarantine_path)
+    elif args.pipeline:
+        logger.info(f"Using a pipeline with {args.read_workers} reading threads, {args.num_workers} parsing "
+                    f"processes and {args.write_workers} writing threads")
+    elif args.num_workers > 1:
+        logger.info(f"Using {args.num_workers} worker processes")
 
-        file_path = os.path.normpath(file_path)
-        logger.info(f"Processing {file_path}")
+    def iter_results(files: Iterable[ArticleFile]):
+        tasks = iter_article_tasks(files, manifest, retry_quarantined=args.retry_quarantined)
+        if args.prefetch_depth > 0:
+            # files are read ahead after the manifest check so that unchanged files are not read
+            tasks = iter_prefetched(
+                tasks, depth=args.prefetch_depth, max_buffer_bytes=args.prefetch_buffer_mb * 2 ** 20
+            )
+        if args.supervised:
+            return iter_results_supervised(tasks, args, dois_to_skip, quarantine)
+        elif args.pipeline:
+            return iter_results_pipeline(tasks, args, dois_to_skip)
+        elif args.num_workers > 1:
+            return iter_results_parallel(tasks, args, dois_to_skip)
+        return iter_results_sequential(tasks, args, dois_to_skip)
 
-        try:
-            if file_path.lower().endswith('html'):
-                article, component_check = parse_html(file_path)
-            elif file_path.lower().endswith('xml'):
-                article, component_check = parse_xml(file_path)
-            else:
-                logger.error(f'Unsupported file type!')
-                continue
-        except Exception as e:
-            logger.error(f"Failed to parse file. Error: {e}")
-            continue
+    results = iter_results(article_files)
+    if args.deduplicate and duplicates:
+        results = iter_results_with_fallbacks(results, duplicates, iter_results, args)
 
-        try:
-            if article.doi.lower() in dois_to_skip:
+    shard_writer = None
+    if args.shard_output:
+        def on_shard_commit(shard_path: str, committed_results: List[ArticleProcessingResult]):
+            # articles in a shard are only marked as saved once the shard is finalized
+            logger.info(f"Saved {len(committed_results)} articles to {shard_path}")
+            if manifest is not None:
+                for committed_result in committed_results:
+                    committed_result.save_path = shard_path
+                    record_result(manifest, committed_result)
+
+        shard_writer = ShardWriter(
+            output_dir=args.output_dir,
+            prefix='shard' if args.num_shards == 1 else f'shard-p{args.shard_index:05d}',
+            max_shard_bytes=args.max_shard_size_mb * 2 ** 20,
+            on_commit=on_shard_commit
+        )
+
+    stage_statistics = None
+    if args.profile_stages:
+        if args.profile_path:
+            os.makedirs(os.path.dirname(os.path.abspath(args.profile_path)), exist_ok=True)
+        stage_statistics = StageStatistics(args.profile_path)
+
+    n_processed = 0
+    n_from_cache = 0
+    try:
+        for file_idx, result in enumerate(results):
+            if result.status == 'excluded':
                 continue
-        except Exception as e:
-            logger.error(f"Failed to get the dois. Error: {e}")
-            continue
+            n_processed += 1
+            n_from_cache += result.from_cache
 
-        try:
-            # save parsed article
-            save_dir = os.path.normpath(os.path.abspath(file_path)).split(os.sep)
-            save_dir[-2] += '_processed'
-            save_dir[-1] = f"{substring_mapping(article.doi, CHAR_TO_HTML_LBS)}.pt"
-            save_path = os.path.normpath(os.path.join(args.output_dir, os.sep.join(save_dir[-2:])))
-            if not os.path.isdir(os.path.split(save_path)[0]):
-                os.makedirs(os.path.split(save_path)[0])
-            torch.save(article, save_path)
+            for error in result.errors:
+                logger.error(error)
 
-        except Exception as e:
-            logger.error(f"Failed to save results. Error: {e}")
-            continue
+            if shard_writer is not None and result.data is not None:
+                try:
+                    write_start = time.perf_counter()
+                    shard_writer.write(result.doi, result.data, meta=result)
+                    result.data = None
+                    if result.profile is not None:
+                        write_time = time.perf_counter() - write_start
+                        result.profile['stages']['shard_write'] = {'time': write_time, 'self_time': write_time, 'count': 1}
+                except Exception as e:
+                    logger.error(f"Failed to save results. Error: {e}")
+                    result.status = 'failed'
+                    result.errors.append(f"Failed to save results. Error: {e}")
+                    if manifest is not None:
+                        record_result(manifest, result)
+            elif manifest is not None:
+                record_result(manifest, result)
+
+            if stage_statistics is not None:
+                stage_statistics.add(result.profile)
 
-        if args.debug_mode and file_idx >= 10:
-            break
+            if result.status == 'saved' and args.debug_mode and file_idx >= 10:
+                break
+    finally:
+        if shard_writer is not None:
+            shard_writer.close()
+        if manifest is not None:
+            manifest.close()
+        if stage_statistics is not None:
+            stage_statistics.close()
+        if quarantine is not None:
+            quarantine.close()
+        # the sequential mode parses in the main process
+        close_parse_cache()
 
+    logger.info(f"{n_processed} articles processed")
+    if args.use_parse_cache:
+        logger.info(f"{n_from_cache} articles loaded from the parse cache")
+    if quarantine is not None and quarantine.n_entries:
+        logger.warning(f"{quarantine.n_entries} articles exceeded their budget and are quarantined "
+                       f"in {quarantine.path}")
+    if stage_statistics is not None:
+        logger.info(f"Stage timings (ms per document):\n{stage_statistics.summary()}")
     logger.info('Program finished.')
 
 